@@ -0,0 +1,99 @@
+"""Throughput of process_user_input vs process_user_input_async against a stub LLM.
+
+Usage: python bench_async.py [conversations] [llm_latency_seconds]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import chatbot_fix
+import genai_clients
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubGenerativeModel:
+    """Stands in for genai_clients.GenaiModel with a fixed network latency"""
+    latency = 0.2
+
+    def __init__(self, model_name: str = None, **kwargs):
+        self.model_name = model_name
+
+    def generate_content(self, contents, **kwargs):
+        time.sleep(self.latency)
+        return _StubResponse("We are open from 9am to 6pm, Monday to Saturday.")
+
+    async def generate_content_async(self, contents, **kwargs):
+        await asyncio.sleep(self.latency)
+        return _StubResponse("We are open from 9am to 6pm, Monday to Saturday.")
+
+
+class StubGenaiRegistry(genai_clients.GenaiClientRegistry):
+    """Hands out stub models instead of models on keyed Gemini clients"""
+
+    def get_model(self, api_key=None, model_name=genai_clients.DEFAULT_MODEL, *args, **kwargs):
+        return StubGenerativeModel(model_name)
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _turn_args(content: dict, index: int) -> tuple:
+    # A distinct question per conversation so neither the FAQ matcher nor the response cache answers it
+    return (
+        "stub-key", content["knowledge_base"], content["services"], content["instructions"], "",
+        "[]", f"Conversation {index}: what should I know before my first visit?", []
+    )
+
+
+def run_sync(content: dict, conversations: int) -> float:
+    start = time.perf_counter()
+    for index in range(conversations):
+        chatbot_fix.process_user_input(*_turn_args(content, index), use_response_cache=False)
+    return time.perf_counter() - start
+
+
+async def run_async(content: dict, conversations: int) -> float:
+    start = time.perf_counter()
+    results = await asyncio.gather(*[
+        chatbot_fix.process_user_input_async(*_turn_args(content, index), use_response_cache=False)
+        for index in range(conversations)
+    ])
+    elapsed = time.perf_counter() - start
+    errors = [result for result in results if not result["success"]]
+    if errors:
+        print(f"❌ {len(errors)} turns failed: {errors[0]['message']}")
+    return elapsed
+
+
+if __name__ == "__main__":
+    conversations = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    StubGenerativeModel.latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.2
+
+    content = {
+        "knowledge_base": _read("knowledge_base.txt"),
+        "services": _read("available_services.txt"),
+        "instructions": _read("user_instruction.txt"),
+    }
+    # Installed before the first turn creates (and caches) the Gemini backend
+    genai_clients._default_registry = StubGenaiRegistry()
+
+    # Turns write chat_history.json / booking_data.json to the working directory
+    os.chdir(tempfile.mkdtemp(prefix="bench_async_"))
+
+    # The serial run is sampled and extrapolated; at 0.2 s per call it would otherwise take a minute
+    sample = min(conversations, 10)
+    sync_seconds = run_sync(content, sample) * conversations / sample
+    async_seconds = asyncio.run(run_async(content, conversations))
+
+    print(f"📊 {conversations} conversations, stub LLM latency {StubGenerativeModel.latency * 1000:.0f} ms")
+    print(f"   sync  (one at a time): {sync_seconds:7.2f} s  {conversations / sync_seconds:8.1f} turns/s  (from {sample} turns)")
+    print(f"   async (one event loop): {async_seconds:6.2f} s  {conversations / async_seconds:8.1f} turns/s")
+    print(f"   speedup: {sync_seconds / async_seconds:.1f}x")
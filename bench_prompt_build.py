@@ -0,0 +1,109 @@
+"""Prompt build time and allocations per turn, before and after compiled prompt templates.
+
+"Before" replays the previous per-request code path: the chatbot was created per request,
+so the static prefix was re-formatted on every turn and the FAQ was split and tokenized
+on every conversation prompt. "After" uses the tenant's CompiledPrompts.
+
+Usage: python bench_prompt_build.py [turns]
+"""
+import contextlib
+import io
+import re
+import sys
+import time
+import tracemalloc
+
+from chatbot_fix import (CORE_INSTRUCTIONS, FAQ_GUIDELINES, INITIAL_INSTRUCTIONS, AppointmentChatbot,
+                         _format_faq_content)
+from kb_retrieval import tokenize
+
+
+class LegacyChatbot(AppointmentChatbot):
+    """Prompt builders as they were before compilation (minus the per-instance memo,
+    which never survived past one request)"""
+
+    def _get_static_prefix(self) -> str:
+        return (
+            "You are an AI receptionist for an appointment booking system (Always respond in English).\n\n"
+            f"Knowledge Base:\n{self.knowledge_base_content.strip()}\n\n"
+            f"FAQ Information:\n{_format_faq_content(self.Faq_content).strip()}\n"
+            f"{FAQ_GUIDELINES}\n\n"
+            f"Behavior Instructions:\n{self.user_instruction_content.strip()}"
+        )
+
+    def _get_initial_prompt(self) -> str:
+        return f"{self._get_static_prefix()}\n\n{INITIAL_INSTRUCTIONS}"
+
+    def _get_turn_prompt(self, user_input: str, recent_context: str) -> str:
+        return (
+            f"Conversation History:\n{recent_context.strip()}\n\n"
+            f"{CORE_INSTRUCTIONS}\n\n"
+            f"User message: {user_input}"
+        )
+
+    def _get_faq_items(self, user_input: str) -> list:
+        if isinstance(self.Faq_content, list):
+            entries = [f"- Q: {faq['question']}\n  A: {faq['answer']}" for faq in self.Faq_content]
+        else:
+            entries = re.split(r'\n\s*\n|\n(?=\s*Q:)', self.Faq_content or "")
+        query_terms = set(tokenize(user_input))
+        return [(len(query_terms.intersection(tokenize(entry))), entry.strip()) for entry in entries if entry.strip()]
+
+
+SCENARIOS = {
+    # New session: the welcome prompt carries the whole KB
+    "initial": lambda bot, question, history: bot._get_initial_prompt(),
+    # Context-cache fallback: prefix sent inline with the turn delta
+    "prefix_turn": lambda bot, question, history: f"{bot._get_static_prefix()}\n\n{bot._get_turn_prompt(question, history)}",
+    # Regular turn: budgeted prompt with retrieved KB sections and scored FAQ entries
+    "conversation": lambda bot, question, history: bot._get_conversation_prompt(question, history),
+}
+
+
+def _read(path: str) -> str:
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def measure(bot, build, turns: int, questions, history: str):
+    """(ms per turn, peak KiB allocated per turn)"""
+    build(bot, questions[0], history)  # warm the KB index and compiled prompts
+
+    start = time.perf_counter()
+    for turn in range(turns):
+        build(bot, questions[turn % len(questions)], history)
+    ms_per_turn = (time.perf_counter() - start) * 1000 / turns
+
+    tracemalloc.start()
+    peaks = []
+    for turn in range(min(turns, 20)):
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        build(bot, questions[turn % len(questions)], history)
+        peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    tracemalloc.stop()
+    return ms_per_turn, sum(peaks) / len(peaks) / 1024
+
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    faq = [{"question": f"Question {index} about appointments, pricing and opening hours?",
+            "answer": f"Answer {index}: we are open 9am-6pm and prices start at ${index % 50 + 20}."}
+           for index in range(60)]
+    args = ("stub-key", _read("knowledge_base.txt").strip(), _read("available_services.txt").strip(),
+            _read("user_instruction.txt").strip(), faq)
+    questions = ["How much is a facial?", "approaches to learning through play", "What are your hours?"]
+    history = "\n\n".join(f"User: question {index}\nBot: answer {index}" for index in range(6))
+
+    after = AppointmentChatbot(*args)
+    before = LegacyChatbot(*args)
+
+    print(f"📊 KB {len(args[1]):,} chars, {len(faq)} FAQ entries, {turns} turns per scenario\n")
+    print(f"{'scenario':<14}{'before ms':>11}{'after ms':>10}{'before KiB':>12}{'after KiB':>11}")
+    for name, build in SCENARIOS.items():
+        # Silence the "prompt trimmed" notices while timing
+        with contextlib.redirect_stdout(io.StringIO()):
+            before_ms, before_kib = measure(before, build, turns, questions, history)
+            after_ms, after_kib = measure(after, build, turns, questions, history)
+        print(f"{name:<14}{before_ms:>11.3f}{after_ms:>10.3f}{before_kib:>12.1f}{after_kib:>11.1f}")
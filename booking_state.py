@@ -0,0 +1,66 @@
+from typing import List, Optional
+
+
+BOOKING_STATE_VERSION = 1
+BOOKING_FIELDS = ("package", "name", "dob", "date", "time")
+# Only the latest rejections are kept, so the state stays small however often an answer fails
+MAX_ERRORS = 3
+
+
+class BookingState:
+    """Where a booking flow stands, small enough to travel with every response.
+    The backend sends it back with the next message, so resuming a booking is a dict
+    lookup instead of re-reading the chat history."""
+
+    def __init__(self, active: bool = False, step: int = 0, slots: Optional[dict] = None,
+                 errors: Optional[List[dict]] = None):
+        self.active = active
+        self.step = step
+        self.slots = {field: value for field, value in (slots or {}).items() if field in BOOKING_FIELDS}
+        # Rejected answers for the current question, cleared once it is answered
+        self.errors = errors or []
+
+    def to_dict(self) -> dict:
+        return {"v": BOOKING_STATE_VERSION, "active": self.active, "step": self.step,
+                "slots": self.slots, "errors": self.errors}
+
+    @classmethod
+    def from_dict(cls, value) -> Optional["BookingState"]:
+        """None for a missing, malformed or other-version state; callers then start over
+        (or fall back to whatever they did before states existed)"""
+        if not isinstance(value, dict):
+            return None
+        if value.get("v") != BOOKING_STATE_VERSION:
+            print(f"⚠️ Ignoring booking state version {value.get('v')} (expected {BOOKING_STATE_VERSION})")
+            return None
+        try:
+            step = int(value.get("step", 0))
+            slots = dict(value.get("slots") or {})
+            errors = list(value.get("errors") or [])
+        except (TypeError, ValueError) as e:
+            print(f"⚠️ Ignoring malformed booking state: {str(e)}")
+            return None
+        return cls(bool(value.get("active")), max(0, min(step, len(BOOKING_FIELDS))), slots, errors)
+
+    @classmethod
+    def capture(cls, booking_system, active: bool, previous: Optional["BookingState"] = None,
+                rejected: Optional[str] = None) -> "BookingState":
+        """State of booking_system after a turn. rejected is the reply to an answer that did not
+        pass validation; it is added to the errors of the question still being asked."""
+        if not active:
+            return cls()
+        slots = {field: value for field, value in booking_system.booking_data.items() if value is not None}
+        step = booking_system.current_question_index
+        errors = []
+        if rejected is not None:
+            if previous is not None and previous.step == step:
+                errors = list(previous.errors)
+            field = BOOKING_FIELDS[step] if step < len(BOOKING_FIELDS) else None
+            errors.append({"field": field, "message": rejected})
+        return cls(True, step, slots, errors[-MAX_ERRORS:])
+
+    def apply(self, booking_system):
+        """Restore slot values and the current question on a freshly built booking system"""
+        for field in BOOKING_FIELDS:
+            booking_system.booking_data[field] = self.slots.get(field)
+        booking_system.current_question_index = self.step
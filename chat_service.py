@@ -0,0 +1,519 @@
+"""HTTP front-end for chatbot_fix.process_user_input.
+
+    POST /turn     one message; the JSON body holds the per-turn arguments of process_user_input
+                   (TURN_FIELDS). Tenant content defaults to what the service was started with, so
+                   {"user_input": ...} (plus session_id, chat_history and booking_state) is enough.
+                   The API key, LLM backends and vector store come only from the server's config
+    GET  /healthz  liveness: 200 while the process answers
+    GET  /readyz   readiness: 200 once warm; 503 while draining or with the turn queue full
+    GET  /stats    turn counters, latency percentiles, CPU per turn, session and tenant bundle caches
+
+Turns run on a bounded thread pool (--threads) with a queue of --max-queue more; beyond that a
+turn gets 503 right away. Each turn is capped at --turn-timeout seconds (504; an LLM call already
+running finishes in the background and still counts as in flight). --processes N pre-forks N
+servers on one listening socket. Sessions live per process, so set CHATBOT_STATE_DB to share
+history and booking progress between them. SIGTERM/SIGINT stops taking turns, waits up to
+--drain-timeout for the ones in flight, then exits.
+
+The same service is an ASGI app for uvicorn (settings from CHAT_SERVICE_* variables):
+    uvicorn chat_service:app --workers 4
+
+--load URL drives a running service with closed-loop conversations and reports turns/s,
+latency percentiles and the server's CPU per turn (1000 / cpu_ms_per_turn = turns/s per core).
+
+Usage: python chat_service.py [--port 8080] [--threads 16] [--processes 1] [--turn-timeout 60]
+       python chat_service.py --load http://127.0.0.1:8080 [--concurrency 32] [--turns 1000]
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from chatbot_fix import get_tenant_bundle, process_user_input
+from session_registry import get_default_session_registry
+from tenant_bundles import get_default_tenant_bundle_cache
+
+
+DEFAULT_PORT = 8080
+DEFAULT_THREADS = 16
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_TURN_TIMEOUT = 60.0
+DEFAULT_DRAIN_TIMEOUT = 30.0
+# Request fields that name a tenant file; each defaults to the file's content when it exists
+DEFAULT_TENANT_FILES = {
+    "knowledge_base_content": "knowledge_base.txt",
+    "available_services_content": "available_services.txt",
+    "user_instruction_content": "user_instruction.txt",
+}
+CONTENT_FIELDS = ("knowledge_base_content", "available_services_content", "user_instruction_content", "Faq_content")
+# What a request may set. api_key, llm_backend, local_llm_backend, vector_store_path and the cache
+# switches stay server-side: a backend config from a client could send the key to its own endpoint,
+# record a cassette to any path, or open any file as a vector store
+TURN_FIELDS = frozenset(("user_input", "session_id", "chat_history", "booking_state", "appointments_content")
+                        + CONTENT_FIELDS)
+LATENCY_SAMPLES = 4096
+
+
+def load_tenant_defaults(paths: Optional[dict] = None) -> dict:
+    """Default /turn arguments: api key from the environment plus the tenant files that exist"""
+    defaults = {"api_key": os.getenv("GEMINI_API_KEY", ""), "Faq_content": "", "appointments_content": "[]"}
+    for field, path in dict(DEFAULT_TENANT_FILES, **(paths or {})).items():
+        if path and os.path.isfile(path):
+            with open(path, "r", encoding="utf-8") as f:
+                defaults[field] = f.read()
+    return defaults
+
+
+def _percentile(values: list, share: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * share))] if values else 0.0
+
+
+class TurnRejected(Exception):
+    """A turn refused before it ran, with the HTTP status to answer"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ChatService:
+    """Runs turns on a bounded thread pool with a per-turn timeout, and drains them on shutdown.
+    Shared by the stdlib HTTP server and the ASGI app."""
+
+    def __init__(self, threads: int = DEFAULT_THREADS, max_queue: int = DEFAULT_MAX_QUEUE,
+                 turn_timeout: float = DEFAULT_TURN_TIMEOUT, drain_timeout: float = DEFAULT_DRAIN_TIMEOUT,
+                 defaults: Optional[dict] = None):
+        self.threads = threads
+        self.max_queue = max_queue
+        self.turn_timeout = turn_timeout
+        self.drain_timeout = drain_timeout
+        # Loaded once, so every default-content turn passes the same strings (a cheap tenant bundle hit)
+        self.defaults = defaults if defaults is not None else load_tenant_defaults()
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="turn")
+        self._cond = threading.Condition()
+        self._latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.warm = False
+        self.draining = False
+        self.turns = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.rejected = 0
+        self.started = time.time()
+
+    @classmethod
+    def from_env(cls) -> "ChatService":
+        return cls(threads=int(os.getenv("CHAT_SERVICE_THREADS", DEFAULT_THREADS)),
+                   max_queue=int(os.getenv("CHAT_SERVICE_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+                   turn_timeout=float(os.getenv("CHAT_SERVICE_TURN_TIMEOUT", DEFAULT_TURN_TIMEOUT)),
+                   drain_timeout=float(os.getenv("CHAT_SERVICE_DRAIN_TIMEOUT", DEFAULT_DRAIN_TIMEOUT)))
+
+    def warm_up(self):
+        """Compile the default tenant bundle before reporting ready, so the first turn is not the slow one"""
+        if all(field in self.defaults for field in CONTENT_FIELDS):
+            get_tenant_bundle(*(self.defaults[field] for field in CONTENT_FIELDS))
+        self.warm = True
+
+    def ready(self) -> bool:
+        with self._cond:
+            return self.warm and not self.draining and self.in_flight < self.threads + self.max_queue
+
+    def parse_turn(self, body: bytes) -> dict:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise TurnRejected(400, f"Invalid JSON: {str(e)}")
+        if not isinstance(request, dict):
+            raise TurnRejected(400, "Expected a JSON object")
+        unknown = set(request) - TURN_FIELDS
+        if unknown:
+            raise TurnRejected(400, f"Unknown fields: {', '.join(sorted(unknown))}")
+        kwargs = dict(self.defaults, **request)
+        missing = [field for field in ("user_input",) + CONTENT_FIELDS if kwargs.get(field) is None]
+        if missing:
+            raise TurnRejected(400, f"Missing fields: {', '.join(missing)}")
+        return kwargs
+
+    def submit(self, kwargs: dict):
+        """Future of process_user_input(**kwargs), or TurnRejected when draining or full"""
+        with self._cond:
+            if self.draining:
+                raise TurnRejected(503, "Shutting down")
+            if self.in_flight >= self.threads + self.max_queue:
+                self.rejected += 1
+                raise TurnRejected(503, "Too many turns in flight")
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        started = time.perf_counter()
+        future = self._executor.submit(process_user_input, **kwargs)
+        future.add_done_callback(lambda done: self._finished(done, started))
+        return future
+
+    def _finished(self, future, started: float):
+        with self._cond:
+            self.in_flight -= 1
+            if not future.cancelled():
+                self.turns += 1
+                self._latencies.append(time.perf_counter() - started)
+                if future.exception() is not None or not future.result().get("success"):
+                    self.failed += 1
+            self._cond.notify_all()
+
+    def _timed_out(self, future) -> Tuple[int, dict]:
+        # Only a turn still waiting in the queue can be cancelled; a running one finishes on its own
+        future.cancel()
+        with self._cond:
+            self.timeouts += 1
+        return 504, {"success": False, "error": f"Turn took longer than {self.turn_timeout:g}s"}
+
+    @staticmethod
+    def _cancelled() -> Tuple[int, dict]:
+        return 503, {"success": False, "error": "Shutting down"}
+
+    @staticmethod
+    def _result(response: dict) -> Tuple[int, dict]:
+        return (200 if response.get("success") else 500), response
+
+    def handle(self, method: str, path: str, body: bytes = b"") -> Tuple[int, dict]:
+        """(status, JSON body) for one request; blocks for the turn on /turn"""
+        if method == "POST" and path == "/turn":
+            try:
+                future = self.submit(self.parse_turn(body))
+            except TurnRejected as e:
+                return e.status, {"success": False, "error": str(e)}
+            try:
+                return self._result(future.result(timeout=self.turn_timeout))
+            except FutureTimeoutError:
+                return self._timed_out(future)
+            except CancelledError:
+                return self._cancelled()
+        return self.probe(method, path)
+
+    async def handle_async(self, method: str, path: str, body: bytes = b"") -> Tuple[int, dict]:
+        """handle() for the ASGI app: the event loop waits on the pool without blocking"""
+        if method == "POST" and path == "/turn":
+            try:
+                future = self.submit(self.parse_turn(body))
+            except TurnRejected as e:
+                return e.status, {"success": False, "error": str(e)}
+            try:
+                return self._result(await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.turn_timeout))
+            except asyncio.TimeoutError:
+                return self._timed_out(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+                return self._cancelled()
+        return self.probe(method, path)
+
+    def probe(self, method: str, path: str) -> Tuple[int, dict]:
+        if method != "GET":
+            return 404, {"error": f"No route for {method} {path}"}
+        if path == "/healthz":
+            return 200, {"status": "ok"}
+        if path == "/readyz":
+            ready = self.ready()
+            return (200 if ready else 503), {"ready": ready, "draining": self.draining, "in_flight": self.in_flight}
+        if path == "/stats":
+            return 200, self.stats()
+        return 404, {"error": f"No route for {method} {path}"}
+
+    def drain(self, timeout: Optional[float] = None) -> bool:
+        """Stop taking turns and wait for the ones in flight; True when all of them finished"""
+        timeout = self.drain_timeout if timeout is None else timeout
+        with self._cond:
+            self.draining = True
+            drained = self._cond.wait_for(lambda: self.in_flight == 0, timeout)
+            remaining = self.in_flight
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if not drained:
+            print(f"⚠️ Shutting down with {remaining} turns still in flight after {timeout:g}s")
+        return drained
+
+    def stats(self) -> dict:
+        with self._cond:
+            latencies = sorted(self._latencies)
+            turns = self.turns
+            stats = {
+                "pid": os.getpid(),
+                "uptime": time.time() - self.started,
+                "threads": self.threads,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "draining": self.draining,
+                "turns": turns,
+                "failed": self.failed,
+                "timeouts": self.timeouts,
+                "rejected": self.rejected,
+            }
+        stats["latency_ms"] = {
+            "p50": statistics.median(latencies) * 1000 if latencies else 0.0,
+            "p95": _percentile(latencies, 0.95) * 1000,
+            "p99": _percentile(latencies, 0.99) * 1000,
+        }
+        # Process CPU per completed turn; 1000 / this is the turns/s one core sustains
+        stats["cpu_ms_per_turn"] = time.process_time() * 1000 / turns if turns else 0.0
+        stats["sessions"] = get_default_session_registry().stats()
+        stats["tenant_bundles"] = get_default_tenant_bundle_cache().stats()
+        return stats
+
+
+class ChatServiceHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so load generators and backends reuse connections
+    protocol_version = "HTTP/1.1"
+    service: ChatService = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        if self.service.draining:
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._send_json(*self.service.handle("GET", urlparse(self.path).path))
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self._send_json(*self.service.handle("POST", urlparse(self.path).path, body))
+
+
+def make_server(service: ChatService, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                listener: Optional[socket.socket] = None) -> ThreadingHTTPServer:
+    """Server for one process; with a listener it serves that (shared, already bound) socket instead.
+    Port 0 picks a free port (server.server_address[1])."""
+    handler = type("Handler", (ChatServiceHandler,), {"service": service})
+    if listener is None:
+        server = ThreadingHTTPServer((host, port), handler)
+    else:
+        server = ThreadingHTTPServer(listener.getsockname()[:2], handler, bind_and_activate=False)
+        server.socket.close()
+        server.socket = listener
+        server.server_address = listener.getsockname()[:2]
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(service: Optional[ChatService] = None, **kwargs) -> Tuple[ThreadingHTTPServer, ChatService]:
+    """Start a warmed-up server on a daemon thread, for tests and benchmarks in the same process"""
+    service = service or ChatService()
+    service.warm_up()
+    server = make_server(service, **kwargs)
+    threading.Thread(target=server.serve_forever, name="chat-service", daemon=True).start()
+    return server, service
+
+
+def _serve_process(listener: socket.socket, service: ChatService):
+    """Serve until SIGTERM/SIGINT, then drain in-flight turns while probes report not ready"""
+    server = make_server(service, listener=listener)
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        if stopping.is_set():
+            return
+        stopping.set()
+
+        def shutdown():
+            service.drain()
+            server.shutdown()
+        threading.Thread(target=shutdown, name="chat-service-drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    service.warm_up()
+    server.serve_forever()
+    server.server_close()
+
+
+def serve(host: str, port: int, processes: int = 1, service_factory=ChatService.from_env):
+    """Pre-fork processes servers on one listening socket; service_factory runs in each child,
+    after the fork, so no thread pool or connection crosses it"""
+    listener = socket.create_server((host, port), backlog=1024)
+    print(f"💬 Chat service on http://{host}:{listener.getsockname()[1]} ({processes} process(es))")
+    if processes <= 1 or not hasattr(os, "fork"):
+        _serve_process(listener, service_factory())
+        return
+
+    children = []
+    for _ in range(processes):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                _serve_process(listener, service_factory())
+            finally:
+                os._exit(0)
+        children.append(pid)
+
+    def forward(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, forward)
+    signal.signal(signal.SIGINT, forward)
+    for pid in children:
+        os.waitpid(pid, 0)
+    listener.close()
+
+
+def make_asgi_app(service: Optional[ChatService] = None):
+    """ASGI app (no framework needed); the service is created on startup from CHAT_SERVICE_* when not given"""
+    holder = {"service": service}
+
+    def get_service() -> ChatService:
+        if holder["service"] is None:
+            holder["service"] = ChatService.from_env()
+        return holder["service"]
+
+    async def app(scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await asyncio.to_thread(get_service().warm_up)
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await asyncio.to_thread(get_service().drain)
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            return
+
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        status, payload = await get_service().handle_async(scope["method"], scope["path"], body)
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json; charset=utf-8"),
+                                (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+
+    return app
+
+
+app = make_asgi_app()
+
+
+def run_load(url: str, concurrency: int = 32, turns: int = 1000, conversation_turns: int = 6,
+             messages: Tuple[str, ...] = ("Hello", "What are your opening hours?", "How much is a facial?",
+                                          "Do you have parking?", "Thanks!")) -> dict:
+    """Closed loop: each client runs conversations of conversation_turns messages back to back,
+    carrying session_id, chat_history and booking_state as a backend would"""
+    target = urlparse(url)
+    counter = iter(range(turns))
+    counter_lock = threading.Lock()
+    latencies, statuses = [], {}
+    results_lock = threading.Lock()
+
+    def client(number: int):
+        connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=300)
+        conversation, session = 0, {}
+        while True:
+            with counter_lock:
+                turn = next(counter, None)
+            if turn is None:
+                break
+            if not session or len(session["chat_history"]) >= conversation_turns:
+                conversation += 1
+                session = {"session_id": f"load-{number}-{conversation}", "chat_history": []}
+            body = json.dumps(dict(session, user_input=messages[turn % len(messages)]))
+            started = time.perf_counter()
+            try:
+                connection.request("POST", "/turn", body, {"Content-Type": "application/json"})
+                response = connection.getresponse()
+                status, payload = response.status, json.loads(response.read() or b"{}")
+            except (OSError, http.client.HTTPException, ValueError):
+                connection.close()
+                connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=300)
+                status, payload = 0, {}
+            with results_lock:
+                latencies.append(time.perf_counter() - started)
+                statuses[status] = statuses.get(status, 0) + 1
+            if status == 200:
+                session = {"session_id": session["session_id"], "chat_history": payload.get("chat_history", []),
+                           "booking_state": payload.get("booking_state")}
+        connection.close()
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(number,)) for number in range(concurrency)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    connection.request("GET", "/stats")
+    server_stats = json.loads(connection.getresponse().read())
+    connection.close()
+
+    latencies.sort()
+    return {
+        "turns": len(latencies),
+        "statuses": statuses,
+        "elapsed": elapsed,
+        "turns_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "p95_ms": _percentile(latencies, 0.95) * 1000,
+        "p99_ms": _percentile(latencies, 0.99) * 1000,
+        "server_cpu_ms_per_turn": server_stats.get("cpu_ms_per_turn", 0.0),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HTTP service for the appointment chatbot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threads", type=int, default=DEFAULT_THREADS, help="turns run at once per process")
+    parser.add_argument("--max-queue", type=int, default=DEFAULT_MAX_QUEUE, help="turns waiting beyond that before 503")
+    parser.add_argument("--processes", type=int, default=1, help="pre-forked server processes on one port")
+    parser.add_argument("--turn-timeout", type=float, default=DEFAULT_TURN_TIMEOUT)
+    parser.add_argument("--drain-timeout", type=float, default=DEFAULT_DRAIN_TIMEOUT)
+    parser.add_argument("--knowledge-base", default=DEFAULT_TENANT_FILES["knowledge_base_content"])
+    parser.add_argument("--services", default=DEFAULT_TENANT_FILES["available_services_content"])
+    parser.add_argument("--instructions", default=DEFAULT_TENANT_FILES["user_instruction_content"])
+    parser.add_argument("--load", metavar="URL", help="load-test a running service instead of serving")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--turns", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.load:
+        result = run_load(args.load, args.concurrency, args.turns)
+        per_core = 1000 / result["server_cpu_ms_per_turn"] if result["server_cpu_ms_per_turn"] else 0.0
+        print(f"📊 {result['turns']} turns in {result['elapsed']:.2f}s: {result['turns_per_second']:.1f} turns/s "
+              f"(p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms)")
+        print(f"   statuses {result['statuses']}; server CPU {result['server_cpu_ms_per_turn']:.2f} ms/turn "
+              f"≈ {per_core:.0f} turns/s per core")
+    else:
+        defaults = load_tenant_defaults({"knowledge_base_content": args.knowledge_base,
+                                         "available_services_content": args.services,
+                                         "user_instruction_content": args.instructions})
+        serve(args.host, args.port, args.processes, lambda: ChatService(
+            threads=args.threads, max_queue=args.max_queue, turn_timeout=args.turn_timeout,
+            drain_timeout=args.drain_timeout, defaults=defaults))
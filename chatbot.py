@@ -6,6 +6,7 @@ from typing import Optional, Dict, List
 import dateparser
 from datetime import datetime, timedelta
 from rapidfuzz import process
+from kb_retrieval import get_knowledge_base_index
 
 class ConversationMemory:
     def __init__(self):
@@ -233,6 +234,7 @@ class AppointmentChatbot:
         self.user_instruction_file = Path(user_instruction_file)
         self.knowledge_base_file = Path(knowledge_base_file)
         self.knowledge_base_content = self._load_knowledge_base()
+        self.knowledge_index = get_knowledge_base_index(self.knowledge_base_content)
         self.conversation_memory = ConversationMemory()
         self.booking_system = BookingSystem(api_key, available_services_file)  # Pass API key to booking system
         self.is_booking_in_progress = False
@@ -291,7 +293,7 @@ class AppointmentChatbot:
         You are an AI receptionist (Always respond in English). Review the conversation and guide the user.
 
         Knowledge Base:
-        {self.knowledge_base_content}
+        {self.knowledge_index.get_relevant_context(user_input)}
 
         Instruction:
         {self.user_instruction_file}
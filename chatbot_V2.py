@@ -1,4 +1,4 @@
-import google.generativeai as genai
+from genai_clients import get_genai_model
 from datetime import datetime
 import json, re
 from pathlib import Path
@@ -6,6 +6,7 @@ from typing import Optional, Dict, List
 import dateparser
 from datetime import datetime, timedelta
 from rapidfuzz import process
+from kb_retrieval import get_knowledge_base_index
 
 import os
 from dotenv import load_dotenv
@@ -88,8 +89,7 @@ class BookingSystem:
         self.available_services_file = Path(available_services_file)
         self.available_services = self._load_services()
 
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        self.model = get_genai_model(api_key, "gemini-2.0-flash")
 
 
     def start_booking(self, initial_service=None):
@@ -392,13 +392,13 @@ class AppointmentChatbot:
         self.user_instruction_file = Path(user_instruction_file)
         self.knowledge_base_file = Path(knowledge_base_file)
         self.knowledge_base_content = self._load_knowledge_base()
+        self.knowledge_index = get_knowledge_base_index(self.knowledge_base_content)
         self.conversation_memory = ConversationMemory()
         self.booking_system = BookingSystem(api_key, available_services_file)  # Pass API key to booking system
         self.is_booking_in_progress = False
         
         # Initialize Gemini
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        self.model = get_genai_model(self.api_key, "gemini-2.0-flash")
         
 
     def _extract_service_from_message(self, message):
@@ -499,7 +499,7 @@ class AppointmentChatbot:
         You are an AI receptionist (Always respond in English). Review the conversation and guide the user.
 
         Knowledge Base:
-        {self.knowledge_base_content}
+        {self.knowledge_index.get_relevant_context(user_input)}
 
         Behavior Instructions:
         {self.user_instruction_file}
@@ -1,11 +1,30 @@
-import google.generativeai as genai
 from datetime import datetime
-import json, re
+import json, re, time
+import asyncio
 from pathlib import Path
 from typing import Optional, Dict, List
 import dateparser
 from datetime import datetime, timedelta
 from rapidfuzz import process
+from kb_retrieval import get_knowledge_base_index, tokenize
+from prompt_budget import PromptAssembler, estimate_tokens, get_token_budget
+from prompt_cache import get_default_context_cache
+from content_keys import content_hash
+from response_cache import get_default_response_cache
+from faq_matcher import get_faq_index
+from intent_matcher import get_intent_matcher
+from stream_filter import MarkerFilter
+from vector_store import get_vector_store
+from llm_backends import get_llm_backend
+from single_flight import get_default_single_flight
+from model_router import LOCAL, get_default_model_router
+from prompt_templates import PromptTemplate, Slot, get_compiled_prompts
+from turn_metrics import get_default_turn_metrics, section_tokens
+from history_compressor import get_default_history_compressor
+from session_registry import get_default_session_registry
+from booking_state import BookingState
+from state_store import get_default_state_store
+from tenant_bundles import get_default_tenant_bundle_cache
 
 import os
 from dotenv import load_dotenv
@@ -13,20 +32,56 @@ from dotenv import load_dotenv
 # Add this at the top of your file with other imports
 load_dotenv()
 
+# llm_backends config, e.g. "gemini:gemini-2.0-flash" or "ollama:mistral"
+DEFAULT_LLM_BACKEND = os.getenv("CHATBOT_LLM_BACKEND", "gemini:gemini-2.0-flash")
+if os.getenv("CHATBOT_FALLBACK_LLM_BACKEND"):
+    # Slow or failing primary calls are hedged to the fallback (usually the local Ollama model)
+    DEFAULT_LLM_BACKEND = {
+        "provider": "hedged",
+        "primary": DEFAULT_LLM_BACKEND,
+        "secondary": os.getenv("CHATBOT_FALLBACK_LLM_BACKEND"),
+    }
+# e.g. "ollama:mistral"; when set, the router sends simple turns there
+DEFAULT_LOCAL_LLM_BACKEND = os.getenv("CHATBOT_LOCAL_LLM_BACKEND")
+# Per-session objects (booking system, memory) beyond history and appointments
+SESSION_BASE_BYTES = 16 * 1024
+# A turn waiting longer than this for the previous turn of its session gives up
+SESSION_LOCK_TIMEOUT = 120
+# Replays pin "today" to the day the conversation was recorded; None follows the wall clock
+_frozen_today: Optional[datetime] = None
+
+
+def set_today(day: Optional[str]):
+    """Pin the booking flow's "today" (YYYY-MM-DD), e.g. for deterministic replays; None restores the clock"""
+    global _frozen_today
+    _frozen_today = datetime.strptime(day, "%Y-%m-%d") if day else None
+
+
+def _today() -> datetime:
+    return _frozen_today or datetime.today()
+
 
 
 
 
 class ConversationMemory:
-    def __init__(self):
+    def __init__(self, compressor=None, summary_model=None, store=None, session_id: str = None):
         self.history = []
         self.is_first_message = True
         self.history_file = Path('chat_history.json')
+        # Older turns are folded into a running summary so long chats cost the same per turn as short ones
+        self.compressor = compressor or get_default_history_compressor()
+        self.summary_model = summary_model
+        # With a state store (state_store.SQLiteStateStore) history is kept per session instead of in the shared file
+        self.store = store if session_id else None
+        self.session_id = session_id
         self._load_history()
 
     def _load_history(self):
-        """Load existing chat history from JSON file"""
-        if self.history_file.exists():
+        """Load existing chat history from the state store or the JSON file"""
+        if self.store is not None:
+            self.history = self.store.load_history(self.session_id)
+        elif self.history_file.exists():
             try:
                 with open(self.history_file, 'r', encoding='utf-8') as f:
                     self.history = json.load(f)
@@ -41,7 +96,23 @@ class ConversationMemory:
             "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         self.history.append(exchange)
-        self._save_history()
+        if self.store is not None:
+            try:
+                self.store.append_exchange(self.session_id, exchange)
+            except Exception as e:
+                print(f"⚠️ Error saving chat history: {str(e)}")
+        else:
+            self._save_history()
+
+    def replace_history(self, history: list):
+        """Adopt the history the backend sent, storing it only if it differs"""
+        changed = len(history) != len(self.history) or (history and history[-1] != self.history[-1])
+        self.history = history
+        if changed and self.store is not None:
+            try:
+                self.store.replace_history(self.session_id, history)
+            except Exception as e:
+                print(f"⚠️ Error saving chat history: {str(e)}")
 
     def _save_history(self):
         """Save chat history to JSON file"""
@@ -51,8 +122,11 @@ class ConversationMemory:
         except Exception as e:
             print(f"⚠️ Error saving chat history: {str(e)}")
         
-    def get_recent_context(self, num_messages: int = 10) -> str:
-        """Get the most recent conversation exchanges"""
+    def get_recent_context(self, num_messages: int = None) -> str:
+        """Summary of older turns plus the most recent exchanges within the history budget.
+        Pass num_messages for the raw last N exchanges instead."""
+        if num_messages is None:
+            return self.compressor.compress(self.history, self.summary_model)
         recent = self.history[-num_messages:] if len(self.history) > 0 else []
         context = ""
         for exchange in recent:
@@ -65,7 +139,7 @@ class ConversationMemory:
 
 
 class BookingSystem:
-    def __init__(self, api_key: str, available_services_content: str, appointments_content: str = "[]"):  # Changed parameter name
+    def __init__(self, api_key: str, available_services_content: str, appointments_content: str = "[]", llm_backend=None, store=None, session_id: str = None, services: List[str] = None):  # Changed parameter name
         self.booking_data = {
             'package': None,
             'name': None,
@@ -82,20 +156,27 @@ class BookingSystem:
         ]
         self.current_question_index = 0
         self.booking_file = Path('booking_data.json')
+        # Per-session row in the state store instead of the shared file, when configured
+        self.store = store if session_id else None
+        self.session_id = session_id
 
-        # Load services from string content
-        self.available_services = self._load_services(available_services_content)  # Pass content directly
+        # Load services from string content, unless the tenant bundle already parsed them
+        self.available_services = services if services is not None else self._load_services(available_services_content)
 
         # Load appointments from string content (default to empty list if not provided)
         self.appointments_content = appointments_content
         self.appointments = self._load_appointments()
 
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        # Shared per process, so the connection is already warm on later turns
+        self.model = get_llm_backend(llm_backend or DEFAULT_LLM_BACKEND, api_key=api_key)
 
 
     def start_booking(self, initial_service=None):
         """Start the booking process, optionally with a pre-selected service"""
+        # A session can book more than once; nothing carries over from its previous booking
+        self.booking_data = dict.fromkeys(self.booking_data)
+        self.current_question_index = 0
+
         if initial_service is None:
             # Show available services list
             services_list = "\n".join(f"- {service}" for service in sorted(self.available_services))
@@ -112,7 +193,8 @@ class BookingSystem:
             services_list = "\n".join(f"- {service}" for service in sorted(self.available_services))
             return f"I couldn't find an exact match for '{initial_service}'. Here are our available services:\n\n{services_list}\n\nWhich service would you like to book?"
 
-    def _load_services(self, services_content: str):
+    @staticmethod
+    def _load_services(services_content: str):
         """Load service names from string content."""
         try:
             services = [line.strip() for line in services_content.split('\n') if line.strip()]
@@ -244,7 +326,7 @@ class BookingSystem:
             self.current_question_index += 1
         return None  # All questions are answered
 
-    def process_response(self, response):
+    def process_response(self, response, converted_date: str = None):
         """Process user responses, parse dates and time, and store in JSON"""
         key, _ = self.questions[self.current_question_index]
 
@@ -266,11 +348,11 @@ class BookingSystem:
                 return "I couldn't understand that date format. Please provide your date of birth in YYYY-MM-DD format."
 
         elif key == "date":
-            date_str = self._convert_relative_date(response)
+            date_str = converted_date or self._convert_relative_date(response)
             # Validate the date is not in the past
             try:
                 selected_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                today = datetime.now().date()
+                today = _today().date()
                 if selected_date < today:
                     return "Sorry, you cannot book appointments in the past. Please select a future date."
                 # Check if the date is too far in the future (e.g., more than 3 months)
@@ -310,9 +392,16 @@ class BookingSystem:
         next_question = self.ask_next_question()
         return next_question if next_question else self.confirm_booking()
 
-    def _convert_relative_date(self, response):
-        """Use AI to convert natural language dates into actual dates."""
-        today = datetime.today()
+    async def process_response_async(self, response):
+        """Async counterpart of process_response: the Gemini date conversion is awaited,
+        parsing and validation run in a worker thread so the event loop stays free"""
+        key, _ = self.questions[self.current_question_index]
+        converted_date = await self._convert_relative_date_async(response) if key == "date" else None
+        return await asyncio.to_thread(self.process_response, response, converted_date)
+
+    def _convert_simple_relative_date(self, response):
+        """Resolve today/tomorrow/day after tomorrow without the model"""
+        today = _today()
         lower_response = response.lower().strip()
 
         # Handle basic relative dates first
@@ -322,14 +411,25 @@ class BookingSystem:
             return (today + timedelta(days=1)).strftime("%Y-%m-%d")
         elif lower_response in ["day after tomorrow", "the day after tomorrow"]:
             return (today + timedelta(days=2)).strftime("%Y-%m-%d")
+        return None
 
-        # Use Gemini AI to process complex date expressions
-        prompt = f"""
+    def _get_date_conversion_prompt(self, response):
+        today = _today()
+        return f"""
         Convert the following natural language date into a YYYY-MM-DD format based on today's date ({today.strftime('%Y-%m-%d')}):
         "{response}"
         Only return the date in YYYY-MM-DD format.
         """
 
+    def _convert_relative_date(self, response):
+        """Use AI to convert natural language dates into actual dates."""
+        simple_date = self._convert_simple_relative_date(response)
+        if simple_date:
+            return simple_date
+
+        # Use Gemini AI to process complex date expressions
+        prompt = self._get_date_conversion_prompt(response)
+
         try:
             ai_response = self.model.generate_content(prompt)
             formatted_date = ai_response.text.strip()
@@ -343,14 +443,37 @@ class BookingSystem:
             print(f"⚠️ Error using AI for date conversion: {str(e)}")
 
         # Fallback to dateparser if AI fails
-        parsed_date = dateparser.parse(response)
+        parsed_date = dateparser.parse(response, settings={"RELATIVE_BASE": _today()})
+        return parsed_date.strftime("%Y-%m-%d") if parsed_date else response
+
+    async def _convert_relative_date_async(self, response):
+        """Async counterpart of _convert_relative_date"""
+        simple_date = self._convert_simple_relative_date(response)
+        if simple_date:
+            return simple_date
+
+        prompt = self._get_date_conversion_prompt(response)
+
+        try:
+            ai_response = await self.model.generate_content_async(prompt)
+            parsed_date = await asyncio.to_thread(dateparser.parse, ai_response.text.strip())
+            if parsed_date:
+                return parsed_date.strftime("%Y-%m-%d")
+
+        except Exception as e:
+            print(f"⚠️ Error using AI for date conversion: {str(e)}")
+
+        parsed_date = await asyncio.to_thread(dateparser.parse, response, settings={"RELATIVE_BASE": _today()})
         return parsed_date.strftime("%Y-%m-%d") if parsed_date else response
 
     def _save_booking_data(self):
-        """Save structured booking data to JSON file"""
+        """Save structured booking data to the state store or JSON file"""
         try:
-            with open(self.booking_file, 'w', encoding='utf-8') as f:
-                json.dump(self.booking_data, f, indent=2, ensure_ascii=False)
+            if self.store is not None:
+                self.store.save_booking_data(self.session_id, self.booking_data)
+            else:
+                with open(self.booking_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.booking_data, f, indent=2, ensure_ascii=False)
             print("\n Booking details successfully saved.")
         except Exception as e:
             print(f"\n   Error saving booking data: {str(e)}")
@@ -383,56 +506,184 @@ class BookingSystem:
 
 
 
+FAQ_GUIDELINES = """- When answering FAQ questions, provide direct and specific answers
+- Use bullet points for multi-part answers
+- Include relevant pricing and timing information
+- Reference specific FAQ entries when available"""
+
+CORE_INSTRUCTIONS = """Core Instructions:
+1. If the user wants to book an appointment, respond with "[START_BOOKING]"
+2. For booking requests, use transitions like:
+   - "Great choice! Let me help you book the [service]. [START_BOOKING]"
+   - "I'll assist you with booking the [service] right away. [START_BOOKING]"
+3. Otherwise, provide information from the knowledge base and faq 
+4. Keep responses concise and professional
+5. Do not make up information not in the knowledge base
+6. Always respond in English unless explicitly asked otherwise
+7. Follow the tone and style specified in the Behavior Instructions above
+
+
+Note: Follow the Instruction carefully for a better understanding of AI behavior and response tone. Ensure that the AI response aligns with the given guidelines and incorporates any additional changes as required."""
+
+INITIAL_INSTRUCTIONS = """Instructions for first message:
+1. Start with "Welcome to \n[Business Name]!\n"
+2. Briefly list 2-3 main services with their prices (if avaliable)
+3. End with: "Would you like to learn more about our services or book an appointment?"
+4. Only provide information from the knowledge base and FAQ
+5. Follow the tone and style specified in the Behavior Instructions above
+
+
+Keep the message under 60 words.
+
+IF the a answare of the question is not avalable in the the database always return with this exact response "I'm sorry, I am an AI receptionist and do not have access to the information." (Do not mention the name of the business)"""
+
+
+def _format_faq_content(Faq_content) -> str:
+    """Format the FAQ content (list of dictionaries or plain text) as a string"""
+    if not Faq_content:
+        return "No FAQ information available."
+    if isinstance(Faq_content, str):
+        return Faq_content
+
+    formatted_faq = ""
+    for faq in Faq_content:
+        formatted_faq += f"- Q: {faq['question']}\n  A: {faq['answer']}\n"
+    return formatted_faq.rstrip()
+
+
+class CompiledPrompts:
+    """Tenant-level prompt parts, built once per KB/FAQ/instruction version"""
+
+    def __init__(self, knowledge_base_content: str, Faq_content, user_instruction_content: str):
+        # Must stay byte-identical across turns and sessions (no timestamps or per-turn data)
+        # so its content hash can key the provider-side cache
+        self.static_prefix = (
+            "You are an AI receptionist for an appointment booking system (Always respond in English).\n\n"
+            f"Knowledge Base:\n{knowledge_base_content.strip()}\n\n"
+            f"FAQ Information:\n{_format_faq_content(Faq_content).strip()}\n"
+            f"{FAQ_GUIDELINES}\n\n"
+            f"Behavior Instructions:\n{user_instruction_content.strip()}"
+        )
+        self.initial_prompt = f"{self.static_prefix}\n\n{INITIAL_INSTRUCTIONS}"
+        self.prefix_sections = section_tokens(
+            intro="You are an AI receptionist for an appointment booking system (Always respond in English).",
+            knowledge_base=knowledge_base_content.strip(),
+            faq=_format_faq_content(Faq_content).strip(),
+            faq_guidelines=FAQ_GUIDELINES,
+            instructions=user_instruction_content.strip(),
+        )
+        self.initial_tokens = estimate_tokens(INITIAL_INSTRUCTIONS)
+        self.turn_template = PromptTemplate([
+            "Conversation History:\n", Slot("history"),
+            f"\n\n{CORE_INSTRUCTIONS}\n\n", "User message: ", Slot("user_input"),
+        ])
+
+        # FAQ entries with their terms, so per-turn scoring is a set intersection
+        if isinstance(Faq_content, list):
+            entries = [f"- Q: {faq['question']}\n  A: {faq['answer']}" for faq in Faq_content]
+        else:
+            entries = re.split(r'\n\s*\n|\n(?=\s*Q:)', Faq_content or "")
+        self.faq_entries = [(frozenset(tokenize(entry)), entry.strip()) for entry in entries if entry.strip()]
+
+
+class TenantBundle:
+    """Everything derived from one tenant's content: parsed service catalog, FAQ and KB indexes,
+    intent matcher, content hashes and compiled prompts. Built once per content version and
+    shared by every session, so a new conversation only adds its history and appointments."""
+
+    def __init__(self, knowledge_base_content: str, available_services_content: str, user_instruction_content: str, Faq_content):
+        self.knowledge_base_content = knowledge_base_content
+        self.user_instruction_content = user_instruction_content
+        self.Faq_content = Faq_content
+        self.services = BookingSystem._load_services(available_services_content)
+        self.knowledge_index = get_knowledge_base_index(knowledge_base_content)
+        self.faq_index = get_faq_index(Faq_content)
+        self.intent_matcher = get_intent_matcher(self.services)
+        # Content hashes key the response cache, so edits to KB/FAQ or instructions invalidate it
+        self.knowledge_hash = content_hash(f"{knowledge_base_content}\n{content_hash(Faq_content)}")
+        self.instruction_hash = content_hash(user_instruction_content)
+        self.version = content_hash(f"{self.knowledge_hash}|{self.instruction_hash}|{content_hash(self.services)}")
+        self.prompts = get_compiled_prompts(
+            content_hash(f"{self.knowledge_hash}|{self.instruction_hash}"),
+            lambda: CompiledPrompts(knowledge_base_content, Faq_content, user_instruction_content)
+        )
+
+
+def _bundle_size(bundle: TenantBundle) -> int:
+    """Rough bundle memory: the contents, plus the KB index and compiled prompts at a few times the KB"""
+    faq = bundle.Faq_content if isinstance(bundle.Faq_content, str) else json.dumps(bundle.Faq_content)
+    return 4 * len(bundle.knowledge_base_content) + 3 * len(faq) + len(bundle.user_instruction_content) \
+        + sum(len(service) + 50 for service in bundle.services)
+
+
+def get_tenant_bundle(knowledge_base_content: str, available_services_content: str, user_instruction_content: str,
+                      Faq_content) -> TenantBundle:
+    """Compiled bundle for this tenant content, looked up by the raw strings (hashed and compared in full,
+    so once per turn; pass the bundle on rather than looking it up again)"""
+    faq_key = Faq_content if isinstance(Faq_content, str) else json.dumps(Faq_content, sort_keys=True, ensure_ascii=False)
+    key = (knowledge_base_content, available_services_content, user_instruction_content, faq_key)
+    return get_default_tenant_bundle_cache(_bundle_size).get(key, lambda: TenantBundle(
+        knowledge_base_content.strip(),
+        available_services_content.strip(),
+        user_instruction_content.strip(),
+        Faq_content.strip() if isinstance(Faq_content, str) else Faq_content
+    ))
+
+
 class AppointmentChatbot:
-    def __init__(self, api_key: str, knowledge_base_content: str, available_services_content: str, user_instruction_content: str, Faq_content: str, appointments_content: str = "[]"):
+    def __init__(self, api_key: str, knowledge_base_content: str, available_services_content: str, user_instruction_content: str, Faq_content: str, appointments_content: str = "[]", knowledge_source=None, token_budget: int = None, context_cache=None, llm_backend=None, local_llm_backend=None, state_store=None, session_id: str = None, tenant: TenantBundle = None):
         self.api_key = api_key
-        self.user_instruction_content = user_instruction_content  # Store content directly
-        self.knowledge_base_content = knowledge_base_content
-        self.Faq_content = Faq_content  # Store content directly
-        self.conversation_memory = ConversationMemory()
-        self.booking_system = BookingSystem(api_key, available_services_content, appointments_content)  # Pass content
+        # Parsed tenant content, shared with every other session on the same content
+        self.tenant = tenant or get_tenant_bundle(knowledge_base_content, available_services_content,
+                                                  user_instruction_content, Faq_content)
+        self.user_instruction_content = self.tenant.user_instruction_content  # Store content directly
+        self.knowledge_base_content = self.tenant.knowledge_base_content
+        # Any object with get_relevant_context(query) works here (BM25 index, vector store)
+        self.knowledge_index = knowledge_source or self.tenant.knowledge_index
+        self.Faq_content = self.tenant.Faq_content  # Store content directly
+        self.faq_index = self.tenant.faq_index
+        self.knowledge_hash = self.tenant.knowledge_hash
+        self.instruction_hash = self.tenant.instruction_hash
+        self.session_id = session_id
+        self.conversation_memory = ConversationMemory(store=state_store, session_id=session_id)
+        self.booking_system = BookingSystem(api_key, available_services_content, appointments_content, llm_backend,
+                                            state_store, session_id, services=self.tenant.services)  # Pass content
         self.is_booking_in_progress = False
+        # Returned with every response and accepted back on the next request
+        self.last_booking_state = BookingState()
+        self.intent_matcher = self.tenant.intent_matcher
         
-        # Initialize Gemini
-        genai.configure(api_key=self.api_key)
-        self.model = genai.GenerativeModel("gemini-2.0-flash")
+        # Initialize the LLM backend (Gemini unless configured otherwise)
+        self.model = get_llm_backend(llm_backend or DEFAULT_LLM_BACKEND, api_key=self.api_key)
+        self.model_name = self.model.model_name
+        # Small local model for trivial turns; None sends every turn to the hosted model
+        local_llm_backend = local_llm_backend or DEFAULT_LOCAL_LLM_BACKEND
+        self.local_model = get_llm_backend(local_llm_backend) if local_llm_backend else None
+        # History summaries are a cheap job, so they go to the local model when there is one
+        self.conversation_memory.summary_model = self.local_model or self.model
+
+        # Hard ceiling on conversation prompt size
+        self.token_budget = token_budget or get_token_budget(self.model_name)
+        self.last_prompt_report = None
+        # Token estimate per section of the last prompt built, for turn metrics
+        self.last_prompt_sections = {}
+        # Whether the last call was sent on top of the provider-side cached prefix (False after a fallback)
+        self.used_cached_prefix = False
+
+        # Optional ContextCacheRegistry: the static prefix is registered once and each turn sends only the delta
+        self.context_cache = context_cache if self.model.provider == "gemini" else None
+
+        # Static prompt parts are compiled once per tenant content version and shared across requests
+        self.prompts = self.tenant.prompts
         
 
     def _extract_service_from_message(self, message):
         """Extract service name from booking request"""
-        # Common booking phrases
-        booking_phrases = [
-            "book the", "book a", "book an",
-            "schedule the", "schedule a", "schedule an",
-            "like to book", "want to book",
-            "like to schedule", "want to schedule"
-        ]
-        
-        message = message.lower()
-        
-        # First check if it's just a general booking request
-        general_booking_phrases = [
-            "book an appointment",
-            "schedule an appointment",
-            "like to book an appointment",
-            "want to book an appointment",
-            "make an appointment",
-            "get an appointment"
-        ]
-        
-        for phrase in general_booking_phrases:
-            if phrase in message:
-                return None  # Indicate this is a general booking request
-        
-        # Then check for specific service booking
-        for phrase in booking_phrases:
-            if phrase in message:
-                # Get the text after the booking phrase
-                service = message[message.find(phrase) + len(phrase):].strip()
-                # Remove common endings like "appointment", "session", etc.
-                service = re.sub(r'\s*(appointment|session|booking).*$', '', service)
-                return service if service else None
-        return None
+        intent = self.intent_matcher.detect(message)
+        if intent.service:
+            return intent.service
+        # None for a general booking request, otherwise the raw text after the booking phrase
+        return intent.service_text
     
 
     def process_booking_request(self, user_input):
@@ -466,70 +717,137 @@ class AppointmentChatbot:
             print(f"⚠️ {error_msg}")
             return f"ERROR: {error_msg}"
 
-    def _get_initial_prompt(self) -> str:
-        return f"""
-        You are an AI receptionist for an appointment booking system.
-
-        Knowledge Base:
-        {self.knowledge_base_content}
+    def _get_static_prefix(self) -> str:
+        return self.prompts.static_prefix
 
-        FAQ Information:
-        {self.Faq_content}
-
-        Behavior Instructions:
-        {self.user_instruction_content}
-
-        Instructions for first message:
-        1. Start with "Welcome to \n[Business Name]!\n"
-        2. Briefly list 2-3 main services with their prices (if avaliable)
-        3. End with: "Would you like to learn more about our services or book an appointment?"
-        4. Only provide information from the knowledge base and FAQ
-        5. Follow the tone and style specified in the Behavior Instructions above
-        
-        
-        Keep the message under 60 words.
-
-        IF the a answare of the question is not avalable in the the database always return with this exact response "I'm sorry, I am an AI receptionist and do not have access to the information." (Do not mention the name of the business)
-
-        
-        """
-
-    def _get_conversation_prompt(self, user_input: str, recent_context: str) -> str:
-        return f"""
-        You are an AI receptionist (Always respond in English).
-
-        Knowledge Base:
-        {self.knowledge_base_content}
-
-        FAQ Guidelines:
-        {self.Faq_content}
-        - When answering FAQ questions, provide direct and specific answers
-        - Use bullet points for multi-part answers
-        - Include relevant pricing and timing information
-        - Reference specific FAQ entries when available
-
-        Behavior Instructions:
-        {self.user_instruction_content}
-
-        Conversation History:
-        {recent_context}
-
-        Core Instructions:
-        1. If the user wants to book an appointment, respond with "[START_BOOKING]"
-        2. For booking requests, use transitions like:
-           - "Great choice! Let me help you book the [service]. [START_BOOKING]"
-           - "I'll assist you with booking the [service] right away. [START_BOOKING]"
-        3. Otherwise, provide information from the knowledge base and faq 
-        4. Keep responses concise and professional
-        5. Do not make up information not in the knowledge base
-        6. Always respond in English unless explicitly asked otherwise
-        7. Follow the tone and style specified in the Behavior Instructions above
-
-
-        Note: Follow the Instruction carefully for a better understanding of AI behavior and response tone. Ensure that the AI response aligns with the given guidelines and incorporates any additional changes as required.
-
-        User message: {user_input}
-        """
+    def _get_initial_prompt(self) -> str:
+        self.last_prompt_sections = dict(self.prompts.prefix_sections, initial_instructions=self.prompts.initial_tokens)
+        return self.prompts.initial_prompt
+
+    def _get_turn_prompt(self, user_input: str, recent_context: str) -> str:
+        """Per-turn part sent on top of the cached static prefix"""
+        history = recent_context.strip()
+        self.last_prompt_sections = dict(
+            self.prompts.prefix_sections,
+            **section_tokens(history=history, core_instructions=CORE_INSTRUCTIONS, user_message=user_input)
+        )
+        return self.prompts.turn_template.render(history=history, user_input=user_input)
+
+    def _generate(self, contents: str, handle=None, model=None, **kwargs):
+        """generate_content on `model` (default: the hosted model), with identical concurrent
+        requests sharing one in-flight call. Streaming and per-call options bypass coalescing."""
+        model = model or self.model
+        self.used_cached_prefix = handle is not None
+        if handle is None:
+            call = lambda: model.generate_content(contents, **kwargs)
+        else:
+            # The cached-content model bypasses the backend, so it takes the backend's limiter slot here
+            def call():
+                with self.model.limiter.slot(self._estimate_cached_call_tokens(contents)):
+                    return handle.model.generate_content(contents, **kwargs)
+        if kwargs:
+            return call()
+        key = content_hash(f"{model.model_name}|{handle.key if handle is not None else ''}|{contents}")
+        return get_default_single_flight().do(key, call)
+
+    async def _generate_async(self, contents: str, handle=None, model=None, **kwargs):
+        """Async counterpart of _generate"""
+        model = model or self.model
+        self.used_cached_prefix = handle is not None
+        if handle is None:
+            call = lambda: model.generate_content_async(contents, **kwargs)
+        else:
+            async def call():
+                async with self.model.limiter.slot_async(self._estimate_cached_call_tokens(contents)):
+                    return await handle.model.generate_content_async(contents, **kwargs)
+        if kwargs:
+            return await call()
+        key = content_hash(f"{model.model_name}|{handle.key if handle is not None else ''}|{contents}")
+        return await get_default_single_flight().do_async(key, call)
+
+    def _estimate_cached_call_tokens(self, contents: str) -> int:
+        # Cached prefix tokens still count towards the provider's tokens/minute
+        return self.model.estimate_call_tokens(contents) + estimate_tokens(self._get_static_prefix())
+
+    def _generate_with_prefix(self, turn_prompt: str, fallback_prompt, **kwargs):
+        """Send turn_prompt on top of the cached static prefix. When caching is unavailable, send
+        fallback_prompt() instead: the same (retrieved, budgeted) prompt as without a context cache,
+        never the whole prefix inline."""
+        handle = self.context_cache.get(self.model_name, self._get_static_prefix(), self.api_key)
+        if handle is not None:
+            return self._generate(turn_prompt, handle, **kwargs)
+        return self._generate(fallback_prompt(), **kwargs)
+
+    async def _generate_with_prefix_async(self, turn_prompt: str, fallback_prompt, **kwargs):
+        # Registering the prefix may be a blocking provider call
+        handle = await asyncio.to_thread(self.context_cache.get, self.model_name, self._get_static_prefix(),
+                                         self.api_key)
+        if handle is not None:
+            return await self._generate_async(turn_prompt, handle, **kwargs)
+        return await self._generate_async(await asyncio.to_thread(fallback_prompt), **kwargs)
+
+    def generate_initial_response(self, **kwargs):
+        """Generate the welcome message; sessions opening at the same moment share one call"""
+        if self.context_cache is not None:
+            return self._generate_with_prefix(INITIAL_INSTRUCTIONS, self._get_initial_prompt, **kwargs)
+        return self._generate(self._get_initial_prompt(), **kwargs)
+
+    async def generate_initial_response_async(self, **kwargs):
+        """Async counterpart of generate_initial_response"""
+        if self.context_cache is not None:
+            return await self._generate_with_prefix_async(INITIAL_INSTRUCTIONS, self._get_initial_prompt, **kwargs)
+        return await self._generate_async(self._get_initial_prompt(), **kwargs)
+
+    def generate_conversation_response(self, user_input: str, recent_context: str, model=None, **kwargs):
+        """Generate a reply for a regular (non-booking) turn, on the hosted model unless the router picked another"""
+        if model is not None and model is not self.model:
+            prompt = self._get_conversation_prompt(user_input, recent_context, get_token_budget(model.model_name))
+            return self._generate(prompt, model=model, **kwargs)
+        if self.context_cache is not None:
+            return self._generate_with_prefix(self._get_turn_prompt(user_input, recent_context),
+                                              lambda: self._get_conversation_prompt(user_input, recent_context), **kwargs)
+        return self._generate(self._get_conversation_prompt(user_input, recent_context), **kwargs)
+
+    async def generate_conversation_response_async(self, user_input: str, recent_context: str, model=None, **kwargs):
+        """Async counterpart of generate_conversation_response; prompt building runs in a worker thread"""
+        if model is not None and model is not self.model:
+            prompt = await asyncio.to_thread(self._get_conversation_prompt, user_input, recent_context,
+                                             get_token_budget(model.model_name))
+            return await self._generate_async(prompt, model=model, **kwargs)
+        if self.context_cache is not None:
+            return await self._generate_with_prefix_async(
+                self._get_turn_prompt(user_input, recent_context),
+                lambda: self._get_conversation_prompt(user_input, recent_context), **kwargs)
+        prompt = await asyncio.to_thread(self._get_conversation_prompt, user_input, recent_context)
+        return await self._generate_async(prompt, **kwargs)
+
+    def _get_faq_items(self, user_input: str) -> list:
+        """FAQ entries scored by word overlap with the user message"""
+        query_terms = set(tokenize(user_input))
+        return [(len(query_terms.intersection(terms)), entry) for terms, entry in self.prompts.faq_entries]
+
+    def _get_conversation_prompt(self, user_input: str, recent_context: str, token_budget: int = None) -> str:
+        # Older exchanges score lower so they are the first history to go
+        exchanges = [exchange for exchange in re.split(r'\n\n(?=User: )', recent_context.strip()) if exchange]
+        history_items = [(index, exchange) for index, exchange in enumerate(exchanges)]
+
+        assembler = PromptAssembler(token_budget or self.token_budget)
+        assembler.add("intro", "You are an AI receptionist (Always respond in English).", required=True)
+        assembler.add("knowledge_base", self.knowledge_index.get_relevant_sections(user_input, top_k=8),
+                      heading="Knowledge Base:", priority=60)
+        assembler.add("faq", self._get_faq_items(user_input), heading="FAQ Guidelines:", priority=70)
+        assembler.add("faq_guidelines", FAQ_GUIDELINES, required=True)
+        assembler.add("instructions", self.user_instruction_content, heading="Behavior Instructions:", priority=90)
+        assembler.add("history", history_items, heading="Conversation History:", priority=75, keep="last")
+        assembler.add("core_instructions", CORE_INSTRUCTIONS, required=True)
+        assembler.add("user_message", f"User message: {user_input}", required=True)
+
+        assembled = assembler.assemble()
+        self.last_prompt_report = assembled.report
+        self.last_prompt_sections = {entry["name"]: entry["kept_tokens"] for entry in assembled.report}
+        if assembled.was_cut:
+            print(f"✂️ Prompt trimmed to {assembled.total_tokens}/{assembled.budget} tokens ({assembled.cut_summary()})")
+        return assembled.text
     
     def run(self):
         """Main chat loop to handle user interactions"""
@@ -537,7 +855,7 @@ class AppointmentChatbot:
         
         # Send initial welcome message
         if self.conversation_memory.is_first_message:
-            response = self.model.generate_content(self._get_initial_prompt())
+            response = self.generate_initial_response()
             print("Bot:", response.text)
             self.conversation_memory.add_exchange("", response.text)
             self.conversation_memory.is_first_message = False
@@ -579,8 +897,7 @@ class AppointmentChatbot:
                 else:
                     # Regular conversation flow
                     recent_context = self.conversation_memory.get_recent_context()
-                    prompt = self._get_conversation_prompt(user_input, recent_context)
-                    response = self.model.generate_content(prompt)
+                    response = self.generate_conversation_response(user_input, recent_context)
                     bot_response = response.text.strip()
                     
                     # Check if we should start booking process
@@ -619,6 +936,341 @@ class AppointmentChatbot:
 
 
 
+def _create_chatbot(
+    api_key: str,
+    knowledge_base_content: str,
+    available_services_content: str,
+    user_instruction_content: str,
+    Faq_content: str,
+    appointments_content: str,
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    llm_backend=None,
+    local_llm_backend=None,
+    session_id: str = None,
+    tenant: TenantBundle = None
+) -> AppointmentChatbot:
+    """Build a chatbot for one request from the backend-provided content (tenant: its bundle, if already looked up)"""
+    # Use the embedded chunk store as context source when one is configured
+    knowledge_source = get_vector_store(vector_store_path, api_key) if vector_store_path else None
+
+    # Initialize chatbot with provided content; the tenant bundle holds the stripped and parsed parts
+    tenant = tenant or get_tenant_bundle(knowledge_base_content, available_services_content, user_instruction_content,
+                                         Faq_content)
+    chatbot = AppointmentChatbot(
+        api_key=api_key,
+        knowledge_base_content=tenant.knowledge_base_content,
+        available_services_content=available_services_content,
+        user_instruction_content=tenant.user_instruction_content,
+        Faq_content=tenant.Faq_content,
+        appointments_content=appointments_content.strip(),
+        knowledge_source=knowledge_source,
+        tenant=tenant,
+        context_cache=get_default_context_cache() if use_context_cache else None,
+        llm_backend=llm_backend,
+        local_llm_backend=local_llm_backend,
+        # Per-session history and booking rows when CHATBOT_STATE_DB is set and the request has a session id
+        state_store=get_default_state_store() if session_id else None,
+        session_id=session_id
+    )
+
+    # Load chat history if provided
+    if chat_history:
+        chatbot.conversation_memory.replace_history(chat_history)
+    store = chatbot.conversation_memory.store
+    if store is not None:
+        # Another worker may have served the previous turn of this booking
+        _resume_booking(chatbot, store.load_booking_state(session_id))
+    return chatbot
+
+
+def _session_size(chatbot: AppointmentChatbot) -> int:
+    """Rough per-session memory: the tenant bundle (indexes, services, compiled prompts) is shared,
+    so only the history and appointments count"""
+    booking = chatbot.booking_system
+    history = sum(len(exchange.get("user", "")) + len(exchange.get("bot", "")) + 100
+                  for exchange in chatbot.conversation_memory.history)
+    return SESSION_BASE_BYTES + history + 2 * len(booking.appointments_content)
+
+
+def _sync_session(chatbot: AppointmentChatbot, session, appointments_content: str, chat_history: list = None):
+    """Bring a reused chatbot in line with what the backend sent for this turn"""
+    if chat_history is not None:
+        # The backend's history wins (another worker served the last turn, or it was edited)
+        chatbot.conversation_memory.replace_history(chat_history)
+
+    appointments_hash = content_hash(appointments_content)
+    if appointments_hash != session.state.get("appointments_hash"):
+        # Someone else booked since the last turn
+        chatbot.booking_system.appointments_content = appointments_content
+        chatbot.booking_system.appointments = chatbot.booking_system._load_appointments()
+        session.state["appointments_hash"] = appointments_hash
+
+
+def _checkout_chatbot(
+    session_id: Optional[str],
+    api_key: str,
+    knowledge_base_content: str,
+    available_services_content: str,
+    user_instruction_content: str,
+    Faq_content: str,
+    appointments_content: str,
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    llm_backend=None,
+    local_llm_backend=None
+):
+    """(chatbot, session) for one turn. Without a session id a fresh chatbot is built per request;
+    with one, the live chatbot is reused from the session registry and the session lock is held
+    until _checkin, so turns of the same conversation never interleave."""
+    args = (api_key, knowledge_base_content, available_services_content, user_instruction_content, Faq_content,
+            appointments_content, chat_history, vector_store_path, use_context_cache, llm_backend, local_llm_backend)
+    # The only bundle lookup of the turn
+    tenant = get_tenant_bundle(knowledge_base_content, available_services_content, user_instruction_content, Faq_content)
+    if session_id is None:
+        return _create_chatbot(*args, tenant=tenant), None
+    args += (session_id,)
+
+    # Any change of tenant content or backend config starts the session over. The bundle lookup
+    # already keys on the content, so its version stands in for the content here.
+    fingerprint = hash((
+        api_key, tenant.version,
+        content_hash([vector_store_path, use_context_cache, llm_backend, local_llm_backend])
+    ))
+    registry = get_default_session_registry(_session_size)
+    session, created = registry.get(session_id, fingerprint, lambda: _create_chatbot(*args, tenant=tenant))
+    if not session.lock.acquire(timeout=SESSION_LOCK_TIMEOUT):
+        raise RuntimeError(f"Session {session_id} is still busy with a previous message")
+    try:
+        if created:
+            session.state["appointments_hash"] = content_hash(appointments_content.strip())
+        else:
+            _sync_session(session.value, session, appointments_content.strip(), chat_history)
+    except BaseException:
+        session.lock.release()
+        raise
+    return session.value, session
+
+
+async def _checkout_chatbot_async(*args):
+    """_checkout_chatbot in a worker thread, which also waits for the session lock there. A cancelled
+    turn cannot stop the thread, so it may still take the lock; the checkout is shielded and, when the
+    awaiting task is gone, whatever session it returns is checked straight back in."""
+    checkout = asyncio.ensure_future(asyncio.to_thread(_checkout_chatbot, *args))
+    try:
+        return await asyncio.shield(checkout)
+    except asyncio.CancelledError:
+        checkout.add_done_callback(_checkin_abandoned)
+        raise
+
+
+def _checkin_abandoned(checkout):
+    if not checkout.cancelled() and checkout.exception() is None:
+        _checkin(checkout.result()[1])
+
+
+def _resume_booking(chatbot: AppointmentChatbot, booking_state: dict = None):
+    """Restore the booking flow from the state the backend sent back. A live session chatbot
+    that produced this very state already has it and is left alone."""
+    state = BookingState.from_dict(booking_state)
+    if state is None or state.to_dict() == chatbot.last_booking_state.to_dict():
+        return
+    state.apply(chatbot.booking_system)
+    chatbot.is_booking_in_progress = state.active
+    chatbot.last_booking_state = state
+
+
+def _checkin(session):
+    """End of turn: release the session and let the registry re-measure it"""
+    if session is not None:
+        get_default_session_registry().touch(session)
+        session.lock.release()
+
+
+def _answer_without_llm(chatbot: AppointmentChatbot, user_input: str, response_cache=None) -> Optional[str]:
+    """Answer from the booking flow, a clear booking request, an FAQ hit or the response cache.
+    Returns None when the turn needs the LLM."""
+    if chatbot.is_booking_in_progress:
+        # Handle booking flow
+        bot_response = chatbot.booking_system.process_response(user_input)
+
+        # Check if booking is complete
+        if "successfully booked" in bot_response:
+            chatbot.is_booking_in_progress = False
+        return bot_response
+
+    if chatbot.intent_matcher.detect(user_input).is_clear_booking:
+        # Unambiguous booking request: enter the booking flow without waiting for Gemini
+        chatbot.is_booking_in_progress = True
+        return chatbot.process_booking_request(user_input)
+
+    # High-confidence FAQ hits are answered locally without calling Gemini
+    faq_match = chatbot.faq_index.match(user_input)
+    if faq_match:
+        return faq_match[1]
+
+    if response_cache is not None:
+        return response_cache.get(chatbot.knowledge_hash, chatbot.instruction_hash, user_input, chatbot.model_name,
+                                  _conversation_hash(chatbot))
+    return None
+
+
+def _conversation_hash(chatbot: AppointmentChatbot) -> str:
+    """Response cache context: the exchanges so far ("" for an opening question)"""
+    history = chatbot.conversation_memory.history
+    if not history:
+        return ""
+    return content_hash([(exchange.get("user"), exchange.get("bot")) for exchange in history])
+
+
+def _cache_llm_response(chatbot: AppointmentChatbot, user_input: str, bot_response: str, latency: float, response_cache=None,
+                        model=None):
+    """Only plain answers are reusable; booking turns depend on per-session state. Lookups are for
+    the hosted model, so answers the router sent to the local model are not stored."""
+    if model is not None and model is not chatbot.model:
+        return
+    if response_cache is not None and "[START_BOOKING]" not in bot_response:
+        response_cache.put(chatbot.knowledge_hash, chatbot.instruction_hash, user_input, bot_response, latency,
+                           chatbot.model_name, _conversation_hash(chatbot))
+
+
+def _start_booking_if_requested(chatbot: AppointmentChatbot, user_input: str, bot_response: str) -> str:
+    """Strip the [START_BOOKING] marker and append the first booking question"""
+    if "[START_BOOKING]" in bot_response:
+        chatbot.is_booking_in_progress = True
+        bot_response = bot_response.replace("[START_BOOKING]", "").strip()
+        booking_response = chatbot.process_booking_request(user_input)
+        bot_response = f"{bot_response}\n\n{booking_response}"
+    return bot_response
+
+
+def _record_turn_metrics(chatbot: AppointmentChatbot, model, bot_response: str, latency: float, route: str = None):
+    """Per-turn prompt size breakdown, keyed by tenant (the KB+FAQ content hash)"""
+    get_default_turn_metrics().record(
+        tenant=chatbot.knowledge_hash[:16],
+        model=model.model_name,
+        sections=chatbot.last_prompt_sections,
+        output_text=bot_response,
+        llm_seconds=latency,
+        route=route,
+        cached_prefix=chatbot.used_cached_prefix,
+    )
+
+
+def _route_turn(chatbot: AppointmentChatbot, user_input: str):
+    """Pick the model for an LLM turn: (model, decision), with decision None when routing is off"""
+    if chatbot.local_model is None:
+        return chatbot.model, None
+    decision = get_default_model_router().classify(user_input, chatbot.intent_matcher.detect(user_input),
+                                                   chatbot.knowledge_index)
+    return (chatbot.local_model if decision.route == LOCAL else chatbot.model), decision
+
+
+def _generate_routed(chatbot: AppointmentChatbot, user_input: str, recent_context: str):
+    """Run the turn on the routed model and return (text, latency, model that answered);
+    a failed local call is redone on the hosted model"""
+    model, decision = _route_turn(chatbot, user_input)
+    started = time.perf_counter()
+    try:
+        bot_response = chatbot.generate_conversation_response(user_input, recent_context, model).text.strip()
+    except Exception as e:
+        if decision is not None:
+            get_default_model_router().record(decision, model.model_name, time.perf_counter() - started, e)
+        if model is chatbot.model:
+            raise
+        print(f"⚠️ Local model failed ({str(e)}), using {chatbot.model_name}")
+        started = time.perf_counter()
+        bot_response = chatbot.generate_conversation_response(user_input, recent_context).text.strip()
+        latency = time.perf_counter() - started
+        _record_turn_metrics(chatbot, chatbot.model, bot_response, latency, "fallback")
+        return bot_response, latency, chatbot.model
+
+    latency = time.perf_counter() - started
+    if decision is not None:
+        get_default_model_router().record(decision, model.model_name, latency)
+    _record_turn_metrics(chatbot, model, bot_response, latency, decision.route if decision else None)
+    return bot_response, latency, model
+
+
+async def _generate_routed_async(chatbot: AppointmentChatbot, user_input: str, recent_context: str):
+    """Async counterpart of _generate_routed; the router log and turn metrics are file writes, so they run
+    in the default thread pool"""
+    model, decision = _route_turn(chatbot, user_input)
+    started = time.perf_counter()
+    try:
+        response = await chatbot.generate_conversation_response_async(user_input, recent_context, model)
+        bot_response = response.text.strip()
+    except Exception as e:
+        if decision is not None:
+            await asyncio.to_thread(get_default_model_router().record, decision, model.model_name,
+                                    time.perf_counter() - started, e)
+        if model is chatbot.model:
+            raise
+        print(f"⚠️ Local model failed ({str(e)}), using {chatbot.model_name}")
+        started = time.perf_counter()
+        response = await chatbot.generate_conversation_response_async(user_input, recent_context)
+        bot_response, latency = response.text.strip(), time.perf_counter() - started
+        await asyncio.to_thread(_record_turn_metrics, chatbot, chatbot.model, bot_response, latency, "fallback")
+        return bot_response, latency, chatbot.model
+
+    latency = time.perf_counter() - started
+    if decision is not None:
+        await asyncio.to_thread(get_default_model_router().record, decision, model.model_name, latency)
+    await asyncio.to_thread(_record_turn_metrics, chatbot, model, bot_response, latency,
+                            decision.route if decision else None)
+    return bot_response, latency, model
+
+
+def _build_response_data(chatbot: AppointmentChatbot, user_input: str, bot_response: str) -> dict:
+    """Record the exchange and build the response for the backend"""
+    # Check if response contains restricted message
+    restricted_message = "I'm sorry, I am an AI receptionist"
+    response_success = not bool(re.search(re.escape(restricted_message), bot_response))
+
+    response_data = {
+        "success": response_success,
+        "message": bot_response,
+        "is_booking": chatbot.is_booking_in_progress,
+        "booking_data": chatbot.booking_system.booking_data,
+        "appointments": chatbot.booking_system.get_appointments()
+    }
+
+    # An answer that did not move the booking to the next question was rejected by validation
+    previous, booking = chatbot.last_booking_state, chatbot.booking_system
+    rejected = previous.active and chatbot.is_booking_in_progress and previous.step == booking.current_question_index
+    chatbot.last_booking_state = BookingState.capture(booking, chatbot.is_booking_in_progress, previous,
+                                                      bot_response if rejected else None)
+    response_data["booking_state"] = chatbot.last_booking_state.to_dict()
+    store = chatbot.conversation_memory.store
+    if store is not None and response_data["booking_state"] != previous.to_dict():
+        try:
+            store.save_booking_state(chatbot.session_id, response_data["booking_state"])
+        except Exception as e:
+            print(f"⚠️ Error saving booking state: {str(e)}")
+
+    # Add the exchange to history
+    chatbot.conversation_memory.add_exchange(user_input, bot_response)
+
+    # Include updated history in response
+    response_data["chat_history"] = chatbot.conversation_memory.history
+    return response_data
+
+
+def _error_response(error: Exception, chat_history: list = None, booking_state: dict = None) -> dict:
+    return {
+        "success": False,
+        "message": f"Error processing request: {str(error)}",
+        "is_booking": False,
+        "booking_data": None,
+        "appointments": [],
+        "chat_history": chat_history or [],
+        # Unchanged, so a retry resumes where the booking was
+        "booking_state": booking_state
+    }
+
+
 def process_user_input(
     api_key: str,
     knowledge_base_content: str,
@@ -627,84 +1279,168 @@ def process_user_input(
     Faq_content: str,
     appointments_content: str,
     user_input: str,
-    chat_history: list = None
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    use_response_cache: bool = True,
+    llm_backend=None,
+    local_llm_backend=None,
+    session_id: str = None,
+    booking_state: dict = None
 ) -> dict:
 
+    session = None
     try:
-        # Initialize chatbot with provided content
-        chatbot = AppointmentChatbot(
-            api_key=api_key,
-            knowledge_base_content=knowledge_base_content.strip(),
-            available_services_content=available_services_content.strip(),
-            user_instruction_content=user_instruction_content.strip(),
-            Faq_content = Faq_content.strip(),
-            appointments_content=appointments_content.strip()
-        )
+        response_cache = get_default_response_cache() if use_response_cache else None
+        chatbot, session = _checkout_chatbot(session_id, api_key, knowledge_base_content, available_services_content,
+                                             user_instruction_content, Faq_content, appointments_content, chat_history,
+                                             vector_store_path, use_context_cache, llm_backend, local_llm_backend)
+        _resume_booking(chatbot, booking_state)
+
+        bot_response = _answer_without_llm(chatbot, user_input, response_cache)
+        if bot_response is None:
+            # Regular conversation flow
+            recent_context = chatbot.conversation_memory.get_recent_context()
+            bot_response, latency, model = _generate_routed(chatbot, user_input, recent_context)
+            _cache_llm_response(chatbot, user_input, bot_response, latency, response_cache, model)
+
+            # Check if we should start booking process
+            bot_response = _start_booking_if_requested(chatbot, user_input, bot_response)
+
+        return _build_response_data(chatbot, user_input, bot_response)
         
-        # Load chat history if provided
-        if chat_history:
-            chatbot.conversation_memory.history = chat_history
-            
-        # Process the input based on booking state
+    except Exception as e:
+        return _error_response(e, chat_history, booking_state)
+    finally:
+        _checkin(session)
+
+
+def process_user_input_stream(
+    api_key: str,
+    knowledge_base_content: str,
+    available_services_content: str,
+    user_instruction_content: str,
+    Faq_content: str,
+    appointments_content: str,
+    user_input: str,
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    use_response_cache: bool = True,
+    llm_backend=None,
+    local_llm_backend=None,
+    session_id: str = None,
+    booking_state: dict = None
+):
+    """Streaming variant of process_user_input: yields text chunks as Gemini produces them,
+    then the same response dict as process_user_input as the last item.
+    Booking markers are never yielded; as soon as one shows up the rest of the generation
+    is skipped and the first booking question is streamed instead."""
+    session = None
+    try:
+        response_cache = get_default_response_cache() if use_response_cache else None
+        chatbot, session = _checkout_chatbot(session_id, api_key, knowledge_base_content, available_services_content,
+                                             user_instruction_content, Faq_content, appointments_content, chat_history,
+                                             vector_store_path, use_context_cache, llm_backend, local_llm_backend)
+        _resume_booking(chatbot, booking_state)
+
+        bot_response = _answer_without_llm(chatbot, user_input, response_cache)
+        if bot_response is not None:
+            yield bot_response
+        else:
+            recent_context = chatbot.conversation_memory.get_recent_context()
+            model, decision = _route_turn(chatbot, user_input)
+            started = time.perf_counter()
+            marker_filter = MarkerFilter()
+            response = chatbot.generate_conversation_response(user_input, recent_context, model, stream=True)
+            for chunk in response:
+                visible = marker_filter.feed(chunk.text)
+                if visible:
+                    yield visible
+                if marker_filter.found:
+                    break
+            tail = marker_filter.flush()
+            if tail:
+                yield tail
+
+            bot_response = marker_filter.text.strip()
+            latency = time.perf_counter() - started
+            if decision is not None:
+                get_default_model_router().record(decision, model.model_name, latency)
+            _record_turn_metrics(chatbot, model, bot_response, latency, decision.route if decision else None)
+            if marker_filter.found:
+                chatbot.is_booking_in_progress = True
+                booking_response = chatbot.process_booking_request(user_input)
+                separator = "\n\n" if bot_response else ""
+                yield f"{separator}{booking_response}"
+                bot_response = f"{bot_response}{separator}{booking_response}"
+            else:
+                _cache_llm_response(chatbot, user_input, bot_response, latency, response_cache, model)
+
+        yield _build_response_data(chatbot, user_input, bot_response)
+
+    except Exception as e:
+        yield _error_response(e, chat_history, booking_state)
+    finally:
+        _checkin(session)
+
+
+async def process_user_input_async(
+    api_key: str,
+    knowledge_base_content: str,
+    available_services_content: str,
+    user_instruction_content: str,
+    Faq_content: str,
+    appointments_content: str,
+    user_input: str,
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    use_response_cache: bool = True,
+    llm_backend=None,
+    local_llm_backend=None,
+    session_id: str = None,
+    booking_state: dict = None
+) -> dict:
+    """Async counterpart of process_user_input. Gemini calls are awaited with the async client;
+    setup, date parsing and history serialization run in the default thread pool,
+    so one event loop can serve many conversations while they wait on the network."""
+    session = None
+    try:
+        response_cache = get_default_response_cache() if use_response_cache else None
+        # Also waits for the session lock in the worker thread, off the event loop
+        chatbot, session = await _checkout_chatbot_async(
+            session_id, api_key, knowledge_base_content, available_services_content,
+            user_instruction_content, Faq_content, appointments_content, chat_history, vector_store_path,
+            use_context_cache, llm_backend, local_llm_backend
+        )
+        _resume_booking(chatbot, booking_state)
+
         if chatbot.is_booking_in_progress:
             # Handle booking flow
-            bot_response = chatbot.booking_system.process_response(user_input)
-            
-            # Check if booking is complete
+            bot_response = await chatbot.booking_system.process_response_async(user_input)
             if "successfully booked" in bot_response:
                 chatbot.is_booking_in_progress = False
-            
-            response_data = {
-                "success": True,
-                "message": bot_response,
-                "is_booking": chatbot.is_booking_in_progress,
-                "booking_data": chatbot.booking_system.booking_data,
-                "appointments": chatbot.booking_system.get_appointments()
-            }
-            
         else:
+            # FAQ match and response cache lookup (SQLite) off the event loop
+            bot_response = await asyncio.to_thread(_answer_without_llm, chatbot, user_input, response_cache)
+
+        if bot_response is None:
             # Regular conversation flow
             recent_context = chatbot.conversation_memory.get_recent_context()
-            prompt = chatbot._get_conversation_prompt(user_input, recent_context)
-            response = chatbot.model.generate_content(prompt)
-            bot_response = response.text.strip()
-            
+            bot_response, latency, model = await _generate_routed_async(chatbot, user_input, recent_context)
+            await asyncio.to_thread(_cache_llm_response, chatbot, user_input, bot_response, latency, response_cache, model)
+
             # Check if we should start booking process
-            if "[START_BOOKING]" in bot_response:
-                chatbot.is_booking_in_progress = True
-                bot_response = bot_response.replace("[START_BOOKING]", "").strip()
-                booking_response = chatbot.process_booking_request(user_input)
-                bot_response = f"{bot_response}\n\n{booking_response}"
-            
-            # Check if response contains restricted message
-            restricted_message = "I'm sorry, I am an AI receptionist"
-            response_success = not bool(re.search(re.escape(restricted_message), bot_response))
-            
-            response_data = {
-                "success": response_success,
-                "message": bot_response,
-                "is_booking": chatbot.is_booking_in_progress,
-                "booking_data": chatbot.booking_system.booking_data,
-                "appointments": chatbot.booking_system.get_appointments()
-            }
-        
-        # Add the exchange to history
-        chatbot.conversation_memory.add_exchange(user_input, bot_response)
-        
-        # Include updated history in response
-        response_data["chat_history"] = chatbot.conversation_memory.history
-        
-        return response_data
-        
+            bot_response = _start_booking_if_requested(chatbot, user_input, bot_response)
+
+        return await asyncio.to_thread(_build_response_data, chatbot, user_input, bot_response)
+
     except Exception as e:
-        return {
-            "success": False,
-            "message": f"Error processing request: {str(e)}",
-            "is_booking": False,
-            "booking_data": None,
-            "appointments": [],
-            "chat_history": chat_history or []
-        }
+        return _error_response(e, chat_history, booking_state)
+    finally:
+        _checkin(session)
+
 
 def main(
     api_key: str,
@@ -714,7 +1450,14 @@ def main(
     Faq_content: str,
     user_input: str,
     appointments_content: str = "[]",
-    chat_history: list = None
+    chat_history: list = None,
+    vector_store_path: str = None,
+    use_context_cache: bool = False,
+    use_response_cache: bool = True,
+    llm_backend=None,
+    local_llm_backend=None,
+    session_id: str = None,
+    booking_state: dict = None
 ) -> dict:
 
     if not api_key:
@@ -735,7 +1478,14 @@ def main(
         Faq_content = Faq_content,
         appointments_content=appointments_content,
         user_input=user_input,
-        chat_history=chat_history
+        chat_history=chat_history,
+        vector_store_path=vector_store_path,
+        use_context_cache=use_context_cache,
+        use_response_cache=use_response_cache,
+        llm_backend=llm_backend,
+        local_llm_backend=local_llm_backend,
+        session_id=session_id,
+        booking_state=booking_state
     )
 
 # Example usage:
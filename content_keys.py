@@ -0,0 +1,15 @@
+import hashlib
+import json
+import re
+
+
+def content_hash(text) -> str:
+    """Stable hash of tenant content (str, or any JSON-serializable value such as a FAQ list)"""
+    if not isinstance(text, str):
+        text = json.dumps(text, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def normalize_question(question: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace: "What are your hours?!" -> "what are your hours\""""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
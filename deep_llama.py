@@ -3,11 +3,12 @@ import hashlib
 import requests
 import pdfplumber
 from bs4 import BeautifulSoup
-from langchain_ollama import OllamaLLM
 from tqdm import tqdm  # Progress bar
 
+from llm_backends import get_llm_backend
+
 # Load the Ollama model
-llm = OllamaLLM(model="deepseek-r1:14b")
+llm = get_llm_backend(os.getenv("DEEP_LLAMA_LLM", "ollama:deepseek-r1:14b"))
 
 # File to store extracted knowledge
 KNOWLEDGE_FILE = "knowledge_base.txt"
@@ -96,7 +97,7 @@ def get_ai_response(user_input, knowledge_base):
     """
 
     # Call the local Ollama model to generate a response
-    response = llm.invoke(prompt)
+    response = llm.generate(prompt)
 
     # Ensure a valid response
     if not response or any(
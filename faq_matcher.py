@@ -0,0 +1,88 @@
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from rapidfuzz import fuzz, process
+
+from content_keys import content_hash, normalize_question
+
+
+DEFAULT_THRESHOLD = 88
+MAX_INDEXES = 64
+
+
+def parse_faq(faq_content) -> List[Tuple[str, str]]:
+    """Return (question, answer) pairs from a list of {question, answer} dicts or "Q: ... A: ..." text"""
+    if not faq_content:
+        return []
+    if isinstance(faq_content, list):
+        return [(faq["question"].strip(), faq["answer"].strip())
+                for faq in faq_content if faq.get("question") and faq.get("answer")]
+
+    pairs = []
+    for match in re.finditer(r'Q:\s*(.+?)\s*\n\s*A:\s*(.+?)(?=\n\s*(?:-\s*)?Q:|\Z)', faq_content, re.DOTALL):
+        pairs.append((match.group(1).strip(), " ".join(match.group(2).split())))
+    return pairs
+
+
+class FAQIndex:
+    """Fuzzy lookup of a user message against a tenant's FAQ questions"""
+
+    def __init__(self, faq_content, threshold: float = DEFAULT_THRESHOLD):
+        self.entries = parse_faq(faq_content)
+        self.questions = [normalize_question(question) for question, _ in self.entries]
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def match(self, user_input: str) -> Optional[Tuple[str, str, float]]:
+        """Return (question, answer, score) for a confident match, else None.
+        token_sort_ratio ignores word order but, unlike token_set_ratio, penalizes extra words,
+        so "what are your hours, and can I book a massage" does not count as the hours question."""
+        query = normalize_question(user_input)
+        result = None
+        if query and self.questions:
+            result = process.extractOne(query, self.questions, scorer=fuzz.token_sort_ratio,
+                                        score_cutoff=self.threshold)
+
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        _, score, index = result
+        question, answer = self.entries[index]
+        return question, answer, score
+
+    def stats(self) -> dict:
+        """Hit/miss counters for the short-circuit"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_faq_indexes: "OrderedDict[str, FAQIndex]" = OrderedDict()
+_faq_indexes_lock = threading.Lock()
+
+
+def get_faq_index(faq_content) -> FAQIndex:
+    """Return the FAQ index for this tenant's FAQ, building it only once"""
+    version = content_hash(faq_content or "")
+    with _faq_indexes_lock:
+        index = _faq_indexes.get(version)
+        if index is None:
+            index = FAQIndex(faq_content)
+            _faq_indexes[version] = index
+            if len(_faq_indexes) > MAX_INDEXES:
+                _faq_indexes.popitem(last=False)
+        else:
+            _faq_indexes.move_to_end(version)
+        return index
@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import weakref
+from typing import Optional, Tuple
+
+from content_keys import content_hash
+
+
+DEFAULT_MODEL = "gemini-2.0-flash"
+
+
+class GenaiResponse:
+    """Response object with the same .text attribute as a google.generativeai response"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+def response_text(response) -> str:
+    """Text parts of the first candidate ("" when the response was blocked or empty)"""
+    if not response.candidates:
+        return ""
+    return "".join(part.text for part in response.candidates[0].content.parts)
+
+
+def model_path(model_name: str) -> str:
+    return model_name if model_name.startswith("models/") else f"models/{model_name}"
+
+
+class GenaiClientRegistry:
+    """Gemini API clients shared by the whole process, one per (api key, client options, service).
+    Clients come from google.ai.generativelanguage, the public low-level API under google.generativeai,
+    and each carries its own key and options: genai.configure is process-global, so a tenant's key or the
+    stand-in endpoint set there would leak into every other caller. gRPC asyncio channels belong to the
+    event loop that created them, so async clients are kept per running loop."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = {}
+        # event loop -> {client key: async client}
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._models = {}
+        self.clients_created = 0
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _client_key(api_key: Optional[str], service: str, client_kwargs: dict) -> Tuple:
+        # The key is hashed so it never sits in a dict key or shows up in a repr
+        return (content_hash(api_key or ""), service, content_hash(client_kwargs))
+
+    @staticmethod
+    def _make_client(api_key: Optional[str], service: str, asynchronous: bool,
+                     transport: Optional[str] = None, client_options: Optional[dict] = None):
+        import google.ai.generativelanguage as glm
+
+        # Same fallback as genai.configure
+        api_key = api_key or os.getenv("GEMINI_API_KEY") or os.getenv("GOOGLE_API_KEY")
+        options = dict(client_options or {})
+        if api_key:
+            options["api_key"] = api_key
+        if asynchronous:
+            # Async clients are gRPC-only
+            return getattr(glm, f"{service.title()}ServiceAsyncClient")(client_options=options)
+        return getattr(glm, f"{service.title()}ServiceClient")(transport=transport, client_options=options)
+
+    def get_client(self, api_key: Optional[str] = None, service: str = "generative", **client_kwargs):
+        """Sync client for this key; service is "generative", "cache", "model" ...
+        client_kwargs are transport and client_options (e.g. {"api_endpoint": ...})"""
+        key = self._client_key(api_key, service, client_kwargs)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._make_client(api_key, service, False, **client_kwargs)
+                self._clients[key] = client
+                self.clients_created += 1
+            return client
+
+    def get_async_client(self, api_key: Optional[str] = None, service: str = "generative", **client_kwargs):
+        """Async client for this key, created in (and only used from) the running event loop"""
+        loop = asyncio.get_running_loop()
+        key = self._client_key(api_key, service, client_kwargs)
+        with self._lock:
+            loop_clients = self._async_clients.setdefault(loop, {})
+            client = loop_clients.get(key)
+            if client is None:
+                client = self._make_client(api_key, service, True, **client_kwargs)
+                loop_clients[key] = client
+                self.clients_created += 1
+            return client
+
+    def get_model(self, api_key: Optional[str] = None, model_name: str = DEFAULT_MODEL,
+                  generation_config: Optional[dict] = None, cached_content: Optional[str] = None, **client_kwargs):
+        """Shared GenaiModel for this key, model, generation config and cached content"""
+        key = self._client_key(api_key, "model", client_kwargs) + (
+            model_name, content_hash(generation_config or {}), cached_content or "")
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                return model
+            self.misses += 1
+            model = GenaiModel(self, api_key, model_name, generation_config, cached_content, **client_kwargs)
+            self._models[key] = model
+            return model
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+            self._async_clients.clear()
+            self._models.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "clients": len(self._clients),
+                "async_clients": sum(len(clients) for clients in self._async_clients.values()),
+                "clients_created": self.clients_created,
+                "models": len(self._models),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class GenaiModel:
+    """A Gemini model on the registry's keyed clients. generate_content(_async) take a text prompt and
+    return objects with .text, like google.generativeai.GenerativeModel."""
+
+    def __init__(self, registry: GenaiClientRegistry, api_key: Optional[str], model_name: str,
+                 generation_config: Optional[dict] = None, cached_content: Optional[str] = None, **client_kwargs):
+        self.registry = registry
+        self._api_key = api_key
+        self.model_name = model_name
+        self.generation_config = generation_config or {}
+        # Name of a provider-side context cache ("cachedContents/...") the prompt is appended to
+        self.cached_content = cached_content
+        self.client_kwargs = client_kwargs
+
+    def _request(self, contents: str):
+        import google.ai.generativelanguage as glm
+
+        request = glm.GenerateContentRequest(
+            model=model_path(self.model_name),
+            contents=[glm.Content(role="user", parts=[glm.Part(text=contents)])],
+            generation_config=glm.GenerationConfig(**self.generation_config),
+        )
+        if self.cached_content:
+            request.cached_content = self.cached_content
+        return request
+
+    @staticmethod
+    def _call_options(request_options: Optional[dict]) -> dict:
+        timeout = (request_options or {}).get("timeout")
+        return {"timeout": timeout} if timeout is not None else {}
+
+    def generate_content(self, contents: str, stream: bool = False, request_options: Optional[dict] = None):
+        client = self.registry.get_client(self._api_key, "generative", **self.client_kwargs)
+        options = self._call_options(request_options)
+        if stream:
+            chunks = client.stream_generate_content(self._request(contents), **options)
+            return (GenaiResponse(response_text(chunk)) for chunk in chunks)
+        return GenaiResponse(response_text(client.generate_content(self._request(contents), **options)))
+
+    async def generate_content_async(self, contents: str, request_options: Optional[dict] = None):
+        client = self.registry.get_async_client(self._api_key, "generative", **self.client_kwargs)
+        response = await client.generate_content(self._request(contents), **self._call_options(request_options))
+        return GenaiResponse(response_text(response))
+
+
+_default_registry: Optional[GenaiClientRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_genai_registry() -> GenaiClientRegistry:
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = GenaiClientRegistry()
+        return _default_registry
+
+
+def get_genai_client(api_key: Optional[str] = None, service: str = "generative", **client_kwargs):
+    return get_default_genai_registry().get_client(api_key, service, **client_kwargs)
+
+
+def get_genai_model(api_key: Optional[str] = None, model_name: str = DEFAULT_MODEL,
+                    generation_config: Optional[dict] = None, cached_content: Optional[str] = None, **client_kwargs):
+    return get_default_genai_registry().get_model(api_key, model_name, generation_config, cached_content, **client_kwargs)
@@ -0,0 +1,207 @@
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+from content_keys import content_hash
+from prompt_budget import estimate_tokens, truncate_to_tokens
+
+
+SUMMARIZE_EVERY = 6          # exchanges folded into the summary per refresh
+MIN_VERBATIM = 4             # newest exchanges never summarized
+RECENT_TOKENS = 700          # budget for the verbatim exchanges
+EXCHANGE_TOKENS = 200        # one long reply (booking confirmation, service list) is clipped to this
+SUMMARY_TOKENS = 250
+MAX_SUMMARIES = 2048
+SUMMARY_WORKERS = 2
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and an AI receptionist.
+Keep facts the receptionist needs later: the user's name, services asked about or booked, dates, times,
+prices quoted, open questions and preferences. Drop greetings and small talk. Answer with the summary only,
+in at most {max_words} words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}"""
+
+
+def _format_exchange(exchange: dict, max_tokens: Optional[int] = None) -> str:
+    bot = exchange.get("bot", "")
+    if max_tokens is not None and estimate_tokens(bot) > max_tokens:
+        bot = truncate_to_tokens(bot, max_tokens) + " [...]"
+    return f"User: {exchange.get('user', '')}\nBot: {bot}"
+
+
+def _chain_key(previous: str, exchanges: List[dict]) -> str:
+    """Key of a history prefix, extended chunk by chunk so earlier keys are reused"""
+    chunk = json.dumps([[exchange.get("user", ""), exchange.get("bot", "")] for exchange in exchanges],
+                       ensure_ascii=False)
+    return content_hash(f"{previous}|{chunk}")
+
+
+def _digest(exchanges: List[dict]) -> str:
+    """LLM-free stand-in while a summary is being generated: what the user asked, one line each"""
+    return "\n".join(f"- User asked: {truncate_to_tokens(exchange['user'], 30)}"
+                     for exchange in exchanges if exchange.get("user"))
+
+
+class HistoryCompressor:
+    """Bounds the conversation history sent with each turn.
+    Older exchanges are folded into a running summary every `summarize_every` turns, in the
+    background; the newest ones stay verbatim within `recent_tokens`. Summaries are cached by a
+    hash chain over the history prefix, so a conversation that comes back with its chat_history
+    on the next request finds the summary it already paid for."""
+
+    def __init__(self, summarize_every: int = SUMMARIZE_EVERY, min_verbatim: int = MIN_VERBATIM,
+                 recent_tokens: int = RECENT_TOKENS, exchange_tokens: int = EXCHANGE_TOKENS,
+                 summary_tokens: int = SUMMARY_TOKENS, max_summaries: int = MAX_SUMMARIES,
+                 background: bool = True):
+        self.summarize_every = summarize_every
+        self.min_verbatim = min_verbatim
+        self.recent_tokens = recent_tokens
+        self.exchange_tokens = exchange_tokens
+        self.summary_tokens = summary_tokens
+        self.max_summaries = max_summaries
+        self.background = background
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=SUMMARY_WORKERS, thread_name_prefix="history-summary") \
+            if background else None
+        self.refreshes = 0
+        self.failures = 0
+        self.stale_turns = 0
+
+    def _boundary(self, count: int) -> int:
+        """How many of the oldest exchanges belong in the summary"""
+        return max(0, count - self.min_verbatim) // self.summarize_every * self.summarize_every
+
+    def _get(self, key: str) -> Optional[str]:
+        with self._lock:
+            summary = self._summaries.get(key)
+            if summary is not None:
+                self._summaries.move_to_end(key)
+            return summary
+
+    def _put(self, key: str, summary: str):
+        with self._lock:
+            self._summaries[key] = summary
+            self._summaries.move_to_end(key)
+            if len(self._summaries) > self.max_summaries:
+                self._summaries.popitem(last=False)
+
+    def _summarize(self, model, summary: str, exchanges: List[dict]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            max_words=int(self.summary_tokens * 0.75),
+            summary=summary or "(none yet)",
+            exchanges="\n\n".join(_format_exchange(exchange, self.exchange_tokens) for exchange in exchanges),
+        )
+        return truncate_to_tokens(model.generate(prompt).strip(), self.summary_tokens)
+
+    def _refresh(self, model, base_summary: str, exchanges: List[dict], key: str):
+        try:
+            self._put(key, self._summarize(model, base_summary, exchanges))
+            self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            print(f"⚠️ Error summarizing chat history: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+
+    def _schedule(self, model, base_summary: str, exchanges: List[dict], key: str) -> bool:
+        with self._lock:
+            if key in self._pending:
+                return False
+            self._pending.add(key)
+        if self._executor is not None:
+            self._executor.submit(self._refresh, model, base_summary, exchanges, key)
+        else:
+            self._refresh(model, base_summary, exchanges, key)
+        return True
+
+    def get_summary(self, history: List[dict], model=None) -> Tuple[str, int]:
+        """(summary text, number of exchanges it covers). Falls back to the newest cached summary
+        plus a one-line digest of what it is missing while a refresh is running."""
+        boundary = self._boundary(len(history))
+        if boundary == 0:
+            return "", 0
+
+        # Newest cached summary along the chain of this history's prefix keys
+        key, cached, covered = "", "", 0
+        keys = []
+        for start in range(0, boundary, self.summarize_every):
+            key = _chain_key(key, history[start:start + self.summarize_every])
+            keys.append(key)
+            summary = self._get(key)
+            if summary is not None:
+                cached, covered = summary, start + self.summarize_every
+        if covered == boundary:
+            return cached, boundary
+
+        missing = history[covered:boundary]
+        if model is not None:
+            self._schedule(model, cached, missing, keys[-1])
+            if not self.background:
+                summary = self._get(keys[-1])
+                if summary is not None:
+                    return summary, boundary
+        self.stale_turns += 1
+        digest = _digest(missing)
+        return truncate_to_tokens("\n".join(part for part in (cached, digest) if part), self.summary_tokens,
+                                  keep="last"), boundary
+
+    def compress(self, history: List[dict], model=None) -> str:
+        """History context for the next prompt: running summary, then the newest exchanges verbatim"""
+        summary, covered = self.get_summary(history, model)
+
+        recent, used = [], 0
+        for exchange in reversed(history[covered:]):
+            text = _format_exchange(exchange, self.exchange_tokens)
+            tokens = estimate_tokens(text)
+            if recent and used + tokens > self.recent_tokens:
+                break
+            recent.append(text)
+            used += tokens
+        recent.reverse()
+
+        dropped = history[covered:len(history) - len(recent)]
+        if dropped:
+            # Not summarized yet but squeezed out of the verbatim budget
+            summary = "\n".join(part for part in (summary, _digest(dropped)) if part)
+
+        context = f"Summary of earlier conversation:\n{summary}\n\n" if summary else ""
+        return context + "".join(f"{text}\n\n" for text in recent)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "summaries": len(self._summaries),
+                "pending": len(self._pending),
+                "refreshes": self.refreshes,
+                "failures": self.failures,
+                "stale_turns": self.stale_turns,
+            }
+
+
+_default_compressor: Optional[HistoryCompressor] = None
+_default_compressor_lock = threading.Lock()
+
+
+def get_default_history_compressor() -> HistoryCompressor:
+    """Shared compressor for this process, so summaries carry over between requests"""
+    global _default_compressor
+    with _default_compressor_lock:
+        if _default_compressor is None:
+            _default_compressor = HistoryCompressor()
+        return _default_compressor
+
+
+def set_default_history_compressor(compressor: HistoryCompressor):
+    """Swap the shared compressor, e.g. for a foreground one in deterministic replays"""
+    global _default_compressor
+    with _default_compressor_lock:
+        _default_compressor = compressor
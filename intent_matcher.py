@@ -0,0 +1,216 @@
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from content_keys import content_hash
+
+
+BOOKING_PHRASES = [
+    "book the", "book a", "book an", "book me",
+    "schedule the", "schedule a", "schedule an",
+    "like to book", "want to book", "like to schedule", "want to schedule",
+    "reserve a", "reserve an", "make a booking", "make a reservation",
+]
+GENERAL_BOOKING_PHRASES = [
+    "book an appointment", "schedule an appointment",
+    "like to book an appointment", "want to book an appointment",
+    "make an appointment", "get an appointment", "book appointment",
+]
+CANCEL_PHRASES = [
+    "cancel", "cancel my appointment", "cancel my booking", "call off my appointment",
+]
+RESCHEDULE_PHRASES = [
+    "reschedule", "move my appointment", "change my appointment", "change my booking",
+    "different time for my appointment",
+]
+# A negation earlier in the same clause ("I don't want to book a facial") leaves the turn to the LLM
+NEGATION_PATTERN = re.compile(r"\b(?:not|no|never|don't|dont|doesn't|didn't|won't|can't|cannot|without)\b")
+CLAUSE_BREAK_PATTERN = re.compile(r"[.!?,;]|\bbut\b")
+# Questions about booking ("How much does it cost to book a facial?", "Do I need to book in advance?")
+# are for the LLM to answer, not booking requests
+SENTENCE_END_PATTERN = re.compile(r"[.!?]")
+QUESTION_START_PATTERN = re.compile(
+    r"^\s*(?:how|what|when|where|why|which|who|do|does|did|is|are|am|can|could|should|will|would|may|might|must)\b"
+)
+INQUIRY_PATTERN = re.compile(r"\b(?:cost|costs|price|prices|pricing|how much|fee|fees|charge|advance|notice|deposit|policy)\b")
+# Filler between the booking phrase and the service ("book me in for a facial"), and trailing time words
+LEADING_FILLER_PATTERN = re.compile(r"^(?:(?:me|us|in|for|a|an|the|my|our|some)\b\s*)+")
+TRAILING_TIME_PATTERN = re.compile(
+    r"\s*\b(?:(?:for|on|at|this|next)\s+)?(?:today|tomorrow|tonight|morning|afternoon|evening|week|weekend|"
+    r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|\d[\w:]*)\b.*$"
+)
+# Words too generic to identify a single service on their own
+GENERIC_SERVICE_WORDS = {"service", "services", "session", "treatment", "package", "appointment", "and", "with", "the", "for"}
+
+MAX_MATCHERS = 64
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every pattern occurrence in one left-to-right pass"""
+
+    def __init__(self, patterns: Dict[str, tuple]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, tuple]]] = [[]]
+
+        for pattern, payload in patterns.items():
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append([])
+                state = next_state
+            self.output[state].append((pattern, payload))
+
+        # Breadth-first construction of failure links
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int, str, tuple]]:
+        """Yield (start, end, pattern, payload) for every match, on word boundaries only"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for pattern, payload in self.output[state]:
+                start = index - len(pattern) + 1
+                end = index + 1
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    yield start, end, pattern, payload
+
+
+class IntentResult:
+    """What one pass over a message found"""
+
+    def __init__(self, intent: Optional[str] = None, service: Optional[str] = None,
+                 service_text: Optional[str] = None, is_general: bool = False, negated: bool = False,
+                 is_question: bool = False):
+        self.intent = intent              # "book", "cancel", "reschedule" or None
+        self.service = service            # canonical service name from the catalog
+        self.service_text = service_text  # raw text after a booking phrase, when no catalog service matched
+        self.is_general = is_general      # "book an appointment" without a service
+        self.negated = negated            # a negation precedes the last booking phrase in its clause
+        self.is_question = is_question    # the booking phrase sits in a question or a price/notice inquiry
+
+    @property
+    def is_clear_booking(self) -> bool:
+        """A booking verb together with either a known service or a general appointment request,
+        neither negated nor asked about"""
+        return (self.intent == "book" and not self.negated and not self.is_question
+                and (self.service is not None or self.is_general))
+
+
+class IntentMatcher:
+    """Booking / cancel / reschedule intent and service extraction over a tenant's service catalog"""
+
+    def __init__(self, services: List[str]):
+        patterns: Dict[str, tuple] = {}
+        for phrase in BOOKING_PHRASES:
+            patterns[phrase] = ("book",)
+        for phrase in GENERAL_BOOKING_PHRASES:
+            patterns[phrase] = ("book_general",)
+        for phrase in CANCEL_PHRASES:
+            patterns[phrase] = ("cancel",)
+        for phrase in RESCHEDULE_PHRASES:
+            patterns[phrase] = ("reschedule",)
+
+        # Full service names, plus single words that point at exactly one service ("massage")
+        word_owners: Dict[str, set] = {}
+        for service in services:
+            name = service.lower().strip()
+            if name:
+                patterns[name] = ("service", service, True)
+            for word in re.findall(r"[a-z0-9]+", name):
+                if len(word) >= 4 and word not in GENERIC_SERVICE_WORDS:
+                    word_owners.setdefault(word, set()).add(service)
+        for word, owners in word_owners.items():
+            if len(owners) == 1 and word not in patterns:
+                patterns[word] = ("service", next(iter(owners)), False)
+
+        self.automaton = AhoCorasick(patterns)
+
+    def detect(self, message: str) -> IntentResult:
+        """Classify the message and pick out the service in a single scan"""
+        text = message.lower().replace("\u2019", "'")
+        intents = set()
+        booking_start = None
+        booking_end = None
+        best_service = None  # (is_full_name, length, service)
+
+        for start, end, pattern, payload in self.automaton.iter_matches(text):
+            kind = payload[0]
+            if kind == "service":
+                candidate = (payload[2], end - start, payload[1])
+                if best_service is None or candidate[:2] > best_service[:2]:
+                    best_service = candidate
+            elif kind == "book_general":
+                intents.add("book")
+                intents.add("general")
+                booking_start = start if booking_start is None else max(booking_start, start)
+            else:
+                intents.add(kind)
+                if kind == "book":
+                    booking_start = start if booking_start is None else max(booking_start, start)
+                    # Overlapping phrases ("want to book" / "book a"): the service starts after the last one
+                    booking_end = end if booking_end is None else max(booking_end, end)
+
+        if "reschedule" in intents:
+            return IntentResult("reschedule", best_service[2] if best_service else None)
+        if "cancel" in intents:
+            return IntentResult("cancel", best_service[2] if best_service else None)
+        if "book" not in intents:
+            return IntentResult(None, best_service[2] if best_service else None)
+
+        # Negation and questions are judged where the last booking phrase is, so an earlier
+        # sentence ("I don't like massages. Book me a facial") does not change the request
+        clause = CLAUSE_BREAK_PATTERN.split(text[:booking_start])[-1]
+        negated = NEGATION_PATTERN.search(clause) is not None
+        sentence_start = SENTENCE_END_PATTERN.split(text[:booking_start])[-1]
+        sentence_end = SENTENCE_END_PATTERN.search(text, booking_start)
+        sentence = sentence_start + text[booking_start:sentence_end.start() if sentence_end else len(text)]
+        is_question = ((sentence_end is not None and sentence_end.group() == "?")
+                       or QUESTION_START_PATTERN.match(sentence) is not None
+                       or INQUIRY_PATTERN.search(sentence) is not None)
+        if best_service is not None:
+            return IntentResult("book", best_service[2], negated=negated, is_question=is_question)
+        if "general" in intents:
+            return IntentResult("book", is_general=True, negated=negated, is_question=is_question)
+
+        # Unknown service: keep the text after the booking phrase for fuzzy matching later
+        service_text = text[booking_end:].strip() if booking_end is not None else ""
+        service_text = re.sub(r'\s*(appointment|session|booking).*$', '', service_text).strip(" .!?")
+        service_text = TRAILING_TIME_PATTERN.sub("", LEADING_FILLER_PATTERN.sub("", service_text)).strip(" .!?")
+        return IntentResult("book", service_text=service_text or None, negated=negated, is_question=is_question)
+
+
+_matchers: "OrderedDict[str, IntentMatcher]" = OrderedDict()
+_matchers_lock = threading.Lock()
+
+
+def get_intent_matcher(services: List[str]) -> IntentMatcher:
+    """Return the compiled matcher for this service catalog, building it only once"""
+    version = content_hash(list(services))
+    with _matchers_lock:
+        matcher = _matchers.get(version)
+        if matcher is None:
+            matcher = IntentMatcher(services)
+            _matchers[version] = matcher
+            if len(_matchers) > MAX_MATCHERS:
+                _matchers.popitem(last=False)
+        else:
+            _matchers.move_to_end(version)
+        return matcher
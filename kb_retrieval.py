@@ -0,0 +1,195 @@
+import math
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Tuple
+
+from content_keys import content_hash
+
+
+# Section markers emitted by the knowledge base loaders
+SECTION_PATTERN = re.compile(r'^\s*===\s*(.+?)\s*===\s*$')
+SUBSECTION_PATTERN = re.compile(r'^\s*---\s*(.+?)\s*---\s*$')
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for",
+    "from", "have", "how", "i", "if", "in", "is", "it", "me", "my", "of", "on",
+    "or", "our", "so", "that", "the", "this", "to", "we", "what", "when", "where",
+    "which", "who", "will", "with", "you", "your", "please", "would", "like",
+    "could", "tell", "about", "there", "any", "much", "many"
+}
+
+MAX_INDEXES = 16
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split into words and drop stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class KnowledgeBaseIndex:
+    """BM25 keyword index over the sections of a knowledge base"""
+
+    def __init__(self, content: str, k1: float = 1.5, b: float = 0.75, max_section_chars: int = 2000):
+        self.version = content_hash(content)
+        self.k1 = k1
+        self.b = b
+        self.max_section_chars = max_section_chars
+        self.sections = self._split_sections(content)
+        self._build_index()
+
+    def _split_sections(self, content: str) -> List[Tuple[str, str]]:
+        """Split content on '=== Section ===' / '--- Subheading ---' markers into (title, text) pairs"""
+        sections = []
+        section_title = ""
+        current_title = ""
+        current_lines = []
+
+        def flush():
+            text = "\n".join(current_lines).strip()
+            if text:
+                sections.extend(self._split_oversized(current_title, text))
+
+        for line in content.splitlines():
+            section_match = SECTION_PATTERN.match(line)
+            subsection_match = None if section_match else SUBSECTION_PATTERN.match(line)
+            if section_match:
+                flush()
+                section_title = section_match.group(1)
+                current_title = section_title
+                current_lines = [line.strip()]
+            elif subsection_match:
+                flush()
+                subheading = subsection_match.group(1)
+                current_title = f"{section_title} / {subheading}" if section_title else subheading
+                # Keep the parent header so a retrieved subsection still carries its context
+                current_lines = [f"=== {section_title} ===", line.strip()] if section_title else [line.strip()]
+            else:
+                current_lines.append(line)
+        flush()
+        return sections
+
+    def _split_oversized(self, title: str, text: str) -> List[Tuple[str, str]]:
+        """Break a section larger than max_section_chars into paragraph-aligned parts"""
+        if len(text) <= self.max_section_chars:
+            return [(title, text)]
+
+        parts = []
+        current = ""
+        for paragraph in re.split(r'\n\s*\n', text):
+            while len(paragraph) > self.max_section_chars:
+                if current:
+                    parts.append(current)
+                    current = ""
+                parts.append(paragraph[:self.max_section_chars])
+                paragraph = paragraph[self.max_section_chars:]
+            if current and len(current) + len(paragraph) + 2 > self.max_section_chars:
+                parts.append(current)
+                current = ""
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current.strip():
+            parts.append(current)
+        return [(title, part.strip()) for part in parts if part.strip()]
+
+    def _build_index(self):
+        """Build the inverted index and the per-term IDF table"""
+        self.postings: Dict[str, List[Tuple[int, int]]] = {}
+        self.doc_lengths = []
+        for doc_id, (title, text) in enumerate(self.sections):
+            # Titles are counted twice so headings weigh more than body text
+            terms = Counter(tokenize(f"{title} {title} {text}"))
+            self.doc_lengths.append(sum(terms.values()))
+            for term, frequency in terms.items():
+                self.postings.setdefault(term, []).append((doc_id, frequency))
+
+        num_docs = len(self.sections)
+        self.avg_doc_length = (sum(self.doc_lengths) / num_docs) if num_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self.postings.items()
+        }
+
+    def search(self, query: str, top_k: int = 4) -> List[Tuple[float, int]]:
+        """Return (score, section_id) pairs for the best matching sections"""
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for doc_id, frequency in postings:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_doc_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        ranked = sorted(((score, doc_id) for doc_id, score in scores.items()), key=lambda item: (-item[0], item[1]))
+        return ranked[:top_k]
+
+    def confidence(self, query: str) -> float:
+        """Best section's score as a fraction of the highest score the query could reach (0..1).
+        Query terms that appear nowhere in the KB count at full IDF, so they pull confidence down."""
+        terms = set(tokenize(query))
+        ranked = self.search(query, top_k=1)
+        if not terms or not ranked:
+            return 0.0
+        unseen_idf = math.log(1 + (len(self.sections) + 0.5) / 0.5)
+        ceiling = sum(self.idf.get(term, unseen_idf) for term in terms) * (self.k1 + 1)
+        return min(1.0, ranked[0][0] / ceiling)
+
+    def get_relevant_sections(self, query: str, top_k: int = 4) -> List[Tuple[float, str]]:
+        """Return (score, text) for the top-k sections, in document order"""
+        if not self.sections:
+            return []
+
+        ranked = self.search(query, top_k)
+        if not ranked:
+            # Nothing matched (greetings, "ok", ...): fall back to the opening sections
+            ranked = [(0.0, doc_id) for doc_id in range(min(top_k, len(self.sections)))]
+
+        return [(score, self.sections[doc_id][1]) for score, doc_id in sorted(ranked, key=lambda item: item[1])]
+
+    def get_relevant_context(self, query: str, top_k: int = 4) -> str:
+        """Return the top-k sections for the query, in document order"""
+        return "\n\n".join(text for _, text in self.get_relevant_sections(query, top_k))
+
+
+_index_cache: "OrderedDict[str, KnowledgeBaseIndex]" = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def get_knowledge_base_index(content: str) -> KnowledgeBaseIndex:
+    """Return the index for this knowledge base version, building it only once"""
+    version = content_hash(content)
+    with _index_cache_lock:
+        index = _index_cache.get(version)
+        if index is not None:
+            _index_cache.move_to_end(version)
+            return index
+
+    # Built outside the lock; two racing builds of the same version produce identical indexes
+    index = KnowledgeBaseIndex(content)
+    with _index_cache_lock:
+        index = _index_cache.setdefault(version, index)
+        _index_cache.move_to_end(version)
+        if len(_index_cache) > MAX_INDEXES:
+            _index_cache.popitem(last=False)
+        return index
+
+
+if __name__ == "__main__":
+    with open("knowledge_base.txt", "r", encoding="utf-8") as f:
+        knowledge_base = f.read()
+
+    start = time.perf_counter()
+    index = get_knowledge_base_index(knowledge_base)
+    build_ms = (time.perf_counter() - start) * 1000
+    print(f"✅ Indexed {len(index.sections)} sections in {build_ms:.1f} ms")
+
+    for question in ["What are your hours?", "approaches to learning through play", "How much is a facial?"]:
+        start = time.perf_counter()
+        context = index.get_relevant_context(question)
+        query_ms = (time.perf_counter() - start) * 1000
+        print(f"\nQ: {question}")
+        print(f"   {len(context):,} of {len(knowledge_base):,} chars "
+              f"({len(context) / len(knowledge_base):.1%}) retrieved in {query_ms:.2f} ms")
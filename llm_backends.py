@@ -0,0 +1,634 @@
+import asyncio
+import inspect
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from prompt_budget import estimate_tokens
+from rate_limiter import EXPECTED_OUTPUT_TOKENS, get_rate_limiter
+from content_keys import content_hash
+
+
+# (connect, read) seconds; the read timeout applies between streamed chunks too
+DEFAULT_TIMEOUT = (5.0, 120.0)
+DEFAULT_POOL_SIZE = 32
+HEDGE_WORKERS = 32
+RETRY_STATUS_CODES = {408, 429, 500, 502, 503, 504}
+# google.api_core exception names worth retrying
+RETRY_ERROR_NAMES = {"ResourceExhausted", "ServiceUnavailable", "DeadlineExceeded", "InternalServerError", "TooManyRequests"}
+
+
+class LLMResponse:
+    """Response object with the same .text attribute as a Gemini response"""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class RetryPolicy:
+    """Exponential backoff with jitter for transient errors (connection drops, 429, 5xx)"""
+
+    def __init__(self, attempts: int = 3, backoff: float = 0.5, max_backoff: float = 8.0):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+    def is_retryable(self, error: Exception) -> bool:
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+            return error.response.status_code in RETRY_STATUS_CODES
+        if getattr(error, "code", None) in RETRY_STATUS_CODES:
+            return True
+        return type(error).__name__ in RETRY_ERROR_NAMES
+
+    def delay(self, attempt: int) -> float:
+        return min(self.max_backoff, self.backoff * (2 ** attempt)) * random.uniform(0.5, 1.0)
+
+    def call(self, fn, *args, **kwargs):
+        for attempt in range(self.attempts):
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.attempts - 1 or not self.is_retryable(e):
+                    raise
+                print(f"⚠️ LLM call failed ({str(e)}), retrying")
+                time.sleep(self.delay(attempt))
+
+    async def call_async(self, fn, *args, **kwargs):
+        for attempt in range(self.attempts):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == self.attempts - 1 or not self.is_retryable(e):
+                    raise
+                print(f"⚠️ LLM call failed ({str(e)}), retrying")
+                await asyncio.sleep(self.delay(attempt))
+
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_http_session(base_url: str, pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """Keep-alive session per host, shared by every backend in the process"""
+    with _sessions_lock:
+        session = _sessions.get(base_url)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled by RetryPolicy, so the adapter itself never retries
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _sessions[base_url] = session
+        return session
+
+
+class LLMBackend:
+    """Common interface: generate / stream / generate_async, plus Gemini-style
+    generate_content(_async) so a backend can stand in for a GenerativeModel"""
+
+    provider = None
+
+    def __init__(self, model: str, timeout=DEFAULT_TIMEOUT, retry: Optional[RetryPolicy] = None):
+        self.model_name = model
+        self.timeout = timeout
+        self.retry = retry or RetryPolicy()
+        # Shared by every backend of the same provider, since quotas are per account
+        self.limiter = get_rate_limiter(self.provider)
+
+    @staticmethod
+    def estimate_call_tokens(prompt: str, system: Optional[str] = None) -> int:
+        return estimate_tokens(prompt) + estimate_tokens(system or "") + EXPECTED_OUTPUT_TOKENS
+
+    def _generate(self, prompt: str, system: Optional[str], timeout) -> str:
+        raise NotImplementedError
+
+    def _stream(self, prompt: str, system: Optional[str], timeout) -> Iterator[str]:
+        raise NotImplementedError
+
+    async def _generate_async(self, prompt: str, system: Optional[str], timeout) -> str:
+        # HTTP backends share the pooled session from a worker thread
+        return await asyncio.to_thread(self._generate, prompt, system, timeout)
+
+    def _limited_generate(self, prompt, system, timeout):
+        with self.limiter.slot(self.estimate_call_tokens(prompt, system)):
+            return self._generate(prompt, system, timeout)
+
+    def generate(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        """Full completion as text"""
+        return self.retry.call(self._limited_generate, prompt, system, timeout or self.timeout)
+
+    def stream(self, prompt: str, system: Optional[str] = None, timeout=None) -> Iterator[str]:
+        """Yield text chunks as they arrive. Only the connection is retried: once a
+        chunk has been yielded, a failure is raised to the caller."""
+        chunks = self.retry.call(self._open_stream, prompt, system, timeout or self.timeout)
+        yield from chunks
+
+    def _open_stream(self, prompt, system, timeout):
+        # The limiter slot is held until the stream ends
+        self.limiter.acquire(self.estimate_call_tokens(prompt, system))
+        try:
+            chunks = self._stream(prompt, system, timeout)
+            first = next(chunks)
+        except StopIteration:
+            self.limiter.release()
+            return iter(())
+        except BaseException as e:
+            self.limiter.release(e)
+            raise
+        return self._release_after(first, chunks)
+
+    def _release_after(self, first, chunks):
+        error = None
+        try:
+            yield first
+            yield from chunks
+        except GeneratorExit:
+            raise
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.limiter.release(error)
+
+    async def generate_async(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        async def call():
+            async with self.limiter.slot_async(self.estimate_call_tokens(prompt, system)):
+                return await self._generate_async(prompt, system, timeout or self.timeout)
+        return await self.retry.call_async(call)
+
+    def generate_content(self, contents: str, stream: bool = False, **kwargs):
+        if stream:
+            return (LLMResponse(chunk) for chunk in self.stream(contents))
+        return LLMResponse(self.generate(contents))
+
+    async def generate_content_async(self, contents: str, **kwargs):
+        return LLMResponse(await self.generate_async(contents))
+
+
+class GeminiBackend(LLMBackend):
+    """Gemini API; models come from the process-wide genai_clients registry, so backends for the
+    same key, model and generation config share one client, bound to that key"""
+
+    provider = "gemini"
+
+    def __init__(self, model: str = "gemini-2.0-flash", api_key: Optional[str] = None,
+                 generation_config: Optional[dict] = None, timeout=DEFAULT_TIMEOUT, retry: Optional[RetryPolicy] = None,
+                 api_endpoint: Optional[str] = None):
+        super().__init__(model, timeout, retry)
+        from genai_clients import get_genai_model
+
+        self.api_endpoint = api_endpoint
+        if api_endpoint:
+            # e.g. the llm_stand_in server; the endpoint only applies to this backend's clients
+            self.client = get_genai_model(api_key or "stand-in", model, generation_config, transport="rest",
+                                          client_options={"api_endpoint": api_endpoint})
+        else:
+            self.client = get_genai_model(api_key, model, generation_config)
+
+    def _request_options(self, timeout) -> dict:
+        return {"timeout": timeout[1] if isinstance(timeout, tuple) else timeout}
+
+    @staticmethod
+    def _contents(prompt: str, system: Optional[str]) -> str:
+        return f"{system}\n\n{prompt}" if system else prompt
+
+    def _generate(self, prompt, system, timeout):
+        response = self.client.generate_content(self._contents(prompt, system), request_options=self._request_options(timeout))
+        return response.text
+
+    def _stream(self, prompt, system, timeout):
+        response = self.client.generate_content(self._contents(prompt, system), stream=True,
+                                                request_options=self._request_options(timeout))
+        for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+    async def _generate_async(self, prompt, system, timeout):
+        if self.api_endpoint:
+            # The async client is gRPC-only; over REST the sync client runs in a worker thread
+            return await super()._generate_async(prompt, system, timeout)
+        response = await self.client.generate_content_async(self._contents(prompt, system),
+                                                            request_options=self._request_options(timeout))
+        return response.text
+
+
+class OllamaBackend(LLMBackend):
+    """Local Ollama server, /api/chat over a pooled keep-alive session"""
+
+    provider = "ollama"
+
+    def __init__(self, model: str = "mistral", base_url: str = "http://127.0.0.1:11434",
+                 options: Optional[dict] = None, timeout=DEFAULT_TIMEOUT, retry: Optional[RetryPolicy] = None):
+        super().__init__(model, timeout, retry)
+        self.base_url = base_url.rstrip("/")
+        self.options = options
+        self.session = get_http_session(self.base_url)
+
+    def _payload(self, prompt, system, stream: bool) -> dict:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        payload = {"model": self.model_name, "messages": messages, "stream": stream}
+        if self.options:
+            payload["options"] = self.options
+        return payload
+
+    def _generate(self, prompt, system, timeout):
+        response = self.session.post(f"{self.base_url}/api/chat", json=self._payload(prompt, system, False), timeout=timeout)
+        response.raise_for_status()
+        return response.json().get("message", {}).get("content", "")
+
+    def _stream(self, prompt, system, timeout):
+        with self.session.post(f"{self.base_url}/api/chat", json=self._payload(prompt, system, True),
+                               stream=True, timeout=timeout) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                # Decoded here: requests yields bytes when the server sends no charset
+                line = line.decode("utf-8")
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except json.JSONDecodeError:
+                    print(f"⚠️ Failed to parse Ollama line: {line}")
+                    continue
+                content = data.get("message", {}).get("content")
+                if content:
+                    yield content
+                if data.get("done"):
+                    break
+
+
+class OpenAIBackend(LLMBackend):
+    """OpenAI-compatible /chat/completions over a pooled keep-alive session"""
+
+    provider = "openai"
+
+    def __init__(self, model: str = "gpt-4-turbo", api_key: Optional[str] = None,
+                 base_url: str = "https://api.openai.com/v1", timeout=DEFAULT_TIMEOUT, retry: Optional[RetryPolicy] = None):
+        super().__init__(model, timeout, retry)
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key or os.getenv("OPENAI_API_KEY")
+        self.session = get_http_session(self.base_url)
+
+    def _post(self, prompt, system, stream: bool, timeout):
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        response = self.session.post(
+            f"{self.base_url}/chat/completions",
+            json={"model": self.model_name, "messages": messages, "stream": stream},
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            stream=stream,
+            timeout=timeout,
+        )
+        response.raise_for_status()
+        return response
+
+    def _generate(self, prompt, system, timeout):
+        data = self._post(prompt, system, False, timeout).json()
+        return data["choices"][0]["message"]["content"]
+
+    def _stream(self, prompt, system, timeout):
+        with self._post(prompt, system, True, timeout) as response:
+            for line in response.iter_lines():
+                line = line.decode("utf-8")
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                content = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+_hedge_executor: Optional[ThreadPoolExecutor] = None
+_hedge_executor_lock = threading.Lock()
+
+
+def _get_hedge_executor() -> ThreadPoolExecutor:
+    global _hedge_executor
+    with _hedge_executor_lock:
+        if _hedge_executor is None:
+            _hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix="llm-hedge")
+        return _hedge_executor
+
+
+class HedgedBackend(LLMBackend):
+    """Sends the prompt to the primary backend and, if it has not answered by the deadline
+    (a percentile of its recent latencies), to the secondary as well; the first answer wins.
+    A primary error falls back to the secondary straight away. Streams use the primary only."""
+
+    def __init__(self, primary: Union[str, dict], secondary: Union[str, dict], api_key: Optional[str] = None,
+                 percentile: float = 95, initial_deadline: float = 4.0, min_deadline: float = 0.5,
+                 max_deadline: float = 15.0, window: int = 200, min_samples: int = 20):
+        self.primary = get_llm_backend(primary, api_key=api_key)
+        self.secondary = get_llm_backend(secondary, api_key=api_key)
+        # Looks like the primary to callers (token budget, context caching, limiter)
+        self.provider = self.primary.provider
+        self.model_name = self.primary.model_name
+        self.timeout = self.primary.timeout
+        self.retry = self.primary.retry
+        self.limiter = self.primary.limiter
+
+        self.percentile = percentile
+        self.initial_deadline = initial_deadline
+        self.min_deadline = min_deadline
+        self.max_deadline = max_deadline
+        self.min_samples = min_samples
+        self.latencies = deque(maxlen=window)
+        self.wins = {"primary": 0, "secondary": 0}
+        self.hedged = 0
+        self.fallbacks = 0
+        self._lock = threading.Lock()
+
+    def deadline(self) -> float:
+        """Seconds to wait for the primary before hedging"""
+        with self._lock:
+            if len(self.latencies) < self.min_samples:
+                return self.initial_deadline
+            ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return min(self.max_deadline, max(self.min_deadline, ordered[index]))
+
+    def _track_primary(self, started: float):
+        def record(future):
+            # A cancelled primary still tells us it took at least this long
+            if future.cancelled() or future.exception() is None:
+                with self._lock:
+                    self.latencies.append(time.monotonic() - started)
+        return record
+
+    def _record_win(self, winner: str, deadline: Optional[float] = None):
+        with self._lock:
+            self.wins[winner] += 1
+            if deadline is not None:
+                self.hedged += 1
+        if deadline is not None:
+            print(f"⏱️ {self.primary.model_name} slower than {deadline:.2f}s, hedged to {self.secondary.model_name}: {winner} won")
+
+    def _record_fallback(self, error: BaseException):
+        with self._lock:
+            self.fallbacks += 1
+        print(f"⚠️ {self.primary.model_name} failed ({str(error)}), falling back to {self.secondary.model_name}")
+
+    def generate(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        executor = _get_hedge_executor()
+        deadline = self.deadline()
+        primary = executor.submit(self.primary.generate, prompt, system, timeout)
+        primary.add_done_callback(self._track_primary(time.monotonic()))
+
+        done, _ = wait([primary], timeout=deadline)
+        if done:
+            if primary.exception() is None:
+                self._record_win("primary")
+                return primary.result()
+            self._record_fallback(primary.exception())
+            result = self.secondary.generate(prompt, system, timeout)
+            self._record_win("secondary")
+            return result
+
+        secondary = executor.submit(self.secondary.generate, prompt, system, timeout)
+        names = {primary: "primary", secondary: "secondary"}
+        pending = {primary, secondary}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # Only a call that has not started can be cancelled; a running loser finishes in the background
+                    for loser in pending:
+                        loser.cancel()
+                    self._record_win(names[future], deadline)
+                    return future.result()
+        raise primary.exception()
+
+    async def generate_async(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        deadline = self.deadline()
+        primary = asyncio.ensure_future(self.primary.generate_async(prompt, system, timeout))
+        primary.add_done_callback(self._track_primary(time.monotonic()))
+
+        done, _ = await asyncio.wait({primary}, timeout=deadline)
+        if done:
+            if primary.exception() is None:
+                self._record_win("primary")
+                return primary.result()
+            self._record_fallback(primary.exception())
+            result = await self.secondary.generate_async(prompt, system, timeout)
+            self._record_win("secondary")
+            return result
+
+        secondary = asyncio.ensure_future(self.secondary.generate_async(prompt, system, timeout))
+        names = {primary: "primary", secondary: "secondary"}
+        pending = {primary, secondary}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._record_win(names[task], deadline)
+                        return task.result()
+            raise primary.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stream(self, prompt: str, system: Optional[str] = None, timeout=None) -> Iterator[str]:
+        return self.primary.stream(prompt, system, timeout)
+
+    def stats(self) -> dict:
+        """Win counts, hedge and fallback rates, and the current deadline"""
+        deadline = self.deadline()
+        with self._lock:
+            requests_total = self.wins["primary"] + self.wins["secondary"]
+            return {
+                "requests": requests_total,
+                "primary_wins": self.wins["primary"],
+                "secondary_wins": self.wins["secondary"],
+                "hedged": self.hedged,
+                "fallbacks": self.fallbacks,
+                "hedge_rate": self.hedged / requests_total if requests_total else 0.0,
+                "deadline_seconds": round(deadline, 3),
+            }
+
+
+class CassetteMiss(Exception):
+    """Replay found no recorded response for this prompt"""
+
+
+class CassetteBackend(LLMBackend):
+    """Records responses of the wrapped backend into a JSONL cassette keyed by prompt hash
+    and replays them offline. mode="replay" never touches the network, "record" always calls
+    the wrapped backend, "auto" records only prompts the cassette does not have yet."""
+
+    provider = "cassette"
+
+    def __init__(self, backend: Union[str, dict], path: str, mode: str = "replay", api_key: Optional[str] = None):
+        config = parse_backend_config(backend)
+        # Same model name as the wrapped backend, so token budgets and prompts match between modes
+        super().__init__(config.get("model") or config["provider"])
+        self.backend = backend
+        self.api_key = api_key
+        self.path = path
+        self.mode = mode
+        self.responses: Dict[str, str] = {}
+        self.hits = 0
+        self.recorded = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if "key" in entry:
+                            self.responses[entry["key"]] = entry["response"]
+
+    def key(self, prompt: str, system: Optional[str] = None) -> str:
+        return content_hash([self.model_name, system or "", prompt])
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            response = self.responses.get(key) if self.mode != "record" else None
+            if response is not None:
+                self.hits += 1
+            return response
+
+    def _record(self, key: str, prompt: str, response: str):
+        with self._lock:
+            self.responses[key] = response
+            self.recorded += 1
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"key": key, "model": self.model_name, "prompt_tokens": estimate_tokens(prompt),
+                                    "response": response}, ensure_ascii=False) + "\n")
+
+    def _missing(self, key: str, prompt: str):
+        if self.mode == "replay":
+            raise CassetteMiss(f"{os.path.basename(self.path)}: no recorded response for prompt {key[:12]} "
+                               f"({prompt[:60]!r}...); run with --record")
+        # Looked up per call rather than in __init__, so replay works without credentials
+        return get_llm_backend(self.backend, api_key=self.api_key)
+
+    def generate(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        key = self.key(prompt, system)
+        response = self._lookup(key)
+        if response is None:
+            response = self._missing(key, prompt).generate(prompt, system, timeout)
+            self._record(key, prompt, response)
+        return response
+
+    async def generate_async(self, prompt: str, system: Optional[str] = None, timeout=None) -> str:
+        key = self.key(prompt, system)
+        response = self._lookup(key)
+        if response is None:
+            response = await self._missing(key, prompt).generate_async(prompt, system, timeout)
+            self._record(key, prompt, response)
+        return response
+
+    def stream(self, prompt: str, system: Optional[str] = None, timeout=None) -> Iterator[str]:
+        key = self.key(prompt, system)
+        response = self._lookup(key)
+        if response is not None:
+            # Replayed line by line, so stream consumers still see several chunks
+            yield from response.splitlines(keepends=True)
+            return
+        chunks = []
+        for chunk in self._missing(key, prompt).stream(prompt, system, timeout):
+            chunks.append(chunk)
+            yield chunk
+        self._record(key, prompt, "".join(chunks))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"responses": len(self.responses), "hits": self.hits, "recorded": self.recorded}
+
+
+def write_cassette_metadata(path: str, metadata: dict):
+    """Start a new cassette with a metadata line (e.g. the date it was recorded on)"""
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps({"metadata": metadata}, ensure_ascii=False) + "\n")
+
+
+def read_cassette_metadata(path: str) -> dict:
+    """Metadata written by write_cassette_metadata, or {} for older cassettes"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                return json.loads(line).get("metadata", {})
+    return {}
+
+
+BACKENDS = {
+    "gemini": GeminiBackend,
+    "ollama": OllamaBackend,
+    "openai": OpenAIBackend,
+    # {"provider": "hedged", "primary": "gemini:gemini-2.0-flash", "secondary": "ollama:mistral"}
+    "hedged": HedgedBackend,
+    # {"provider": "cassette", "backend": "gemini:gemini-2.0-flash", "path": "cassettes/x.jsonl", "mode": "replay"}
+    "cassette": CassetteBackend,
+}
+
+
+def parse_backend_config(config: Union[str, dict]) -> dict:
+    """"ollama:mistral" or {"provider": "ollama", "model": "mistral", ...} -> config dict.
+    The dict may also come as a JSON string, e.g. from CHATBOT_LLM_BACKEND."""
+    if isinstance(config, str) and config.lstrip().startswith("{"):
+        config = json.loads(config)
+    if isinstance(config, dict):
+        config = dict(config)
+    else:
+        provider, _, model = config.partition(":")
+        config = {"provider": provider}
+        if model:
+            config["model"] = model
+    if config.get("provider") not in BACKENDS:
+        raise ValueError(f"Unknown LLM provider: {config.get('provider')} (expected one of {', '.join(BACKENDS)})")
+    if isinstance(config.get("timeout"), list):
+        config["timeout"] = tuple(config["timeout"])
+    return config
+
+
+_backends: Dict[str, LLMBackend] = {}
+# Re-entrant: a hedged backend builds its primary and secondary through get_llm_backend
+_backends_lock = threading.RLock()
+
+
+def get_llm_backend(config: Union[str, dict], **overrides) -> LLMBackend:
+    """Shared backend for this config, created once per process so connections stay warm.
+    Overrides the chosen backend does not take (e.g. api_key for Ollama) or set to None are ignored."""
+    config = parse_backend_config(config)
+    accepted = inspect.signature(BACKENDS[config["provider"]]).parameters
+    config.update({key: value for key, value in overrides.items() if value is not None and key in accepted})
+    key = content_hash(config)
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            provider = config.pop("provider")
+            backend = BACKENDS[provider](**config)
+            _backends[key] = backend
+        return backend
+
+
+if __name__ == "__main__":
+    import sys
+
+    backend = get_llm_backend(sys.argv[1] if len(sys.argv) > 1 else "ollama:mistral")
+    prompt = sys.argv[2] if len(sys.argv) > 2 else "Say hello in one short sentence."
+    for attempt in range(3):
+        start = time.perf_counter()
+        first_chunk = None
+        for chunk in backend.stream(prompt):
+            if first_chunk is None:
+                first_chunk = time.perf_counter() - start
+            print(chunk, end="", flush=True)
+        total = time.perf_counter() - start
+        print(f"\n⏱️ call {attempt + 1}: first chunk {first_chunk or 0:.3f}s, total {total:.3f}s")
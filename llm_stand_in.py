@@ -0,0 +1,330 @@
+"""Offline stand-in for the Gemini and Ollama HTTP APIs, for load and fault tests without network.
+
+Speaks Gemini REST generateContent / streamGenerateContent (JSON array or ?alt=sse) and
+Ollama /api/chat (NDJSON stream or a single JSON reply). Replies are scripted (first regex
+that matches the user message) or echo the message back. Time to first token, tokens/sec,
+error and 429 rates and mid-stream disconnects are set on the command line or at runtime
+with POST /config; GET /stats returns request counters.
+
+Point the chatbot at it with
+    CHATBOT_LLM_BACKEND='{"provider": "gemini", "model": "gemini-2.0-flash", "api_endpoint": "http://127.0.0.1:8765"}'
+or "ollama:mistral" with base_url http://127.0.0.1:8765.
+
+Usage: python llm_stand_in.py [--port 8765] [--ttft 0.3] [--tps 40] [--error-rate 0.01] [--throttle-rate 0.05]
+                              [--drop-rate 0] [--script replies.jsonl] [--seed 0]
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+DEFAULT_PORT = 8765
+GEMINI_PATH = re.compile(r"^/v1(?:beta)?/models/(?P<model>[^:/]+):(?P<method>generateContent|streamGenerateContent)$")
+# Roughly one token per word or punctuation run, spaces kept with the following word
+TOKEN_PATTERN = re.compile(r"\s*\S+")
+TOKENS_PER_CHUNK = 4
+
+
+class StandInConfig:
+    """Latency and fault settings, changeable while the server runs"""
+
+    FIELDS = ("ttft", "tokens_per_second", "jitter", "error_rate", "throttle_rate", "drop_rate")
+
+    def __init__(self, ttft: float = 0.3, tokens_per_second: float = 40.0, jitter: float = 0.1,
+                 error_rate: float = 0.0, throttle_rate: float = 0.0, drop_rate: float = 0.0,
+                 script: Optional[List[dict]] = None, seed: Optional[int] = None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.drop_rate = drop_rate
+        self.script = [(re.compile(entry["match"], re.I), entry["response"]) for entry in script or []]
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def update(self, values: dict):
+        with self._lock:
+            for name in self.FIELDS:
+                if name in values:
+                    setattr(self, name, float(values[name]))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    def roll(self) -> Optional[str]:
+        """"throttle", "error", "drop" or None for this request"""
+        with self._lock:
+            value = self.random.random()
+        if value < self.throttle_rate:
+            return "throttle"
+        if value < self.throttle_rate + self.error_rate:
+            return "error"
+        if value < self.throttle_rate + self.error_rate + self.drop_rate:
+            return "drop"
+        return None
+
+    def delay(self, seconds: float) -> float:
+        with self._lock:
+            factor = 1 + self.random.uniform(-self.jitter, self.jitter)
+        return max(0.0, seconds * factor)
+
+    def reply(self, user_message: str) -> str:
+        for pattern, response in self.script:
+            if pattern.search(user_message):
+                return response
+        return f"Echo: {user_message}"
+
+
+def _user_message(text: str) -> str:
+    """The turn's message from a full chatbot prompt, or the whole text for bare prompts"""
+    match = re.search(r"User message:\s*(.*)$", text, re.S)
+    return (match.group(1) if match else text).strip()
+
+
+class StandInStats:
+    def __init__(self):
+        self.requests = 0
+        self.streams = 0
+        self.throttled = 0
+        self.errors = 0
+        self.dropped = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {name: getattr(self, name) for name in
+                    ("requests", "streams", "throttled", "errors", "dropped", "in_flight", "max_in_flight")}
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so the pooled sessions in llm_backends reuse connections as with the real APIs
+    protocol_version = "HTTP/1.1"
+    config: StandInConfig = None
+    stats: StandInStats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _start_chunked(self, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, text: str):
+        data = text.encode("utf-8")
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path in ("/", "/health"):
+            self._send_json(200, {"status": "ok"})
+        elif path == "/stats":
+            self._send_json(200, dict(self.stats.to_dict(), config=self.config.to_dict()))
+        else:
+            self._send_json(404, {"error": f"unknown path {path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == "/config":
+            self.config.update(self._read_json())
+            self._send_json(200, self.config.to_dict())
+            return
+
+        gemini = GEMINI_PATH.match(url.path)
+        if gemini is None and url.path != "/api/chat":
+            self._send_json(404, {"error": f"unknown path {url.path}"})
+            return
+
+        body = self._read_json()
+        self.stats.count("requests")
+        self.stats.count("in_flight")
+        try:
+            if gemini is not None:
+                self._gemini(body, gemini.group("model"), gemini.group("method") == "streamGenerateContent",
+                             parse_qs(url.query).get("alt") == ["sse"])
+            else:
+                self._ollama(body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client gave up (timeout or hedge cancelled)
+        finally:
+            self.stats.count("in_flight", -1)
+
+    def _fault(self, gemini: bool) -> Optional[str]:
+        """Answer an injected 429/500 and return the fault, or return "drop"/None"""
+        fault = self.config.roll()
+        time.sleep(self.config.delay(self.config.ttft) if fault in ("throttle", "error") else 0)
+        if fault == "throttle":
+            self.stats.count("throttled")
+            message = "Resource has been exhausted (e.g. check quota)."
+            self._send_json(429, {"error": {"code": 429, "message": message, "status": "RESOURCE_EXHAUSTED"}}
+                            if gemini else {"error": message})
+        elif fault == "error":
+            self.stats.count("errors")
+            message = "An internal error has occurred."
+            self._send_json(500, {"error": {"code": 500, "message": message, "status": "INTERNAL"}}
+                            if gemini else {"error": message})
+        return fault
+
+    def _chunks(self, text: str, drop: bool):
+        """(reply tokens, generator of (chunk, is_last)) with chunks of a few tokens, paced by ttft
+        and tokens/sec. A dropped stream stops halfway."""
+        tokens = TOKEN_PATTERN.findall(text) or [""]
+        starts = list(range(0, len(tokens) // 2 if drop else len(tokens), TOKENS_PER_CHUNK))
+
+        def paced():
+            time.sleep(self.config.delay(self.config.ttft))
+            for index, start in enumerate(starts):
+                piece = tokens[start:start + TOKENS_PER_CHUNK]
+                if index:
+                    time.sleep(self.config.delay(len(piece) / self.config.tokens_per_second))
+                yield "".join(piece), not drop and index == len(starts) - 1
+        return len(tokens), paced()
+
+    def _drop(self):
+        self.stats.count("dropped")
+        self.close_connection = True
+
+    def _gemini(self, body: dict, model: str, stream: bool, sse: bool):
+        fault = self._fault(gemini=True)
+        if fault in ("throttle", "error"):
+            return
+        parts = (body.get("contents") or [{}])[-1].get("parts", [])
+        prompt = "".join(part.get("text", "") for part in parts)
+        text = self.config.reply(_user_message(prompt))
+
+        total, chunks = self._chunks(text, fault == "drop" and stream)
+
+        def response(chunk_text: str, finished: bool) -> dict:
+            candidate = {"content": {"parts": [{"text": chunk_text}], "role": "model"}, "index": 0}
+            if finished:
+                candidate["finishReason"] = "STOP"
+            prompt_tokens = len(TOKEN_PATTERN.findall(prompt))
+            return {"candidates": [candidate], "modelVersion": model, "usageMetadata": {
+                "promptTokenCount": prompt_tokens, "candidatesTokenCount": total,
+                "totalTokenCount": prompt_tokens + total}}
+
+        if not stream:
+            self._send_json(200, response("".join(chunk for chunk, _ in chunks), True))
+            return
+
+        self.stats.count("streams")
+        if sse:
+            self._start_chunked("text/event-stream")
+        else:
+            self._start_chunked("application/json; charset=utf-8")
+            self._write_chunk("[")
+        first = True
+        for chunk, last in chunks:
+            data = json.dumps(response(chunk, last))
+            self._write_chunk(f"data: {data}\r\n\r\n" if sse else ("" if first else ",\r\n") + data)
+            first = False
+        if fault == "drop":
+            self._drop()
+            return
+        if not sse:
+            self._write_chunk("]")
+        self._end_chunked()
+
+    def _ollama(self, body: dict):
+        fault = self._fault(gemini=False)
+        if fault in ("throttle", "error"):
+            return
+        model = body.get("model", "")
+        user_messages = [message.get("content", "") for message in body.get("messages", []) if message.get("role") == "user"]
+        text = self.config.reply(_user_message(user_messages[-1] if user_messages else ""))
+        created_at = datetime.now(timezone.utc).isoformat()
+
+        total, chunks = self._chunks(text, fault == "drop" and body.get("stream", True))
+        if not body.get("stream", True):
+            self._send_json(200, {"model": model, "created_at": created_at, "done": True, "done_reason": "stop",
+                                  "message": {"role": "assistant", "content": "".join(chunk for chunk, _ in chunks)},
+                                  "eval_count": total})
+            return
+
+        self.stats.count("streams")
+        self._start_chunked("application/x-ndjson")
+        for chunk, _ in chunks:
+            self._write_chunk(json.dumps({"model": model, "created_at": created_at, "done": False,
+                                          "message": {"role": "assistant", "content": chunk}}) + "\n")
+        if fault == "drop":
+            self._drop()
+            return
+        self._write_chunk(json.dumps({"model": model, "created_at": created_at, "done": True, "done_reason": "stop",
+                                      "message": {"role": "assistant", "content": ""}, "eval_count": total}) + "\n")
+        self._end_chunked()
+
+
+def make_server(host: str = "127.0.0.1", port: int = DEFAULT_PORT, config: Optional[StandInConfig] = None) -> ThreadingHTTPServer:
+    """Server with its own config and counters; port 0 picks a free port (server.server_address[1])"""
+    handler = type("Handler", (StandInHandler,), {"config": config or StandInConfig(), "stats": StandInStats()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(**kwargs) -> ThreadingHTTPServer:
+    """Start a server on a daemon thread, for tests and benchmarks in the same process"""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name="llm-stand-in", daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline Gemini/Ollama stand-in server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tps", type=float, default=40.0, help="tokens per second after the first")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- fraction applied to every delay")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="share of streams cut off halfway")
+    parser.add_argument("--script", help='JSONL of {"match": regex, "response": text}; unmatched messages are echoed')
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    script = []
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = [json.loads(line) for line in f if line.strip()]
+    config = StandInConfig(ttft=args.ttft, tokens_per_second=args.tps, jitter=args.jitter, error_rate=args.error_rate,
+                           throttle_rate=args.throttle_rate, drop_rate=args.drop_rate, script=script, seed=args.seed)
+    server = make_server(args.host, args.port, config)
+    print(f"🧪 LLM stand-in on http://{args.host}:{server.server_address[1]} ({json.dumps(config.to_dict())})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
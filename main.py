@@ -2,7 +2,7 @@ import requests
 from bs4 import BeautifulSoup
 import pdfplumber
 from tqdm import tqdm
-import google.generativeai as genai
+from genai_clients import get_genai_model
 import os
 from datetime import datetime
 from pathlib import Path
@@ -100,9 +100,8 @@ def extract_text_from_url(url):
 def get_ai_response(user_input, knowledge_base_file, booking_data, conversation_memory):
     """Get response from Gemini AI"""
     try:
-        # Initialize Gemini
-        genai.configure(api_key=API_KEY)
-        model = genai.GenerativeModel("gemini-2.0-flash")
+        # Shared per process; configured once, not on every message
+        model = get_genai_model(API_KEY, "gemini-2.0-flash", {"max_output_tokens": 500, "temperature": 0.7})
         
         # Get recent conversation context
         recent_context = conversation_memory.get_recent_context()
@@ -159,13 +158,7 @@ def get_ai_response(user_input, knowledge_base_file, booking_data, conversation_
             Return a JSON object with only the newly extracted or updated information.
             """
 
-        response = model.generate_content(
-            contents=[{"role": "user", "parts": [prompt]}],
-            generation_config=genai.GenerationConfig(
-                max_output_tokens=500,
-                temperature=0.7
-            )
-        )
+        response = model.generate_content(prompt)
         
         return response.text.strip()
     except Exception as e:
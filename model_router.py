@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+import time
+from typing import Optional
+
+from intent_matcher import IntentResult
+
+
+# Turns a small local model answers as well as the hosted one
+SMALL_TALK = {
+    "hi", "hello", "hey", "hiya", "good morning", "good afternoon", "good evening",
+    "ok", "okay", "ok thanks", "okay thanks", "thanks", "thank you", "thank you so much", "thx",
+    "great", "cool", "perfect", "sounds good", "got it", "yes", "no", "sure", "nope",
+    "bye", "goodbye", "see you", "have a nice day",
+}
+MAX_SIMPLE_WORDS = 12
+MIN_LOCAL_CONFIDENCE = 0.45
+DEFAULT_LOG_PATH = "routing_log.jsonl"
+
+LOCAL = "local"
+HOSTED = "hosted"
+
+
+class RouteDecision:
+    """Which model a turn goes to, and why"""
+
+    def __init__(self, route: str, reason: str, words: int, intent: Optional[str], confidence: Optional[float]):
+        self.route = route
+        self.reason = reason
+        self.words = words
+        self.intent = intent
+        self.confidence = confidence
+        self.classify_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "route": self.route,
+            "reason": self.reason,
+            "words": self.words,
+            "intent": self.intent,
+            "confidence": round(self.confidence, 3) if self.confidence is not None else None,
+            "classify_ms": round(self.classify_ms, 3),
+        }
+
+
+class ModelRouter:
+    """Sends trivial turns to a local model and everything else to the hosted one.
+    Booking-related turns always stay hosted: they rely on the [START_BOOKING] marker."""
+
+    def __init__(self, max_simple_words: int = MAX_SIMPLE_WORDS, min_local_confidence: float = MIN_LOCAL_CONFIDENCE,
+                 log_path: Optional[str] = DEFAULT_LOG_PATH):
+        self.max_simple_words = max_simple_words
+        self.min_local_confidence = min_local_confidence
+        self.log_path = log_path
+        self.counts = {LOCAL: 0, HOSTED: 0}
+        self.latency = {LOCAL: 0.0, HOSTED: 0.0}
+        self.failures = {LOCAL: 0, HOSTED: 0}
+        self._lock = threading.Lock()
+
+    def classify(self, user_input: str, intent: IntentResult, knowledge_source=None) -> RouteDecision:
+        """Cheap checks in order of cost; retrieval only runs when the text alone does not decide"""
+        started = time.perf_counter()
+        normalized = " ".join(re.sub(r"[^\w\s]", " ", user_input.lower()).split())
+        words = len(normalized.split())
+        confidence = None
+
+        if intent.intent is not None:
+            decision = RouteDecision(HOSTED, f"intent:{intent.intent}", words, intent.intent, None)
+        elif normalized in SMALL_TALK:
+            decision = RouteDecision(LOCAL, "small_talk", words, None, None)
+        elif words > self.max_simple_words:
+            decision = RouteDecision(HOSTED, "long", words, None, None)
+        else:
+            confidence_fn = getattr(knowledge_source, "confidence", None)
+            confidence = confidence_fn(user_input) if confidence_fn else None
+            if confidence is not None and confidence >= self.min_local_confidence:
+                decision = RouteDecision(LOCAL, "confident_retrieval", words, None, confidence)
+            else:
+                # Weak retrieval usually means an off-KB question; the hosted model refuses more reliably
+                decision = RouteDecision(HOSTED, "low_confidence", words, None, confidence)
+
+        decision.classify_ms = (time.perf_counter() - started) * 1000
+        return decision
+
+    def record(self, decision: RouteDecision, model_name: str, latency: float, error: Optional[BaseException] = None):
+        """Log one routed call with its outcome, for tuning the thresholds"""
+        with self._lock:
+            self.counts[decision.route] += 1
+            self.latency[decision.route] += latency
+            if error is not None:
+                self.failures[decision.route] += 1
+            if self.log_path:
+                entry = decision.to_dict()
+                entry.update({
+                    "time": time.time(),
+                    "model": model_name,
+                    "latency": round(latency, 4),
+                    "error": str(error) if error is not None else None,
+                })
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry) + "\n")
+                except OSError as e:
+                    print(f"⚠️ Error writing routing log: {str(e)}")
+
+    def stats(self) -> dict:
+        """Share of turns per route and their mean latency"""
+        with self._lock:
+            total = self.counts[LOCAL] + self.counts[HOSTED]
+            return {
+                "turns": total,
+                "local_share": self.counts[LOCAL] / total if total else 0.0,
+                "local_avg_latency": self.latency[LOCAL] / self.counts[LOCAL] if self.counts[LOCAL] else 0.0,
+                "hosted_avg_latency": self.latency[HOSTED] / self.counts[HOSTED] if self.counts[HOSTED] else 0.0,
+                "local_failures": self.failures[LOCAL],
+                "hosted_failures": self.failures[HOSTED],
+            }
+
+
+_default_router: Optional[ModelRouter] = None
+_default_router_lock = threading.Lock()
+
+
+def get_default_model_router() -> ModelRouter:
+    """Shared router for this process, so its log and counters cover every turn"""
+    global _default_router
+    with _default_router_lock:
+        if _default_router is None:
+            _default_router = ModelRouter()
+        return _default_router
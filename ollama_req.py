@@ -1,5 +1,4 @@
 import requests
-import json
 from bs4 import BeautifulSoup
 import pytesseract
 import pdfplumber
@@ -18,6 +17,8 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from robotexclusionrulesparser import RobotExclusionRulesParser
 
+from llm_backends import get_llm_backend
+
 # Set Tesseract path for Windows
 pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 
@@ -26,36 +27,19 @@ logging.basicConfig(level=logging.INFO)
 logging.getLogger('absl').setLevel(logging.ERROR)
 
 class OllamaChatbot:
-    def __init__(self, model: str = "mistral", url: str = "http://127.0.0.1:11434/api/chat"):
-        """Initialize the Ollama chatbot."""
+    def __init__(self, model: str = "mistral", url: str = "http://127.0.0.1:11434/api/chat", backend=None):
+        """Initialize the Ollama chatbot. `backend` is an llm_backends config ("ollama:mistral", "gemini", ...)"""
         self.url = url
         self.model = model
         self.messages = []
+        self.backend = get_llm_backend(backend or {
+            "provider": "ollama", "model": model, "base_url": url.split("/api/")[0]
+        })
 
     def get_response(self, prompt: str) -> str:
-        """Send request to Ollama API and return the response."""
-        payload = {
-            "model": self.model,
-            "messages": [{"role": "user", "content": prompt}],
-            "stream": True
-        }
-        
+        """Send request to the LLM backend and return the response."""
         try:
-            response = requests.post(self.url, json=payload, stream=True)
-            response.raise_for_status()
-            
-            full_response = ""
-            for line in response.iter_lines(decode_unicode=True):
-                if line:
-                    try:
-                        json_data = json.loads(line)
-                        if "message" in json_data and "content" in json_data["message"]:
-                            content = json_data["message"]["content"]
-                            full_response += content
-                    except json.JSONDecodeError:
-                        logging.warning(f"Failed to parse line: {line}")
-                        continue
-            
+            full_response = "".join(self.backend.stream(prompt))
             return full_response if full_response else "No response generated."
             
         except requests.exceptions.RequestException as e:
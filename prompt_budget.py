@@ -0,0 +1,164 @@
+import math
+from typing import Dict, List, Tuple
+
+
+# Prompt token ceilings per model (input side only)
+MODEL_TOKEN_BUDGETS = {
+    "gemini-2.0-flash": 8000,
+    "mistral": 4000,
+    "deepseek-r1:14b": 4000,
+}
+DEFAULT_TOKEN_BUDGET = 6000
+CHARS_PER_TOKEN = 4
+# Every item and heading is followed by a "\n\n" or "\n" separator in the rendered prompt
+SEPARATOR_TOKENS = 1
+
+
+def get_token_budget(model_name: str) -> int:
+    """Return the prompt token budget configured for a model"""
+    return MODEL_TOKEN_BUDGETS.get(model_name, DEFAULT_TOKEN_BUDGET)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token), no API round-trip"""
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def _rendered_tokens(text: str) -> int:
+    """Tokens an item or heading takes up once rendered, separator included (0 for an empty heading)"""
+    return estimate_tokens(text) + SEPARATOR_TOKENS if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep: str = "first") -> str:
+    """Cut text to max_tokens, on a line boundary when possible.
+    keep="first" keeps the beginning, keep="last" keeps the end."""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+
+    if keep == "last":
+        cut = text[-max_chars:]
+        newline = cut.find("\n")
+        return cut[newline + 1:] if 0 <= newline < len(cut) // 2 else cut
+    cut = text[:max_chars]
+    newline = cut.rfind("\n")
+    return cut[:newline] if newline > len(cut) // 2 else cut
+
+
+class PromptSection:
+    """One source of prompt text (knowledge base, FAQ, history, ...) made of scored items"""
+
+    def __init__(self, name: str, items: List[Tuple[float, str]], heading: str = "", priority: int = 0,
+                 required: bool = False, keep: str = "first", min_tokens: int = 32):
+        self.name = name
+        self.items = [(score, text) for score, text in items if text and text.strip()]
+        self.heading = heading
+        self.priority = priority
+        self.required = required
+        self.keep = keep
+        self.min_tokens = min_tokens
+
+
+class AssembledPrompt:
+    """Final prompt text plus a record of what the budget cut"""
+
+    def __init__(self, text: str, budget: int, total_tokens: int, report: List[Dict]):
+        self.text = text
+        self.budget = budget
+        self.total_tokens = total_tokens
+        self.report = report
+
+    @property
+    def was_cut(self) -> bool:
+        return any(entry["dropped"] or entry["truncated"] for entry in self.report)
+
+    def cut_summary(self) -> str:
+        """One-line description of dropped/truncated sections"""
+        cuts = []
+        for entry in self.report:
+            if entry["dropped"] or entry["truncated"]:
+                cuts.append(f"{entry['name']}: kept {entry['kept_tokens']}/{entry['original_tokens']} tokens, "
+                            f"dropped {entry['dropped']}, truncated {entry['truncated']}")
+        return "; ".join(cuts) if cuts else "nothing cut"
+
+
+class PromptAssembler:
+    """Fits prompt sections into a token budget by priority, then by item relevance score"""
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.sections: List[PromptSection] = []
+
+    def add(self, name: str, items, heading: str = "", priority: int = 0, required: bool = False,
+            keep: str = "first", min_tokens: int = 32) -> "PromptAssembler":
+        """Add a section in layout order. items is a string or a list of (score, text) pairs."""
+        if isinstance(items, str):
+            items = [(1.0, items)]
+        self.sections.append(PromptSection(name, items, heading, priority, required, keep, min_tokens))
+        return self
+
+    def assemble(self) -> AssembledPrompt:
+        """Allocate the budget and render the sections in the order they were added"""
+        remaining = self.token_budget
+        kept: Dict[Tuple[int, int], str] = {}
+        report = {}
+
+        # Required sections are always kept in full and paid for first
+        for section_id, section in enumerate(self.sections):
+            if section.required:
+                remaining -= _rendered_tokens(section.heading)
+                for item_id, (_, text) in enumerate(section.items):
+                    kept[(section_id, item_id)] = text
+                    remaining -= _rendered_tokens(text)
+
+        # Then optional sections by priority (ties broken by layout order)
+        optional = sorted(
+            (section_id for section_id, section in enumerate(self.sections) if not section.required),
+            key=lambda section_id: (-self.sections[section_id].priority, section_id)
+        )
+        for section_id in optional:
+            section = self.sections[section_id]
+            heading_tokens = _rendered_tokens(section.heading)
+            heading_paid = False
+            # Highest score first, ties broken by position so the result is deterministic
+            ranked = sorted(range(len(section.items)), key=lambda item_id: (-section.items[item_id][0], item_id))
+            for item_id in ranked:
+                text = section.items[item_id][1]
+                available = remaining - (0 if heading_paid else heading_tokens)
+                cost = _rendered_tokens(text) + remaining - available
+                if cost <= remaining:
+                    kept[(section_id, item_id)] = text
+                elif available >= section.min_tokens:
+                    text = truncate_to_tokens(text, available - SEPARATOR_TOKENS, section.keep)
+                    if not text:
+                        continue
+                    kept[(section_id, item_id)] = text
+                    cost = _rendered_tokens(text) + remaining - available
+                else:
+                    continue
+                remaining -= cost
+                heading_paid = True
+
+        parts = []
+        for section_id, section in enumerate(self.sections):
+            texts = [kept[(section_id, item_id)] for item_id in range(len(section.items))
+                     if (section_id, item_id) in kept]
+            original_tokens = sum(estimate_tokens(text) for _, text in section.items)
+            kept_tokens = sum(estimate_tokens(text) for text in texts)
+            report[section.name] = {
+                "name": section.name,
+                "items": len(section.items),
+                "dropped": len(section.items) - len(texts),
+                "truncated": sum(1 for item_id, (_, text) in enumerate(section.items)
+                                 if kept.get((section_id, item_id), text) != text),
+                "original_tokens": original_tokens,
+                "kept_tokens": kept_tokens,
+            }
+            if texts or (section.required and section.heading):
+                body = "\n\n".join(texts)
+                parts.append(f"{section.heading}\n{body}" if section.heading else body)
+
+        text = "\n\n".join(part for part in parts if part)
+        return AssembledPrompt(text, self.token_budget, estimate_tokens(text), list(report.values()))
@@ -0,0 +1,205 @@
+import datetime
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from content_keys import content_hash
+from single_flight import SingleFlight
+
+
+# Context caching needs an explicit model version
+CACHE_MODEL_NAMES = {
+    "gemini-2.0-flash": "models/gemini-2.0-flash-001",
+}
+DEFAULT_TTL_SECONDS = 3600
+REFRESH_MARGIN_SECONDS = 300
+RETRY_AFTER_SECONDS = 600
+
+
+def prefix_key(model_name: str, prefix: str, api_key: Optional[str] = None) -> str:
+    """Content hash identifying a static prompt prefix for a model. Caches live in the key's
+    project, so tenants with different api keys never share one."""
+    return content_hash(f"{model_name}\n{content_hash(api_key or '')}\n{prefix}")
+
+
+class CacheHandle:
+    """A registered static prefix: the provider-side cache plus a model bound to it"""
+
+    def __init__(self, key: str, name: str, model, expires_at: float, client=None):
+        self.key = key
+        self.name = name
+        self.model = model
+        self.expires_at = expires_at
+        # Provider client the cache was created with (and is refreshed and deleted through)
+        self.client = client
+
+    def expires_in(self) -> float:
+        return self.expires_at - time.time()
+
+
+class GeminiContextCacheBackend:
+    """Registers prefixes with Gemini context caching, using the tenant's api key"""
+
+    def create(self, model_name: str, key: str, prefix: str, ttl_seconds: int,
+               api_key: Optional[str] = None) -> CacheHandle:
+        import google.ai.generativelanguage as glm
+        from genai_clients import get_genai_client, get_genai_model, model_path
+
+        client = get_genai_client(api_key, "cache")
+        cache_model = CACHE_MODEL_NAMES.get(model_name, model_name)
+        cache = client.create_cached_content(cached_content=glm.CachedContent(
+            model=model_path(cache_model),
+            display_name=key[:32],
+            system_instruction=glm.Content(parts=[glm.Part(text=prefix)]),
+            ttl=datetime.timedelta(seconds=ttl_seconds),
+        ))
+        model = get_genai_model(api_key, cache_model, cached_content=cache.name)
+        return CacheHandle(key, cache.name, model, time.time() + ttl_seconds, client)
+
+    def refresh(self, handle: CacheHandle, ttl_seconds: int):
+        import google.ai.generativelanguage as glm
+
+        handle.client.update_cached_content(
+            cached_content=glm.CachedContent(name=handle.name, ttl=datetime.timedelta(seconds=ttl_seconds)),
+            update_mask={"paths": ["ttl"]},
+        )
+        handle.expires_at = time.time() + ttl_seconds
+
+    def delete(self, handle: CacheHandle):
+        handle.client.delete_cached_content(name=handle.name)
+
+
+class _StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class _StubCachedModel:
+    """Stands in for a GenerativeModel bound to a cached prefix"""
+
+    def __init__(self, backend: "LocalStubCacheBackend", key: str):
+        self.backend = backend
+        self.key = key
+
+    def generate_content(self, contents, **kwargs):
+        prefix = self.backend.prefixes[self.key]
+        self.backend.calls.append((self.key, contents))
+        response = _StubResponse(self.backend.responder(prefix, contents))
+        return [response] if kwargs.get("stream") else response
+
+    async def generate_content_async(self, contents, **kwargs):
+        return self.generate_content(contents, **kwargs)
+
+
+class LocalStubCacheBackend:
+    """In-memory backend for tests and offline runs; the responder sees (prefix, turn prompt)"""
+
+    def __init__(self, responder: Optional[Callable[[str, str], str]] = None):
+        self.responder = responder or (lambda prefix, contents: "OK")
+        self.prefixes: Dict[str, str] = {}
+        self.calls = []
+        self.created = 0
+        self.refreshed = 0
+        self.deleted = 0
+
+    def create(self, model_name: str, key: str, prefix: str, ttl_seconds: int,
+               api_key: Optional[str] = None) -> CacheHandle:
+        self.prefixes[key] = prefix
+        self.created += 1
+        return CacheHandle(key, f"cachedContents/stub-{key[:12]}", _StubCachedModel(self, key), time.time() + ttl_seconds)
+
+    def refresh(self, handle: CacheHandle, ttl_seconds: int):
+        self.refreshed += 1
+        handle.expires_at = time.time() + ttl_seconds
+
+    def delete(self, handle: CacheHandle):
+        self.deleted += 1
+        self.prefixes.pop(handle.key, None)
+
+
+class ContextCacheRegistry:
+    """Process-wide map of prefix hash -> provider cache handle, with expiry and refresh"""
+
+    def __init__(self, backend=None, ttl_seconds: int = DEFAULT_TTL_SECONDS,
+                 refresh_margin: int = REFRESH_MARGIN_SECONDS, retry_after: int = RETRY_AFTER_SECONDS):
+        self.backend = backend or GeminiContextCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin = refresh_margin
+        self.retry_after = retry_after
+        self._handles: Dict[str, CacheHandle] = {}
+        self._failed: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def get(self, model_name: str, prefix: str, api_key: Optional[str] = None) -> Optional[CacheHandle]:
+        """Return a live handle for the prefix under this api key, registering or refreshing it as needed.
+        Returns None when the provider rejected the prefix (e.g. below the minimum cache size)."""
+        key = prefix_key(model_name, prefix, api_key)
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle.expires_in() > self.refresh_margin:
+                return handle
+        # Provider calls run outside the registry lock, one per prefix; other tenants' turns never wait on them
+        return self._flights.do(key, lambda: self._register(model_name, key, prefix, api_key))
+
+    def _register(self, model_name: str, key: str, prefix: str, api_key: Optional[str]) -> Optional[CacheHandle]:
+        with self._lock:
+            handle = self._handles.get(key)
+            if handle is not None and handle.expires_in() > self.refresh_margin:
+                # Registered by the flight that just finished
+                return handle
+            failed_at = self._failed.get(key)
+            if handle is None and failed_at is not None and time.time() - failed_at < self.retry_after:
+                return None
+
+        if handle is not None and handle.expires_in() > 0:
+            try:
+                self.backend.refresh(handle, self.ttl_seconds)
+                return handle
+            except Exception as e:
+                print(f"⚠️ Error refreshing context cache: {str(e)}")
+
+        # Expired (or refresh failed): register again
+        try:
+            new_handle = self.backend.create(model_name, key, prefix, self.ttl_seconds, api_key)
+        except Exception as e:
+            print(f"⚠️ Error creating context cache: {str(e)}")
+            with self._lock:
+                self._failed[key] = time.time()
+                if self._handles.get(key) is handle:
+                    self._handles.pop(key, None)
+            return None
+
+        with self._lock:
+            self._failed.pop(key, None)
+            self._handles[key] = new_handle
+        return new_handle
+
+    def evict_expired(self):
+        """Forget handles whose provider-side cache has expired"""
+        with self._lock:
+            for key in [key for key, handle in self._handles.items() if handle.expires_in() <= 0]:
+                del self._handles[key]
+
+    def clear(self):
+        """Delete every registered cache on the provider side"""
+        with self._lock:
+            for handle in self._handles.values():
+                try:
+                    self.backend.delete(handle)
+                except Exception as e:
+                    print(f"⚠️ Error deleting context cache: {str(e)}")
+            self._handles.clear()
+
+
+_default_registry: Optional[ContextCacheRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_context_cache() -> ContextCacheRegistry:
+    """Shared Gemini-backed registry for this process"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = ContextCacheRegistry()
+        return _default_registry
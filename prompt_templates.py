@@ -0,0 +1,75 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Tuple, Union
+
+
+MAX_COMPILED = 64
+
+
+class Slot:
+    """Named hole in a PromptTemplate, filled per turn"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+
+class PromptTemplate:
+    """A prompt compiled once into static segments and slots. Adjacent static parts are
+    merged at compile time, so render() only splices the per-turn values in with a single join."""
+
+    def __init__(self, parts: List[Union[str, Slot]]):
+        self._pieces: List[str] = []
+        self._slots: List[Tuple[int, str]] = []
+        static: List[str] = []
+        for part in parts:
+            if isinstance(part, Slot):
+                if static:
+                    self._pieces.append("".join(static))
+                    static = []
+                self._slots.append((len(self._pieces), part.name))
+                self._pieces.append("")
+            else:
+                static.append(part)
+        if static:
+            self._pieces.append("".join(static))
+
+    @property
+    def slots(self) -> List[str]:
+        return [name for _, name in self._slots]
+
+    @property
+    def static_length(self) -> int:
+        return sum(len(piece) for piece in self._pieces)
+
+    def render(self, **values: str) -> str:
+        pieces = list(self._pieces)
+        for index, name in self._slots:
+            pieces[index] = values[name]
+        return "".join(pieces)
+
+
+_compiled: "OrderedDict[str, object]" = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def get_compiled_prompts(version: str, build: Callable[[], object]):
+    """Return the compiled prompts for this tenant content version, calling build() only once"""
+    with _compiled_lock:
+        compiled = _compiled.get(version)
+        if compiled is not None:
+            _compiled.move_to_end(version)
+            return compiled
+
+    # Built outside the lock; two racing builds of the same version produce identical results
+    compiled = build()
+    with _compiled_lock:
+        compiled = _compiled.setdefault(version, compiled)
+        _compiled.move_to_end(version)
+        if len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+        return compiled
+
+
+def clear_compiled_prompts():
+    with _compiled_lock:
+        _compiled.clear()
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+
+# Client-side limits per provider; None disables that bucket
+PROVIDER_LIMITS = {
+    "gemini": {"rpm": 2000, "tpm": 4_000_000, "max_concurrency": 64},
+    "openai": {"rpm": 500, "tpm": 300_000, "max_concurrency": 32},
+    # Local server: no quota, but it only decodes a few requests at a time
+    "ollama": {"rpm": None, "tpm": None, "max_concurrency": 4},
+}
+DEFAULT_MAX_QUEUE = 256
+DEFAULT_MAX_WAIT_SECONDS = 30.0
+EXPECTED_OUTPUT_TOKENS = 256
+THROTTLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# google.api_core exception names for quota and overload errors
+THROTTLE_ERROR_NAMES = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "InternalServerError"}
+
+
+class RateLimitExceeded(Exception):
+    """The wait queue is full, or the call waited longer than max_wait"""
+
+
+def is_throttle_error(error: BaseException) -> bool:
+    """Quota (429) and overload (5xx) errors, from requests or google.api_core"""
+    response = getattr(error, "response", None)
+    if getattr(response, "status_code", None) in THROTTLE_STATUS_CODES:
+        return True
+    if getattr(error, "code", None) in THROTTLE_STATUS_CODES:
+        return True
+    return type(error).__name__ in THROTTLE_ERROR_NAMES
+
+
+class TokenBucket:
+    """Refills continuously at capacity per minute"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until amount is available (0 when it is available now)"""
+        self._refill(now)
+        # A single request larger than the bucket only has to wait for a full bucket
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """Requests/minute and tokens/minute buckets plus an AIMD concurrency limit.
+    The limit grows by about one slot per limit's worth of successful calls and halves
+    on every 429/5xx, so bursts queue up here instead of failing at the provider."""
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 max_concurrency: int = 32, min_concurrency: int = 1,
+                 max_queue: int = DEFAULT_MAX_QUEUE, max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        self.name = name
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.acquired = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seen = 0.0
+        self._cond = threading.Condition()
+
+    def _try_acquire(self, tokens: int) -> float:
+        """Take a slot and return 0, or return how long to wait before trying again (lock held)"""
+        now = time.monotonic()
+        if self.in_flight >= int(self.limit):
+            return 0.05  # woken by release() in the thread case
+        wait = 0.0
+        if self.requests is not None:
+            wait = max(wait, self.requests.wait_time(1, now))
+        if self.tokens is not None:
+            wait = max(wait, self.tokens.wait_time(tokens, now))
+        if wait > 0:
+            return wait
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None:
+            self.tokens.take(tokens)
+        self.in_flight += 1
+        return 0.0
+
+    def _enter_queue(self):
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise RateLimitExceeded(f"{self.name}: {self.waiting} calls already waiting")
+        self.waiting += 1
+
+    def _acquired(self, started: float):
+        waited = time.monotonic() - started
+        self.waiting -= 1
+        self.acquired += 1
+        self.wait_seconds += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def _give_up(self, started: float):
+        self.waiting -= 1
+        self.rejected += 1
+        raise RateLimitExceeded(f"{self.name}: no capacity after {time.monotonic() - started:.1f}s")
+
+    def acquire(self, tokens: int = 0):
+        """Block until a slot is free (thread callers)"""
+        started = time.monotonic()
+        with self._cond:
+            self._enter_queue()
+            while True:
+                wait = self._try_acquire(tokens)
+                if wait == 0:
+                    self._acquired(started)
+                    return
+                remaining = self.max_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._give_up(started)
+                self._cond.wait(min(wait, remaining))
+
+    async def acquire_async(self, tokens: int = 0):
+        """Wait for a slot without blocking the event loop"""
+        started = time.monotonic()
+        with self._cond:
+            self._enter_queue()
+        while True:
+            with self._cond:
+                wait = self._try_acquire(tokens)
+                if wait == 0:
+                    self._acquired(started)
+                    return
+                remaining = self.max_wait - (time.monotonic() - started)
+                if remaining <= 0:
+                    self._give_up(started)
+            try:
+                await asyncio.sleep(min(wait, remaining))
+            except BaseException:
+                # Cancelled while queued (e.g. the losing side of a hedged call): give the queue slot back
+                with self._cond:
+                    self.waiting -= 1
+                raise
+
+    def release(self, error: Optional[BaseException] = None):
+        """Free the slot and adapt the concurrency limit to how the call went"""
+        with self._cond:
+            self.in_flight -= 1
+            if error is not None and is_throttle_error(error):
+                self.throttled += 1
+                self.limit = max(float(self.min_concurrency), self.limit / 2)
+                print(f"⚠️ {self.name} throttled ({type(error).__name__}), concurrency limit now {int(self.limit)}")
+            elif error is None:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: int = 0):
+        self.acquire(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, tokens: int = 0):
+        await self.acquire_async(tokens)
+        try:
+            yield
+        except BaseException as e:
+            self.release(e)
+            raise
+        self.release()
+
+    def stats(self) -> dict:
+        """Queue depth, throttle events and wait times"""
+        with self._cond:
+            return {
+                "queue_depth": self.waiting,
+                "in_flight": self.in_flight,
+                "concurrency_limit": int(self.limit),
+                "acquired": self.acquired,
+                "throttled": self.throttled,
+                "rejected": self.rejected,
+                "avg_wait_seconds": round(self.wait_seconds / self.acquired, 4) if self.acquired else 0.0,
+                "max_wait_seconds": round(self.max_wait_seen, 4),
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str) -> RateLimiter:
+    """Process-wide limiter for a provider, created with PROVIDER_LIMITS on first use"""
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = RateLimiter(name, **PROVIDER_LIMITS.get(name, {}))
+            _limiters[name] = limiter
+        return limiter
+
+
+def get_rate_limiter_metrics() -> Dict[str, dict]:
+    """stats() of every limiter in this process, keyed by provider"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
@@ -0,0 +1,207 @@
+"""Golden-conversation replay for chatbot_fix.process_user_input.
+
+Each script is a conversation: a line of a JSONL file
+    {"name": "hours", "turns": ["What are your hours?", {"user": "Thanks", "expect": {"contains": "welcome"}}]}
+or a chat_history.json export (its non-empty user messages are replayed in order).
+Optional per-script keys: "tenant" ({"knowledge_base": path, "services": path, "instructions": path,
+"faq": path or FAQ list}) and "chat_history" (starting history).
+
+--record calls the real backend once and stores every LLM response in <cassettes>/<name>.jsonl
+(keyed by prompt hash, after a metadata line with the recording date) plus the replies in
+<name>.golden.json. With a local model (--local-backend, default CHATBOT_LOCAL_LLM_BACKEND) the turns the
+router sends to it are recorded in <name>.local.jsonl the same way. Without --record the run is offline:
+responses come from the cassettes, "today" is the recording date, and replies are compared against the
+golden file.
+Scripts run in parallel across a process pool.
+
+Usage: python replay_conversations.py scripts.jsonl [chat_history.json ...] [--record] [--local-backend CONFIG] [--workers N]
+"""
+import argparse
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+DEFAULT_CASSETTE_DIR = "cassettes"
+DEFAULT_TENANT = {
+    "knowledge_base": "knowledge_base.txt",
+    "services": "available_services.txt",
+    "instructions": "user_instruction.txt",
+    "faq": "",
+}
+
+
+def load_scripts(paths):
+    """Scripts from JSONL files and chat_history.json exports, with file paths made absolute"""
+    scripts = []
+    for path in paths:
+        path = Path(path)
+        text = path.read_text(encoding="utf-8")
+        if path.suffix == ".jsonl":
+            for number, line in enumerate(text.splitlines(), 1):
+                if line.strip():
+                    script = json.loads(line)
+                    script.setdefault("name", f"{path.stem}-{number}")
+                    scripts.append(script)
+        else:
+            history = json.loads(text)
+            scripts.append({"name": path.stem, "turns": [exchange["user"] for exchange in history if exchange.get("user")]})
+
+    for script in scripts:
+        tenant = dict(DEFAULT_TENANT, **script.get("tenant", {}))
+        for key, value in tenant.items():
+            if isinstance(value, str) and value and os.path.exists(value):
+                tenant[key] = os.path.abspath(value)
+        script["tenant"] = tenant
+        script["turns"] = [turn if isinstance(turn, dict) else {"user": turn} for turn in script["turns"]]
+    return scripts
+
+
+def _read_content(value) -> str:
+    """Tenant content is either a file path or the content itself"""
+    if isinstance(value, str) and value and os.path.isfile(value):
+        with open(value, "r", encoding="utf-8") as f:
+            return f.read()
+    return value
+
+
+def _check(turn: dict, response: dict) -> list:
+    expect, problems = turn.get("expect", {}), []
+    if "contains" in expect and expect["contains"].lower() not in response["message"].lower():
+        problems.append(f"expected {expect['contains']!r} in reply")
+    for key in ("success", "is_booking"):
+        if key in expect and response[key] != expect[key]:
+            problems.append(f"expected {key}={expect[key]}, got {response[key]}")
+    return problems
+
+
+def _init_worker():
+    from history_compressor import HistoryCompressor, set_default_history_compressor
+    # Summaries in the foreground, so the prompts (and cassette keys) do not depend on timing
+    set_default_history_compressor(HistoryCompressor(background=False))
+
+
+def run_script(script: dict, cassette_dir: str, backend: str, record: bool, local_backend: str = None) -> dict:
+    """Play one conversation turn by turn, carrying chat_history between requests as the backend does"""
+    name = script["name"]
+    # Fresh working directory per conversation: ConversationMemory falls back to ./chat_history.json
+    # when the history is empty, and booking_data.json and the logs are written there too
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix=f"replay-{name}-") as workdir:
+        os.chdir(workdir)
+        try:
+            return _play(script, cassette_dir, backend, record, local_backend)
+        finally:
+            os.chdir(previous_dir)
+
+
+def _play(script: dict, cassette_dir: str, backend: str, record: bool, local_backend: str = None) -> dict:
+    from chatbot_fix import process_user_input, set_today
+    from llm_backends import read_cassette_metadata, write_cassette_metadata
+
+    name = script["name"]
+    cassette = os.path.join(cassette_dir, f"{name}.jsonl")
+    local_cassette = os.path.join(cassette_dir, f"{name}.local.jsonl")
+    golden_path = os.path.join(cassette_dir, f"{name}.golden.json")
+    if record:
+        # Date prompts and past-date checks depend on "today", so the replay reuses the recording date
+        today = datetime.date.today().isoformat()
+        write_cassette_metadata(cassette, {"today": today})
+        if local_backend:
+            write_cassette_metadata(local_cassette, {"today": today})
+    else:
+        today = read_cassette_metadata(cassette).get("today")
+        if today is None:
+            print(f"⚠️ {name}: cassette has no recording date, replaying against today's date")
+    set_today(today)
+    mode = "record" if record else "replay"
+    llm_backend = {"provider": "cassette", "backend": backend, "path": cassette, "mode": mode}
+    # The local model is wrapped too, otherwise chatbot_fix builds a live one from CHATBOT_LOCAL_LLM_BACKEND
+    local_llm_backend = ({"provider": "cassette", "backend": local_backend, "path": local_cassette, "mode": mode}
+                         if local_backend else None)
+
+    tenant = {key: _read_content(value) for key, value in script["tenant"].items()}
+    golden = []
+    if not record and os.path.exists(golden_path):
+        with open(golden_path, "r", encoding="utf-8") as f:
+            golden = json.load(f)
+
+    history, replies, latencies, failures = script.get("chat_history", []), [], [], []
+    for index, turn in enumerate(script["turns"]):
+        started = time.perf_counter()
+        response = process_user_input(
+            api_key=os.getenv("GEMINI_API_KEY", "replay"),
+            knowledge_base_content=tenant["knowledge_base"],
+            available_services_content=tenant["services"],
+            user_instruction_content=tenant["instructions"],
+            Faq_content=tenant["faq"],
+            appointments_content="[]",
+            user_input=turn["user"],
+            chat_history=history,
+            use_response_cache=False,
+            llm_backend=llm_backend,
+            local_llm_backend=local_llm_backend,
+        )
+        latencies.append(time.perf_counter() - started)
+        history = response["chat_history"]
+        reply = {"user": turn["user"], "message": response["message"], "is_booking": response["is_booking"]}
+        replies.append(reply)
+
+        problems = _check(turn, response)
+        if not record:
+            if index >= len(golden):
+                problems.append("no golden reply recorded")
+            elif golden[index] != reply:
+                problems.append(f"reply differs from golden: {golden[index]['message'][:80]!r} != {reply['message'][:80]!r}")
+        failures.extend(f"turn {index + 1} ({turn['user'][:40]!r}): {problem}" for problem in problems)
+
+    if record:
+        with open(golden_path, "w", encoding="utf-8") as f:
+            json.dump(replies, f, indent=2, ensure_ascii=False)
+    return {"name": name, "turns": len(replies), "latencies": latencies, "failures": failures}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Record or replay golden conversations")
+    parser.add_argument("scripts", nargs="+", help="JSONL conversation scripts or chat_history.json exports")
+    parser.add_argument("--record", action="store_true", help="call the real backend and rewrite cassettes")
+    parser.add_argument("--cassettes", default=DEFAULT_CASSETTE_DIR)
+    parser.add_argument("--backend", default=os.getenv("CHATBOT_LLM_BACKEND", "gemini:gemini-2.0-flash"))
+    parser.add_argument("--local-backend", default=os.getenv("CHATBOT_LOCAL_LLM_BACKEND"),
+                        help="local model the router may send simple turns to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+
+    scripts = load_scripts(args.scripts)
+    cassette_dir = os.path.abspath(args.cassettes)
+    os.makedirs(cassette_dir, exist_ok=True)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(run_script, script, cassette_dir, args.backend, args.record,
+                               args.local_backend) for script in scripts]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    failed = [result for result in results if result["failures"]]
+    for result in failed:
+        print(f"❌ {result['name']}")
+        for failure in result["failures"]:
+            print(f"   {failure}")
+    if latencies:
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"📊 {len(results)} conversations, {len(latencies)} turns in {elapsed:.2f}s "
+              f"(turn p50 {statistics.median(latencies) * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms)")
+    print(f"{'✅' if not failed else '❌'} {len(results) - len(failed)}/{len(results)} conversations "
+          f"{'recorded' if args.record else 'match their golden replies'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from content_keys import content_hash, normalize_question
+
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAX_ENTRIES = 2048
+
+
+class MemoryCacheBackend:
+    """In-process LRU dictionary with per-entry expiry"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """On-disk LRU cache shared by every process pointing at the same file"""
+
+    def __init__(self, path: str = "response_cache.db", max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used)")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl_seconds: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl_seconds, now)
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute("""
+                DELETE FROM response_cache WHERE key IN (
+                    SELECT key FROM response_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+
+class ResponseCache:
+    """Caches answers per (knowledge hash, instruction hash, model, conversation so far, normalized question).
+    The conversation is part of the key because follow-ups ("yes", "how much is it?") only make sense
+    in their own context; opening questions, asked with no history, are shared by every visitor."""
+
+    def __init__(self, backend=None, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.backend = backend or MemoryCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(knowledge_hash: str, instruction_hash: str, question: str, model_name: str = "",
+                 context_hash: str = "") -> str:
+        # Hashes are part of the key, so editing the KB or instructions invalidates old answers;
+        # so is the model, so switching models never serves another model's answers
+        return content_hash(f"{knowledge_hash}|{instruction_hash}|{model_name}|{context_hash}|{normalize_question(question)}")
+
+    def get(self, knowledge_hash: str, instruction_hash: str, question: str, model_name: str = "",
+            context_hash: str = "") -> Optional[str]:
+        """Return the cached response, or None on a miss"""
+        key = self.make_key(knowledge_hash, instruction_hash, question, model_name, context_hash)
+        try:
+            value = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ Error reading response cache: {str(e)}")
+            value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            entry = json.loads(value)
+            self.hits += 1
+            self.saved_seconds += entry.get("latency", 0.0)
+            return entry["response"]
+
+    def put(self, knowledge_hash: str, instruction_hash: str, question: str, response: str, latency: float = 0.0,
+            model_name: str = "", context_hash: str = ""):
+        """Store a response together with the time it took to generate"""
+        if not normalize_question(question):
+            return
+        key = self.make_key(knowledge_hash, instruction_hash, question, model_name, context_hash)
+        try:
+            self.backend.set(key, json.dumps({"response": response, "latency": latency}, ensure_ascii=False), self.ttl_seconds)
+        except Exception as e:
+            print(f"⚠️ Error writing response cache: {str(e)}")
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the LLM time saved by hits"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "saved_seconds": round(self.saved_seconds, 3),
+            }
+
+
+_default_cache: Optional[ResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_response_cache() -> ResponseCache:
+    """Shared response cache: on disk at CHATBOT_RESPONSE_CACHE_DB (shared by every process using
+    the file), otherwise in process memory"""
+    global _default_cache
+    path = os.getenv("CHATBOT_RESPONSE_CACHE_DB")
+    with _default_cache_lock:
+        if _default_cache is None or getattr(_default_cache.backend, "path", None) != path:
+            _default_cache = ResponseCache(SQLiteCacheBackend(path) if path else None)
+        return _default_cache
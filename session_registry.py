@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+
+
+MAX_SESSIONS = 1000
+IDLE_TTL_SECONDS = 30 * 60
+MAX_MEMORY_BYTES = 256 * 1024 * 1024
+
+
+class Session:
+    """A live conversation object plus what the registry needs to manage it.
+    Hold `lock` for the whole turn: turns of one session run one at a time."""
+
+    def __init__(self, session_id: str, fingerprint, value):
+        self.session_id = session_id
+        self.fingerprint = fingerprint
+        self.value = value
+        self.lock = threading.Lock()
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.turns = 0
+        self.size = 0
+        # Free-form per-session bookkeeping for the caller (e.g. hashes of the last inputs seen)
+        self.state = {}
+
+
+class SessionRegistry:
+    """Keeps sessions in memory between requests, keyed by session id.
+    Evicts least recently used sessions beyond max_sessions or max_memory_bytes, and any session
+    idle for longer than idle_ttl. A fingerprint change (different tenant content or backend)
+    replaces the session. Evicted conversations are rebuilt from the history the caller sends."""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = IDLE_TTL_SECONDS,
+                 max_memory_bytes: int = MAX_MEMORY_BYTES, size_of: Optional[Callable[[object], int]] = None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_memory_bytes = max_memory_bytes
+        self.size_of = size_of or (lambda value: 0)
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._memory = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"lru": 0, "idle": 0, "memory": 0, "replaced": 0}
+
+    def _remove(self, session_id: str, reason: str):
+        session = self._sessions.pop(session_id)
+        self._memory -= session.size
+        self.evictions[reason] += 1
+
+    def _evict(self, keep: Optional[str] = None):
+        """Drop idle sessions, then LRU sessions until both caps hold (lock held)"""
+        now = time.monotonic()
+        # Ordered by last use, so idle sessions are all at the front
+        while self._sessions:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.last_used <= self.idle_ttl:
+                break
+            self._remove(oldest.session_id, "idle")
+        while len(self._sessions) > self.max_sessions or self._memory > self.max_memory_bytes:
+            victim = next((session_id for session_id in self._sessions if session_id != keep), None)
+            if victim is None:
+                break
+            self._remove(victim, "lru" if len(self._sessions) > self.max_sessions else "memory")
+
+    def get(self, session_id: str, fingerprint, build: Callable[[], object]) -> Tuple[Session, bool]:
+        """(session, created). build() runs outside the lock; if two requests race to create
+        the same session, the first one stored wins."""
+        with self._lock:
+            self._evict()
+            session = self._sessions.get(session_id)
+            if session is not None and session.fingerprint != fingerprint:
+                self._remove(session_id, "replaced")
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                session.last_used = time.monotonic()
+                self.hits += 1
+                return session, False
+            self.misses += 1
+
+        session = Session(session_id, fingerprint, build())
+        with self._lock:
+            existing = self._sessions.get(session_id)
+            if existing is not None and existing.fingerprint == fingerprint:
+                return existing, False
+            if existing is not None:
+                self._remove(session_id, "replaced")
+            session.size = self.size_of(session.value)
+            self._sessions[session_id] = session
+            self._memory += session.size
+            self._evict(keep=session_id)
+            return session, True
+
+    def touch(self, session: Session):
+        """Call after a turn: re-measures the session and enforces the caps"""
+        size = self.size_of(session.value)
+        with self._lock:
+            session.turns += 1
+            session.last_used = time.monotonic()
+            if self._sessions.get(session.session_id) is session:
+                self._memory += size - session.size
+                session.size = size
+                self._evict(keep=session.session_id)
+
+    def remove(self, session_id: str):
+        """End a session explicitly (e.g. the user closed the chat)"""
+        with self._lock:
+            if session_id in self._sessions:
+                session = self._sessions.pop(session_id)
+                self._memory -= session.size
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "memory_bytes": self._memory,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": dict(self.evictions),
+            }
+
+
+_default_registry: Optional[SessionRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_default_session_registry(size_of: Optional[Callable[[object], int]] = None) -> SessionRegistry:
+    """Shared registry for this process; size_of only applies when it is first created"""
+    global _default_registry
+    with _default_registry_lock:
+        if _default_registry is None:
+            _default_registry = SessionRegistry(size_of=size_of)
+        return _default_registry
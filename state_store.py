@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+
+DEFAULT_DB_PATH = "chat_state.db"
+BUSY_TIMEOUT_MS = 5000
+
+
+class SQLiteStateStore:
+    """Per-session chat history and booking progress in one SQLite file, safe to share between
+    worker processes. WAL mode lets readers run alongside the single writer; each exchange is
+    one appended row, so no turn rewrites a whole history."""
+
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=BUSY_TIMEOUT_MS / 1000)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Durable at checkpoints; a power cut can lose the last turns but never corrupts the file
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                booking_data TEXT,
+                booking_state TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions (updated_at);
+            CREATE TABLE IF NOT EXISTS exchanges (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                user TEXT NOT NULL,
+                bot TEXT NOT NULL,
+                timestamp TEXT,
+                PRIMARY KEY (session_id, seq)
+            ) WITHOUT ROWID;
+        """)
+
+    def _touch(self, session_id: str, now: float):
+        self._conn.execute(
+            "INSERT INTO sessions (session_id, created_at, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET updated_at = excluded.updated_at",
+            (session_id, now, now)
+        )
+
+    def load_history(self, session_id: str) -> List[dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT user, bot, timestamp FROM exchanges WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [{"user": user, "bot": bot, "timestamp": timestamp} for user, bot, timestamp in rows]
+
+    def append_exchange(self, session_id: str, exchange: dict):
+        """Add one exchange after the last stored one"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._touch(session_id, time.time())
+                self._conn.execute(
+                    "INSERT INTO exchanges (session_id, seq, user, bot, timestamp) VALUES "
+                    "(?, (SELECT COALESCE(MAX(seq), -1) + 1 FROM exchanges WHERE session_id = ?), ?, ?, ?)",
+                    (session_id, session_id, exchange.get("user", ""), exchange.get("bot", ""), exchange.get("timestamp"))
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def replace_history(self, session_id: str, history: List[dict]):
+        """Overwrite the stored history, e.g. with the one the backend sent"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._touch(session_id, time.time())
+                self._conn.execute("DELETE FROM exchanges WHERE session_id = ?", (session_id,))
+                self._conn.executemany(
+                    "INSERT INTO exchanges (session_id, seq, user, bot, timestamp) VALUES (?, ?, ?, ?, ?)",
+                    [(session_id, seq, exchange.get("user", ""), exchange.get("bot", ""), exchange.get("timestamp"))
+                     for seq, exchange in enumerate(history)]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def save_booking_data(self, session_id: str, booking_data: dict):
+        with self._lock:
+            now = time.time()
+            self._touch(session_id, now)
+            self._conn.execute("UPDATE sessions SET booking_data = ? WHERE session_id = ?",
+                               (json.dumps(booking_data, ensure_ascii=False), session_id))
+
+    def load_booking_state(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT booking_state FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else None
+
+    def save_booking_state(self, session_id: str, booking_state: dict):
+        with self._lock:
+            self._touch(session_id, time.time())
+            self._conn.execute("UPDATE sessions SET booking_state = ? WHERE session_id = ?",
+                               (json.dumps(booking_state, ensure_ascii=False), session_id))
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM exchanges WHERE session_id = ?", (session_id,))
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self._conn.execute("COMMIT")
+
+    def purge_idle(self, max_idle_seconds: float) -> int:
+        """Delete sessions not updated for max_idle_seconds; returns how many"""
+        cutoff = time.time() - max_idle_seconds
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute(
+                "DELETE FROM exchanges WHERE session_id IN (SELECT session_id FROM sessions WHERE updated_at < ?)", (cutoff,)
+            )
+            deleted = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            self._conn.execute("COMMIT")
+        return deleted
+
+
+_default_store: Optional[SQLiteStateStore] = None
+_default_store_lock = threading.Lock()
+
+
+def get_default_state_store() -> Optional[SQLiteStateStore]:
+    """Store at CHATBOT_STATE_DB, or None to keep the single chat_history.json / booking_data.json files"""
+    global _default_store
+    path = os.getenv("CHATBOT_STATE_DB")
+    if not path:
+        return None
+    with _default_store_lock:
+        if _default_store is None or _default_store.path != path:
+            _default_store = SQLiteStateStore(path)
+        return _default_store
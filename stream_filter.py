@@ -0,0 +1,47 @@
+from typing import List, Tuple
+
+
+BOOKING_MARKERS = ("[START_BOOKING]", "[CONTINUE_BOOKING]")
+
+
+class MarkerFilter:
+    """Strips control markers from streamed text, even when a marker is split across chunks"""
+
+    def __init__(self, markers: Tuple[str, ...] = BOOKING_MARKERS):
+        self.markers = markers
+        self.found: List[str] = []
+        self._pending = ""
+        self._visible: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Take the next chunk and return the part that is safe to show"""
+        text = self._pending + (chunk or "")
+        for marker in self.markers:
+            if marker in text:
+                self.found.extend([marker] * text.count(marker))
+                text = text.replace(marker, "")
+
+        # Hold back a tail that could still turn into a marker with the next chunk
+        hold = 0
+        for marker in self.markers:
+            for length in range(min(len(marker) - 1, len(text)), 0, -1):
+                if text.endswith(marker[:length]):
+                    hold = max(hold, length)
+                    break
+
+        visible = text[:len(text) - hold]
+        self._pending = text[len(text) - hold:]
+        self._visible.append(visible)
+        return visible
+
+    def flush(self) -> str:
+        """Release whatever was held back once the stream has ended"""
+        visible = self._pending
+        self._pending = ""
+        self._visible.append(visible)
+        return visible
+
+    @property
+    def text(self) -> str:
+        """All visible text emitted so far"""
+        return "".join(self._visible)
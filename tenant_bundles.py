@@ -0,0 +1,85 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Optional
+
+
+MAX_BUNDLES = 64
+MAX_BUNDLE_BYTES = 512 * 1024 * 1024
+
+
+class TenantBundleCache:
+    """Compiled tenant bundles (parsed services, FAQ index, prompt prefix, retrieval index) shared by
+    every session of the process, keyed by the tenant's content. The key is the content itself: every
+    request brings new string objects, so a lookup hashes and then compares the whole content, which is
+    linear in its size but far cheaper than a build. Look a bundle up once per request and pass it on.
+    Least recently used bundles go once max_bundles or max_bytes is exceeded."""
+
+    def __init__(self, max_bundles: int = MAX_BUNDLES, max_bytes: int = MAX_BUNDLE_BYTES,
+                 size_of: Optional[Callable[[object], int]] = None):
+        self.max_bundles = max_bundles
+        self.max_bytes = max_bytes
+        self.size_of = size_of or (lambda bundle: 0)
+        self._bundles: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, build: Callable[[], object]):
+        """Bundle for this content, calling build() only on a miss. Builds run outside the lock;
+        when two requests race on new content, the first bundle stored wins."""
+        with self._lock:
+            entry = self._bundles.get(key)
+            if entry is not None:
+                self._bundles.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        bundle = build()
+        size = self.size_of(bundle)
+        with self._lock:
+            self.builds += 1
+            entry = self._bundles.get(key)
+            if entry is not None:
+                return entry[0]
+            self._bundles[key] = (bundle, size)
+            self._bytes += size
+            while len(self._bundles) > 1 and (len(self._bundles) > self.max_bundles or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._bundles.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            return bundle
+
+    def clear(self):
+        with self._lock:
+            self._bundles.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "bundles": len(self._bundles),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+
+_default_cache: Optional[TenantBundleCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_tenant_bundle_cache(size_of: Optional[Callable[[object], int]] = None) -> TenantBundleCache:
+    """Shared cache for this process; size_of only applies when it is first created"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = TenantBundleCache(size_of=size_of)
+        return _default_cache
@@ -7,6 +7,7 @@ import dateparser
 from datetime import datetime, timedelta
 from rapidfuzz import process
 import os
+from booking_state import BookingState
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -495,7 +496,8 @@ def process_user_input(
     Faq_content: list,
     appointments_content: str,
     user_input: str,
-    chat_history: list = None
+    chat_history: list = None,
+    booking_state: dict = None
 ) -> dict:
     try:
         chatbot = AppointmentChatbot(
@@ -506,8 +508,17 @@ def process_user_input(
             user_instruction_content=user_instruction_content.strip()
         )
         
+        state = BookingState.from_dict(booking_state)
+        rejected = None
         if chat_history:
             chatbot.conversation_memory.history = chat_history
+        if state is not None:
+            # Resume from the state returned with the previous response; no history scan
+            chatbot.is_booking_in_progress = state.active
+            if state.active:
+                state.apply(chatbot.booking_system)
+        elif chat_history:
+            # Callers that do not send booking_state yet: rebuild it from the history
             last_bot_msg = chat_history[-1]["bot"] if chat_history else ""
             if "[START_BOOKING]" in last_bot_msg or "[CONTINUE_BOOKING]" in last_bot_msg or any(q[1] in last_bot_msg for q in chatbot.booking_system.questions):
                 chatbot.is_booking_in_progress = True
@@ -542,13 +553,18 @@ def process_user_input(
             }
             chatbot.conversation_memory.add_exchange(user_input, bot_response)
             response_data["chat_history"] = chatbot.conversation_memory.history
+            response_data["booking_state"] = BookingState.capture(chatbot.booking_system, chatbot.is_booking_in_progress, state).to_dict()
             return response_data
 
         if chatbot.is_booking_in_progress:
             if user_input.lower() in ["ok", "yes", "sure"] and chatbot.booking_system.current_question_index == 1:
                 bot_response = "Could you please provide your full name?"
             else:
+                step = chatbot.booking_system.current_question_index
                 bot_response = chatbot.booking_system.process_response(user_input)
+                if chatbot.booking_system.current_question_index == step:
+                    # Answer failed validation; the same question is asked again
+                    rejected = bot_response
                 if "successfully booked" in bot_response:
                     chatbot.is_booking_in_progress = False
             response_data = {
@@ -589,6 +605,9 @@ def process_user_input(
         
         chatbot.conversation_memory.add_exchange(user_input, bot_response)
         response_data["chat_history"] = chatbot.conversation_memory.history
+        response_data["booking_state"] = BookingState.capture(
+            chatbot.booking_system, chatbot.is_booking_in_progress, state, rejected
+        ).to_dict()
         return response_data
     except Exception as e:
         return {
@@ -596,6 +615,8 @@ def process_user_input(
             "message": f"Error processing request: {str(e)}",
             "is_booking": False,
             "booking_data": None,
+            # Unchanged, so a retry resumes where the booking was
+            "booking_state": booking_state,
         }
 
 
@@ -609,7 +630,8 @@ def main(
     Faq_content: list,
     user_input: str,
     appointments_content: str = "[]",
-    chat_history: list = None
+    chat_history: list = None,
+    booking_state: dict = None
 ) -> dict:
     if not API_KEY:
         return {
@@ -626,7 +648,8 @@ def main(
         Faq_content=Faq_content,
         appointments_content=appointments_content,
         user_input=user_input,
-        chat_history=chat_history
+        chat_history=chat_history,
+        booking_state=booking_state
     )
 
 
@@ -0,0 +1,57 @@
+import pytest
+
+from intent_matcher import IntentMatcher
+
+
+SERVICES = ["Classic Facial", "Deep Tissue Massage", "Haircut"]
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return IntentMatcher(SERVICES)
+
+
+@pytest.mark.parametrize("message, service", [
+    ("I want to book a facial", "Classic Facial"),
+    ("I want to book a massage", "Deep Tissue Massage"),
+    ("No, I want to book a facial", "Classic Facial"),
+    ("I don't like massages. I want to book a facial", "Classic Facial"),
+    ("Please book me a haircut for tomorrow.", "Haircut"),
+])
+def test_booking_requests_are_clear(matcher, message, service):
+    result = matcher.detect(message)
+    assert result.is_clear_booking
+    assert result.service == service
+
+
+def test_general_booking_request_is_clear(matcher):
+    result = matcher.detect("I'd like to book an appointment")
+    assert result.is_clear_booking
+    assert result.is_general
+
+
+@pytest.mark.parametrize("message", [
+    "I don't want to book a facial, just the price",
+    "I can’t book a haircut today",
+    "How much does it cost to book a facial?",
+    "Do I need to book a facial in advance?",
+    "Can I book a facial on Saturday?",
+    "What's the price to book a massage",
+    "I want to book a facial. Never mind, I don't want to book a facial",
+])
+def test_negations_and_questions_go_to_the_llm(matcher, message):
+    result = matcher.detect(message)
+    assert result.intent == "book"
+    assert not result.is_clear_booking
+
+
+@pytest.mark.parametrize("message, service_text", [
+    ("I would like to book a hot stone therapy", "hot stone therapy"),
+    ("book a pedicure for tomorrow at 3pm", "pedicure"),
+    ("book the manicure session", "manicure"),
+    ("book me in for tomorrow", None),
+])
+def test_unknown_service_text(matcher, message, service_text):
+    result = matcher.detect(message)
+    assert result.service is None
+    assert result.service_text == service_text
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from rate_limiter import RateLimiter, RateLimitExceeded
+
+
+def test_cancelled_waiters_leave_the_queue():
+    limiter = RateLimiter("test", max_concurrency=1, max_queue=2, max_wait=5.0)
+
+    async def scenario():
+        await limiter.acquire_async()
+        waiters = [asyncio.ensure_future(limiter.acquire_async()) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        assert limiter.stats()["queue_depth"] == 2
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire_async()
+
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        assert limiter.stats()["queue_depth"] == 0
+
+        # The freed queue slots and the released concurrency slot are usable again
+        limiter.release()
+        await asyncio.wait_for(limiter.acquire_async(), timeout=1.0)
+        limiter.release()
+
+    asyncio.run(scenario())
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
@@ -1,7 +1,8 @@
 import PyPDF2
-import openai
 import os
 
+from llm_backends import get_llm_backend
+
 def extract_text_from_pdf(pdf_path):
     """Extract text from a PDF file."""
     text = ""
@@ -13,15 +14,15 @@ def extract_text_from_pdf(pdf_path):
 
 def organize_text_with_gpt(text, api_key):
     """Use OpenAI GPT to organize the extracted text into proper sections."""
-    openai.api_key = api_key
-    response = openai.ChatCompletion.create(
-        model="gpt-4-turbo",
-        messages=[
-            {"role": "system", "content": "You are an assistant that organizes text into well-structured sections."},
-            {"role": "user", "content": f"Organize the following text into structured sections with headings and details:\n{text}"}
-        ]
+    backend = get_llm_backend(
+        os.getenv("TEXT_EXTRACTION_LLM", "openai:gpt-4-turbo"),
+        api_key=api_key,
+        timeout=(5.0, 600.0)  # whole documents take a while
+    )
+    return backend.generate(
+        f"Organize the following text into structured sections with headings and details:\n{text}",
+        system="You are an assistant that organizes text into well-structured sections."
     )
-    return response["choices"][0]["message"]["content"]
 
 def main():
     """Main function to extract, organize, and save text from PDF."""
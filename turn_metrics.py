@@ -0,0 +1,119 @@
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+from prompt_budget import estimate_tokens
+
+
+DEFAULT_LOG_PATH = "turn_metrics.jsonl"
+
+
+def section_tokens(**sections: str) -> Dict[str, int]:
+    """Estimated tokens per named prompt section, e.g. section_tokens(knowledge_base=kb, faq=faq)"""
+    return {name: estimate_tokens(text or "") for name, text in sections.items()}
+
+
+class TurnMetrics:
+    """One structured record per LLM turn (prompt tokens per section, output tokens, LLM wall time),
+    written as JSON lines and summed per tenant in memory"""
+
+    def __init__(self, log_path: Optional[str] = DEFAULT_LOG_PATH):
+        self.log_path = log_path
+        self.tenants: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, tenant: str, model: str, sections: Dict[str, int], output_text: str,
+               llm_seconds: float, **extra) -> dict:
+        """Store one turn; extra keys (route, cached_prefix_tokens, ...) are logged as-is"""
+        entry = {
+            "time": time.time(),
+            "tenant": tenant,
+            "model": model,
+            "sections": dict(sections),
+            "prompt_tokens": sum(sections.values()),
+            "output_tokens": estimate_tokens(output_text or ""),
+            "llm_seconds": round(llm_seconds, 4),
+        }
+        entry.update(extra)
+
+        with self._lock:
+            self._add(entry)
+            if self.log_path:
+                try:
+                    with open(self.log_path, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print(f"⚠️ Error writing turn metrics: {str(e)}")
+        return entry
+
+    def _add(self, entry: dict):
+        totals = self.tenants.setdefault(entry["tenant"], {
+            "turns": 0, "prompt_tokens": 0, "output_tokens": 0, "llm_seconds": 0.0, "sections": {},
+        })
+        totals["turns"] += 1
+        totals["prompt_tokens"] += entry["prompt_tokens"]
+        totals["output_tokens"] += entry["output_tokens"]
+        totals["llm_seconds"] += entry["llm_seconds"]
+        for name, tokens in entry["sections"].items():
+            totals["sections"][name] = totals["sections"].get(name, 0) + tokens
+
+    def tenant_stats(self, tenant: str) -> Optional[dict]:
+        """Totals and per-turn averages for one tenant"""
+        with self._lock:
+            totals = self.tenants.get(tenant)
+            if totals is None:
+                return None
+            turns = totals["turns"]
+            return {
+                "tenant": tenant,
+                "turns": turns,
+                "prompt_tokens": totals["prompt_tokens"],
+                "output_tokens": totals["output_tokens"],
+                "avg_prompt_tokens": totals["prompt_tokens"] / turns,
+                "avg_output_tokens": totals["output_tokens"] / turns,
+                "avg_llm_seconds": totals["llm_seconds"] / turns,
+                "avg_section_tokens": {name: tokens / turns for name, tokens in totals["sections"].items()},
+            }
+
+    def top_tenants(self, by: str = "avg_prompt_tokens", limit: int = 10) -> List[dict]:
+        """Tenants with the most expensive prompts first"""
+        with self._lock:
+            tenants = list(self.tenants)
+        stats = [self.tenant_stats(tenant) for tenant in tenants]
+        return sorted(stats, key=lambda entry: entry[by], reverse=True)[:limit]
+
+
+def aggregate_log(path: str = DEFAULT_LOG_PATH) -> TurnMetrics:
+    """Rebuild per-tenant totals from a turn_metrics.jsonl written by one or more processes"""
+    metrics = TurnMetrics(log_path=None)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                metrics._add(json.loads(line))
+    return metrics
+
+
+_default_metrics: Optional[TurnMetrics] = None
+_default_metrics_lock = threading.Lock()
+
+
+def get_default_turn_metrics() -> TurnMetrics:
+    """Shared recorder for this process"""
+    global _default_metrics
+    with _default_metrics_lock:
+        if _default_metrics is None:
+            _default_metrics = TurnMetrics()
+        return _default_metrics
+
+
+if __name__ == "__main__":
+    import sys
+
+    metrics = aggregate_log(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LOG_PATH)
+    for stats in metrics.top_tenants():
+        sections = ", ".join(f"{name} {tokens:.0f}" for name, tokens in
+                             sorted(stats["avg_section_tokens"].items(), key=lambda item: -item[1]))
+        print(f"📊 {stats['tenant']}: {stats['turns']} turns, {stats['avg_prompt_tokens']:.0f} prompt + "
+              f"{stats['avg_output_tokens']:.0f} output tokens/turn, {stats['avg_llm_seconds']:.2f}s LLM")
+        print(f"   {sections}")
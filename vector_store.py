@@ -0,0 +1,251 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+from functools import partial
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from content_keys import content_hash
+from genai_clients import get_genai_client, model_path
+
+
+EMBEDDING_MODEL = "models/text-embedding-004"
+CHUNK_SEPARATOR = b"---"
+EMBED_BATCH_SIZE = 100  # Gemini batch embedding limit
+
+
+def gemini_embed(texts: List[str], task_type: str = "retrieval_document", api_key: Optional[str] = None) -> np.ndarray:
+    """Embed a batch of texts with Gemini, on the client for this api key"""
+    import google.ai.generativelanguage as glm
+
+    task = glm.TaskType[task_type.upper()]
+    response = get_genai_client(api_key).batch_embed_contents(
+        model=model_path(EMBEDDING_MODEL),
+        requests=[glm.EmbedContentRequest(model=model_path(EMBEDDING_MODEL), task_type=task,
+                                          content=glm.Content(parts=[glm.Part(text=text)]))
+                  for text in texts],
+    )
+    return np.asarray([embedding.values for embedding in response.embeddings], dtype=np.float32)
+
+
+def read_chunk_offsets(chunks_file: Path) -> List[Tuple[int, int]]:
+    """Return (byte offset, byte length) of every '---'-separated chunk in the file"""
+    offsets = []
+    position = 0
+    start = None
+    end = None
+    with open(chunks_file, "rb") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped == CHUNK_SEPARATOR:
+                if start is not None:
+                    offsets.append((start, end - start))
+                start = None
+            elif stripped:
+                if start is None:
+                    start = position + (len(line) - len(line.lstrip()))
+                end = position + len(line.rstrip())
+            position += len(line)
+    if start is not None:
+        offsets.append((start, end - start))
+    return offsets
+
+
+def file_hash(path: Path) -> str:
+    """md5 of a file's bytes, read in blocks"""
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so a dot product is a cosine similarity"""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class VectorStore:
+    """Memory-mapped float32 embedding matrix over the chunks of a text file"""
+
+    def __init__(self, store_path: str, embed_fn: Optional[Callable[..., np.ndarray]] = None,
+                 api_key: Optional[str] = None):
+        self.store_path = Path(store_path)
+        self.sidecar_path = self.store_path.with_suffix(".offsets.json")
+        # Queries are embedded with the tenant's key
+        self.embed_fn = embed_fn or partial(gemini_embed, api_key=api_key)
+
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        self.source_path = self._resolve_source(sidecar["source"])
+        # Offsets are byte ranges of the file as it was indexed; a regenerated file would return wrong text
+        if sidecar.get("source_hash") and file_hash(self.source_path) != sidecar["source_hash"]:
+            raise ValueError(f"{self.source_path} changed since {self.store_path} was built; "
+                             f"rebuild it with: python vector_store.py build {self.source_path} {self.store_path}")
+        self.offsets = sidecar["offsets"]
+        self.model = sidecar.get("model", EMBEDDING_MODEL)
+
+        # Read-only mapping: every process opening the store shares the same page cache
+        self.matrix = np.load(self.store_path, mmap_mode="r")
+        if self.matrix.shape[0] != len(self.offsets):
+            raise ValueError(f"Vector store {self.store_path} has {self.matrix.shape[0]} rows "
+                             f"but {len(self.offsets)} chunk offsets")
+        self._source_file = None
+        self._source_map = None
+        self._source_lock = threading.Lock()
+
+    def _resolve_source(self, source: str) -> Path:
+        """Absolute source path: relative paths are relative to the sidecar (older sidecars stored
+        them relative to the working directory at build time, which is tried second)"""
+        path = Path(source)
+        if path.is_absolute():
+            return path
+        beside_sidecar = self.sidecar_path.resolve().parent / path
+        if beside_sidecar.exists() or not path.exists():
+            return beside_sidecar
+        return path.resolve()
+
+    @classmethod
+    def build(cls, chunks_file: str, store_path: str, embed_fn: Optional[Callable[..., np.ndarray]] = None,
+              batch_size: int = EMBED_BATCH_SIZE) -> "VectorStore":
+        """Embed every chunk of chunks_file and persist the matrix plus the offset sidecar"""
+        chunks_file = Path(chunks_file)
+        store_path = Path(store_path)
+        embed_fn = embed_fn or gemini_embed
+
+        offsets = read_chunk_offsets(chunks_file)
+        if not offsets:
+            raise ValueError(f"No chunks found in {chunks_file}")
+
+        with open(chunks_file, "rb") as f:
+            data = f.read()
+
+        matrix = None
+        for batch_start in range(0, len(offsets), batch_size):
+            batch = offsets[batch_start:batch_start + batch_size]
+            texts = [data[start:start + length].decode("utf-8", errors="replace") for start, length in batch]
+            embeddings = _normalize_rows(np.asarray(embed_fn(texts), dtype=np.float32))
+            if matrix is None:
+                matrix = np.lib.format.open_memmap(
+                    store_path, mode="w+", dtype=np.float32, shape=(len(offsets), embeddings.shape[1])
+                )
+            matrix[batch_start:batch_start + len(batch)] = embeddings
+            print(f"✅ Embedded {batch_start + len(batch)}/{len(offsets)} chunks")
+        matrix.flush()
+        del matrix
+
+        sidecar = {
+            # Relative to the sidecar, so the store opens from any working directory and can be moved with its source
+            "source": os.path.relpath(chunks_file.resolve(), store_path.resolve().parent),
+            "source_hash": hashlib.md5(data).hexdigest(),
+            "model": EMBEDDING_MODEL,
+            "offsets": offsets,
+        }
+        with open(store_path.with_suffix(".offsets.json"), "w", encoding="utf-8") as f:
+            json.dump(sidecar, f)
+
+        return cls(str(store_path), embed_fn)
+
+    def get_chunk(self, chunk_id: int) -> str:
+        """Read one chunk's text straight from the (memory-mapped) source file"""
+        if self._source_map is None:
+            with self._source_lock:
+                if self._source_map is None:
+                    self._source_file = open(self.source_path, "rb")
+                    self._source_map = mmap.mmap(self._source_file.fileno(), 0, access=mmap.ACCESS_READ)
+        start, length = self.offsets[chunk_id]
+        return self._source_map[start:start + length].decode("utf-8", errors="replace")
+
+    def search(self, query: str, top_k: int = 4) -> List[Tuple[float, int]]:
+        """Return (cosine score, chunk_id) pairs for the chunks closest to the query"""
+        num_chunks = self.matrix.shape[0]
+        if not query.strip() or num_chunks == 0:
+            return []
+
+        query_vector = _normalize_rows(np.asarray(self.embed_fn([query], task_type="retrieval_query"), dtype=np.float32))[0]
+        scores = self.matrix @ query_vector
+
+        top_k = min(top_k, num_chunks)
+        if top_k < num_chunks:
+            candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        else:
+            candidates = np.arange(num_chunks)
+        ranked = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[chunk_id]), int(chunk_id)) for chunk_id in ranked]
+
+    def confidence(self, query: str) -> float:
+        """Cosine score of the closest chunk (0 when the search fails)"""
+        try:
+            ranked = self.search(query, top_k=1)
+        except Exception as e:
+            print(f"⚠️ Error searching vector store: {str(e)}")
+            return 0.0
+        return max(0.0, ranked[0][0]) if ranked else 0.0
+
+    def get_relevant_sections(self, query: str, top_k: int = 4) -> List[Tuple[float, str]]:
+        """Return (score, text) for the top-k chunks, in file order"""
+        try:
+            ranked = self.search(query, top_k)
+        except Exception as e:
+            print(f"⚠️ Error searching vector store: {str(e)}")
+            ranked = []
+        if not ranked:
+            ranked = [(0.0, chunk_id) for chunk_id in range(min(top_k, len(self.offsets)))]
+        return [(score, self.get_chunk(chunk_id)) for score, chunk_id in sorted(ranked, key=lambda item: item[1])]
+
+    def get_relevant_context(self, query: str, top_k: int = 4) -> str:
+        """Return the top-k chunks for the query, in file order"""
+        return "\n\n".join(text for _, text in self.get_relevant_sections(query, top_k))
+
+    def close(self):
+        """Release the source file mapping"""
+        with self._source_lock:
+            if self._source_map is None:
+                return
+            self._source_map.close()
+            self._source_file.close()
+            self._source_map = None
+            self._source_file = None
+
+
+_stores: Dict[Tuple[str, str], VectorStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_vector_store(store_path: str, api_key: Optional[str] = None) -> VectorStore:
+    """Open a vector store once per process and api key; stores over the same file share its
+    read-only mapping through the page cache"""
+    path = os.path.abspath(store_path)
+    key = (path, content_hash(api_key or ""))
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = VectorStore(path, api_key=api_key)
+            _stores[key] = store
+        return store
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    api_key = os.getenv('GOOGLE_AI_API_KEY')
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "build":
+        source = sys.argv[2] if len(sys.argv) > 2 else "pdf_chunks.txt"
+        target = sys.argv[3] if len(sys.argv) > 3 else "pdf_chunks.npy"
+        store = VectorStore.build(source, target, partial(gemini_embed, api_key=api_key))
+        print(f"✅ Vector store saved to {target} ({store.matrix.shape[0]} x {store.matrix.shape[1]})")
+    elif len(sys.argv) >= 3 and sys.argv[1] == "query":
+        store = get_vector_store(sys.argv[3] if len(sys.argv) > 3 else "pdf_chunks.npy", api_key)
+        for score, chunk_id in store.search(sys.argv[2]):
+            print(f"[{score:.3f}] {store.get_chunk(chunk_id)[:200]}")
+    else:
+        print("Usage: python vector_store.py build [chunks_file] [store.npy]")
+        print("       python vector_store.py query \"question\" [store.npy]")